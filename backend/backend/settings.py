@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 from dotenv import load_dotenv
 from pathlib import Path
@@ -38,9 +39,14 @@ INSTALLED_APPS = [
     'phonenumber_field',
     'users.apps.UsersConfig',
     'events.apps.EventsConfig',
+    'monitoring.apps.MonitoringConfig',
+    'mailqueue.apps.MailqueueConfig',
+    'sync.apps.SyncConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.QueryCountMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -82,6 +89,36 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION',
+                              default=str(BASE_DIR / 'cache')),
+    },
+    'throttle': {
+        'BACKEND': os.getenv(
+            'THROTTLE_CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION',
+                              default=str(BASE_DIR / 'cache' / 'throttle')),
+    },
+}
+
+THROTTLE_CACHE = 'throttle'
+THROTTLING_ENABLED = os.getenv('THROTTLING_ENABLED', 'True') == 'True'
+
+CALENDAR_CACHE_TIMEOUT = int(os.getenv('CALENDAR_CACHE_TIMEOUT',
+                                       default=60 * 60 * 24))
+HEATMAP_CACHE_TIMEOUT = int(os.getenv('HEATMAP_CACHE_TIMEOUT',
+                                      default=60 * 60 * 24))
+# Размер ячейки сетки тепловой карты по умолчанию, в градусах.
+HEATMAP_CELL_SIZE = 0.01
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -97,6 +134,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# 'token' - токены в БД с кэшированием, 'jwt' - stateless JWT
+# (токены из БД при этом также принимаются).
+AUTH_MODE = os.getenv('AUTH_MODE', default='token')
+AUTHENTICATION_CLASSES = {
+    'token': [
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'jwt': [
+        'users.authentication.CachedJWTAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+}
+AUTH_CACHE_TIMEOUT = int(os.getenv('AUTH_CACHE_TIMEOUT', default=300))
+AUTH_LOCAL_CACHE_TIMEOUT = int(os.getenv('AUTH_LOCAL_CACHE_TIMEOUT',
+                                         default=10))
+AUTH_LOCAL_CACHE_SIZE = 10000
+
+SIMPLE_JWT = {
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', default=5))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -104,18 +166,58 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+    'DEFAULT_AUTHENTICATION_CLASSES': AUTHENTICATION_CLASSES[AUTH_MODE],
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'utils.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'utils.throttling.UserTokenBucketThrottle',
+        'utils.throttling.IPTokenBucketThrottle',
     ],
+    # Емкость корзины и период ее полного пополнения для областей,
+    # заданных в throttle_scopes вьюсетов.
+    'DEFAULT_THROTTLE_RATES': {
+        'event_write_user': '10/min',
+        'event_write_ip': '30/min',
+        'favorite_user': '60/min',
+        'favorite_ip': '240/min',
+        'participate_user': '30/min',
+        'participate_ip': '120/min',
+        'like_user': '60/min',
+        'like_ip': '240/min',
+        'recommendations_user': '20/min',
+        'recommendations_ip': '60/min',
+        'sync_user': '30/min',
+        'sync_ip': '120/min',
+        'batch_user': '10/min',
+        'batch_ip': '30/min',
+    },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
 # Email activation
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-
-EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', default=True)
+# Письма сохраняются в очередь и отправляются командой send_queued_mail
+# через MAILQUEUE_BACKEND.
+EMAIL_BACKEND = 'mailqueue.backend.QueuedEmailBackend'
+MAILQUEUE_BACKEND = os.getenv(
+    'MAILQUEUE_BACKEND',
+    default='django.core.mail.backends.smtp.EmailBackend'
+)
+MAILQUEUE_MAX_ATTEMPTS = int(os.getenv('MAILQUEUE_MAX_ATTEMPTS', default=5))
+MAILQUEUE_RETRY_DELAY = int(os.getenv('MAILQUEUE_RETRY_DELAY', default=60))
+# Через сколько секунд письмо, забранное на отправку, снова забирается
+# из очереди, если обработчик не записал результат.
+MAILQUEUE_LEASE = int(os.getenv('MAILQUEUE_LEASE', default=600))
+
+EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', default='True') == 'True'
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
@@ -137,6 +239,139 @@ DJOSER = {
     }
 }
 
+# Event recommendations (build_recommendations command)
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', default=50))
+RECOMMENDATIONS_DAYS = int(os.getenv('RECOMMENDATIONS_DAYS', default=60))
+RECOMMENDATION_DISTANCE_SCALE_KM = 10
+RECOMMENDATION_WEIGHTS = {
+    'activity': 1.0,
+    'distance': 0.6,
+    'popularity': 0.3,
+    'follow': 0.8,
+}
+
+# Similar events (build_similar_events command)
+SIMILAR_EVENTS_TOP_K = int(os.getenv('SIMILAR_EVENTS_TOP_K', default=10))
+SIMILAR_EVENTS_DISTANCE_KM = 10
+SIMILAR_EVENTS_DAYS = 7
+SIMILAR_EVENTS_WEIGHTS = {
+    'activity': 1.0,
+    'distance': 0.5,
+    'time': 0.3,
+}
+
+# Travel time search (build_street_graph command)
+STREET_GRAPH_ROOT = os.getenv('STREET_GRAPH_ROOT',
+                              default=BASE_DIR / 'street_graph')
+# Скорость передвижения, метров в минуту.
+TRAVEL_SPEEDS = {
+    'walk': 80,
+    'bike': 250,
+}
+ISOCHRONE_MAX_MINUTES = 60
+# Время пути округляется вверх до этого шага (в минутах).
+ISOCHRONE_MINUTES_STEP = 5
+# Предел числа узлов графа, обрабатываемых при расчете одной изохроны.
+ISOCHRONE_MAX_NODES = int(os.getenv('ISOCHRONE_MAX_NODES', default=200000))
+# Размер ячейки сетки (в градусах), для которой кэшируются изохроны.
+ISOCHRONE_GRID_SIZE = 0.002
+ISOCHRONE_CONCAVITY = 0.3
+ISOCHRONE_BUFFER = 0.0005
+ISOCHRONE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Recurring event series
+# Максимальная длина интервала date_from - date_to, в котором
+# занятия серий добавляются в список мероприятий.
+SERIES_MAX_WINDOW_DAYS = 92
+
+# Event archive (archive_events command)
+EVENT_ARCHIVE_AFTER_DAYS = int(os.getenv('EVENT_ARCHIVE_AFTER_DAYS',
+                                         default=30))
+
+# Live event updates (Server-Sent Events)
+# 'postgres' - LISTEN/NOTIFY между процессами, 'local' - внутри процесса.
+EVENT_STREAM_BROKER = os.getenv('EVENT_STREAM_BROKER', default='postgres')
+EVENT_STREAM_HEARTBEAT = 15
+# Время жизни одного соединения потока в секундах, после которого
+# клиент переподключается.
+EVENT_STREAM_LIFETIME = int(os.getenv('EVENT_STREAM_LIFETIME', default=300))
+EVENT_STREAM_RETRY_MS = 3000
+EVENT_STREAM_QUEUE_SIZE = 100
+EVENT_STREAM_RECONNECT_DELAY = 5
+
+# Delta sync for mobile clients (purge_changelog command)
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+SYNC_CHANGELOG_DAYS = int(os.getenv('SYNC_CHANGELOG_DAYS', default=30))
+
+# Geocoding (build_gazetteer command)
+# Геокодеры опрашиваются по порядку до первого найденного адреса:
+# 'local' - локальный справочник адресов, 'yandex' - API Яндекс.
+GEOCODER_BACKENDS = os.getenv('GEOCODER_BACKENDS',
+                              default='local,yandex').split(',')
+GAZETTEER_ROOT = os.getenv('GAZETTEER_ROOT',
+                           default=BASE_DIR / 'gazetteer')
+# Размер ячейки сетки справочника (в градусах) и максимальное
+# расстояние до ближайшего адреса (в метрах) при обратном поиске.
+GAZETTEER_CELL_SIZE = 0.01
+GAZETTEER_MAX_DISTANCE = 300
+
+# Event detail snapshots (build_event_snapshots command)
+# False - снимки перестраиваются сразу после фиксации транзакции
+# в потоке запроса, а не в фоновом потоке.
+EVENT_SNAPSHOT_ASYNC = os.getenv('EVENT_SNAPSHOT_ASYNC',
+                                 default='True') == 'True'
+
+# Batch operations
+BATCH_MAX_OPERATIONS = 500
+
+# Idempotency keys (purge_idempotency_keys command)
+# Время хранения ответа на запрос с заголовком Idempotency-Key, в часах.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', default=24))
+# Через сколько секунд ключ, зарезервированный запросом без сохраненного
+# ответа (процесс завершился во время создания), можно занять повторно.
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT',
+                                            default=120))
+
+# Admin: tables above this size show an estimated row count
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Query monitoring
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', default=20))
+
+# Request profiling
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_ROOT = os.getenv('PROFILING_ROOT', default=BASE_DIR / 'profiles')
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', default=200))
+
+# Prometheus metrics
+METRICS_ROOT = os.getenv('METRICS_ROOT', default=BASE_DIR / 'metrics')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'monitoring.formatters.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'json_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'monitoring': {
+            'handlers': ['json_console'],
+            'level': os.getenv('MONITORING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 SPECTACULAR_SETTINGS = {
    'TITLE': 'Event Board Project',
    'DESCRIPTION': 'API documentation',
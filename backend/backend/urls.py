@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from monitoring.views import metrics
+
 from drf_spectacular.views import (SpectacularAPIView,
                                    SpectacularRedocView,
                                    SpectacularSwaggerView)
@@ -10,8 +12,11 @@ from drf_spectacular.views import (SpectacularAPIView,
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/', include('users.urls', namespace='users')),
     path('api/', include('events.urls', namespace='events')),
+    path('api/', include('monitoring.urls', namespace='monitoring')),
+    path('api/', include('sync.urls', namespace='sync')),
     path(
         'api/schema/',
         SpectacularAPIView.as_view(),
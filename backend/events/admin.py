@@ -1,14 +1,22 @@
 from django.contrib import admin
 from django.contrib.gis.admin import OSMGeoAdmin
 
+from utils.admin import LargeTableAdmin, input_filter
+
 from .models import (Activity,
                      ActivityForEvent,
                      Comment,
                      Event,
+                     EventRecommendation,
+                     EventSeries,
+                     EventSnapshot,
                      FavoriteEvent,
+                     IdempotencyKey,
                      Like,
                      Location,
-                     Participation)
+                     Participation,
+                     SimilarEvent,
+                     Waitlist)
 
 
 class ActivityInEvent(admin.TabularInline):
@@ -19,6 +27,7 @@ class ActivityInEvent(admin.TabularInline):
 class InParticipation(admin.TabularInline):
     model = Participation
     min_num = 1
+    raw_id_fields = ('user',)
 
 
 @admin.register(Activity)
@@ -34,56 +43,151 @@ class LocationAdmin(OSMGeoAdmin):
     list_display = ('id', 'address', 'point')
     list_display_links = ('address',)
     search_fields = ('address',)
-    list_filter = ('address',)
+    list_filter = (input_filter('address__istartswith', 'адресу'),)
+    paginator = LargeTableAdmin.paginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
 @admin.register(ActivityForEvent)
-class ActivityForEventAdmin(admin.ModelAdmin):
+class ActivityForEventAdmin(LargeTableAdmin):
     list_display = ('id', 'activity', 'event')
-    list_filter = ('activity',)
+    list_select_related = ('activity', 'event')
+    list_filter = ('activity', input_filter('event_id', 'ID мероприятия'))
+    autocomplete_fields = ('activity', 'event')
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(LargeTableAdmin):
     list_display = ('id',
                     'name',
                     'author',
-                    'datetime')
+                    'datetime',
+                    'capacity',
+                    'participants_count')
     list_display_links = ('name',)
-    search_fields = ('author',)
-    list_filter = ('author',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('author',)
+    readonly_fields = ('participants_count',)
+    search_fields = ('name',)
+    list_filter = ('is_archived',
+                   input_filter('author__username', 'автору'))
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('location', 'series')
 
     inlines = [ActivityInEvent, InParticipation]
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Счетчик мог измениться, пока форма была открыта.
+            obj.refresh_from_db(fields=list(Event.COUNTER_FIELDS))
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(EventSeries)
+class EventSeriesAdmin(LargeTableAdmin):
+    list_display = ('id',
+                    'name',
+                    'author',
+                    'dtstart',
+                    'rrule',
+                    'capacity')
+    list_display_links = ('name',)
+    list_select_related = ('author',)
+    search_fields = ('name',)
+    list_filter = (input_filter('author__username', 'автору'),)
+    autocomplete_fields = ('author', 'activity')
+    raw_id_fields = ('location',)
+
 
 @admin.register(FavoriteEvent)
-class FavoriteEventAdmin(admin.ModelAdmin):
+class FavoriteEventAdmin(LargeTableAdmin):
     list_display = ('id', 'event', 'user' )
-    list_filter = ('event',)
+    list_select_related = ('event', 'user')
+    list_filter = (input_filter('event_id', 'ID мероприятия'),
+                   input_filter('user__username', 'пользователю'))
+    autocomplete_fields = ('event', 'user')
 
 
 @admin.register(Participation)
-class ParticipationAdmin(admin.ModelAdmin):
+class ParticipationAdmin(LargeTableAdmin):
     list_display = ('id', 'event', 'user')
-    list_filter = ('event',)
+    list_select_related = ('event', 'user')
+    list_filter = (input_filter('event_id', 'ID мероприятия'),
+                   input_filter('user__username', 'пользователю'))
+    autocomplete_fields = ('event', 'user')
+
+
+@admin.register(Waitlist)
+class WaitlistAdmin(LargeTableAdmin):
+    list_display = ('id', 'event', 'user', 'created')
+    list_select_related = ('event', 'user')
+    list_filter = (input_filter('event_id', 'ID мероприятия'),
+                   input_filter('user__username', 'пользователю'))
+    autocomplete_fields = ('event', 'user')
+
+
+@admin.register(EventRecommendation)
+class EventRecommendationAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'event', 'score', 'created')
+    list_select_related = ('event', 'user')
+    list_filter = (input_filter('user__username', 'пользователю'),)
+    autocomplete_fields = ('event', 'user')
+
+
+@admin.register(SimilarEvent)
+class SimilarEventAdmin(LargeTableAdmin):
+    list_display = ('id', 'event', 'similar', 'score')
+    list_select_related = ('event', 'similar')
+    list_filter = (input_filter('event_id', 'ID мероприятия'),)
+    autocomplete_fields = ('event', 'similar')
+
+
+@admin.register(EventSnapshot)
+class EventSnapshotAdmin(LargeTableAdmin):
+    list_display = ('event', 'updated')
+    list_select_related = ('event',)
+    list_filter = (input_filter('event_id', 'ID мероприятия'),)
+    readonly_fields = ('event', 'json', 'comment_ids', 'updated')
+    exclude = ('data',)
+
+    @admin.display(description='JSON мероприятия')
+    def json(self, snapshot):
+        return bytes(snapshot.data).decode()
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(LargeTableAdmin):
+    list_display = ('id', 'key', 'user', 'status_code', 'created')
+    list_select_related = ('user',)
+    list_filter = (input_filter('user__username', 'пользователю'),)
+    readonly_fields = ('user',
+                       'key',
+                       'fingerprint',
+                       'status_code',
+                       'response',
+                       'created')
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('id',
                     'text',
                     'event',
                     'author',
                     'pub_date')
     list_display_links = ('event',)
-    search_fields = ('author',)
-    list_filter = ('author',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('event', 'author')
+    search_fields = ('text',)
+    list_filter = (input_filter('event_id', 'ID мероприятия'),
+                   input_filter('author__username', 'автору'))
+    autocomplete_fields = ('event', 'author')
 
 
 @admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
+class LikeAdmin(LargeTableAdmin):
     list_display = ('id', 'comment', 'user')
-    list_filter = ('comment',)
+    list_select_related = ('comment', 'user')
+    list_filter = (input_filter('comment_id', 'ID комментария'),
+                   input_filter('user__username', 'пользователю'))
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('comment',)
@@ -0,0 +1,35 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event
+
+
+def archive_cutoff(days=None):
+    """Мероприятия раньше этой даты считаются архивными."""
+    if days is None:
+        days = settings.EVENT_ARCHIVE_AFTER_DAYS
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def archive_events(cutoff=None, batch_size=1000):
+    """Помечает прошедшие мероприятия архивными короткими транзакциями,
+    чтобы не блокировать надолго строки таблицы мероприятий.
+    Архивные мероприятия выпадают из частичного индекса, по которому
+    ищутся предстоящие мероприятия."""
+    if cutoff is None:
+        cutoff = archive_cutoff()
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Event.objects.filter(
+                is_archived=False,
+                datetime__lt=cutoff
+            ).order_by('datetime').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return archived
+            archived += Event.objects.filter(pk__in=ids).update(
+                is_archived=True
+            )
@@ -0,0 +1,268 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.dispatch import Signal
+
+from rest_framework import status
+
+from utils.db import delete_returning
+
+from . import snapshots
+from .models import (Comment,
+                     Event,
+                     FavoriteEvent,
+                     Like,
+                     Participation,
+                     Waitlist)
+from .participation import promote_waitlist
+from .stream import publish_many
+
+
+ADD = 'add'
+REMOVE = 'remove'
+
+FAVORITE = 'favorite'
+PARTICIPATION = 'participation'
+LIKE = 'like'
+
+# Пакетные операции создают и удаляют связи в обход сигналов моделей.
+# Сигнал отправляется один раз для каждой группы операций, sender -
+# модель связи, added и removed - ID мероприятий (для лайков - ID
+# комментариев), для которых связь создана или удалена.
+relations_changed = Signal()
+
+
+def relation_statuses(ids, found, present, added_status):
+    """Статусы добавления в терминах одиночных эндпоинтов:
+    404 - объекта нет, 400 - связь уже есть."""
+    return {
+        pk: (status.HTTP_404_NOT_FOUND if pk not in found
+             else status.HTTP_400_BAD_REQUEST if pk in present
+             else added_status)
+        for pk in ids
+    }
+
+
+def removal_statuses(ids, removed, found=None):
+    """Статусы удаления в терминах одиночных эндпоинтов: 404 - связи
+    нет. Если передан found, для существующих объектов без связи
+    возвращается 400, как при удалении лайка."""
+    return {pk: (status.HTTP_204_NO_CONTENT if pk in removed
+                 else status.HTTP_400_BAD_REQUEST
+                 if found is not None and pk in found
+                 else status.HTTP_404_NOT_FOUND)
+            for pk in ids}
+
+
+def participants_changed(event_ids):
+    """Обновления снимков и потока после изменения счетчиков участников."""
+    event_ids = sorted(event_ids)
+    if not event_ids:
+        return
+    snapshots.invalidate(*event_ids)
+
+    def build():
+        return [
+            {'type': 'participants',
+             'event': event_id,
+             'participants_count': count}
+            for event_id, count in Event.objects.filter(
+                pk__in=event_ids
+            ).values_list('pk', 'participants_count')
+        ]
+
+    publish_many(build)
+
+
+def likes_changed(comment_events):
+    """Обновления снимков и потока после изменения лайков.
+    comment_events - словарь ID комментария: ID мероприятия."""
+    if not comment_events:
+        return
+    snapshots.invalidate(*comment_events.values())
+    comment_ids = sorted(comment_events)
+
+    def build():
+        return [
+            {'type': 'likes',
+             'event': comment['event_id'],
+             'comment': {'id': comment['id'],
+                         'likes_count': comment['likes_total']}}
+            for comment in Comment.objects.filter(
+                pk__in=comment_ids
+            ).annotate(
+                likes_total=Count('users_for_liked_comment')
+            ).values('id', 'event_id', 'likes_total')
+        ]
+
+    publish_many(build)
+
+
+def add_favorites(user, ids):
+    found = set(Event.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    present = set(FavoriteEvent.objects.filter(
+        user=user, event_id__in=ids
+    ).values_list('event_id', flat=True))
+    added = sorted(found - present)
+    FavoriteEvent.objects.bulk_create(
+        [FavoriteEvent(user=user, event_id=pk) for pk in added],
+        ignore_conflicts=True
+    )
+    relations_changed.send(sender=FavoriteEvent, user=user,
+                           added=added, removed=[])
+    return relation_statuses(ids, found, present, status.HTTP_201_CREATED)
+
+
+def remove_favorites(user, ids):
+    removed = set(delete_returning(
+        FavoriteEvent.objects.filter(user=user, event_id__in=ids),
+        'event'
+    ))
+    relations_changed.send(sender=FavoriteEvent, user=user,
+                           added=[], removed=sorted(removed))
+    return removal_statuses(ids, removed)
+
+
+def add_participations(user, ids):
+    """Запись на мероприятия: строки мероприятий блокируются в порядке ID,
+    места занимаются одним UPDATE счетчиков. На мероприятия без мест
+    или с непустым листом ожидания пользователь встает в конец листа,
+    свободные места отдаются листу после фиксации транзакции."""
+    events = list(Event.objects.filter(
+        pk__in=ids
+    ).order_by('pk').select_for_update().values_list('pk',
+                                                     'capacity',
+                                                     'participants_count'))
+    found = set()
+    taken = []
+    waitlisted = []
+    present = set(Participation.objects.filter(
+        user=user, event_id__in=ids
+    ).values_list('event_id', flat=True)) | set(Waitlist.objects.filter(
+        user=user, event_id__in=ids
+    ).values_list('event_id', flat=True))
+    queued = set(Waitlist.objects.filter(
+        event_id__in=ids
+    ).values_list('event_id', flat=True).distinct())
+    for pk, capacity, participants_count in events:
+        found.add(pk)
+        if pk in present:
+            continue
+        if pk not in queued and (capacity is None
+                                 or participants_count < capacity):
+            taken.append(pk)
+        else:
+            waitlisted.append(pk)
+
+    if taken:
+        Event.objects.filter(pk__in=taken).update(
+            participants_count=F('participants_count') + 1
+        )
+        Participation.objects.bulk_create(
+            [Participation(user=user, event_id=pk) for pk in taken]
+        )
+    if waitlisted:
+        Waitlist.objects.bulk_create(
+            [Waitlist(user=user, event_id=pk) for pk in waitlisted]
+        )
+        for pk in waitlisted:
+            transaction.on_commit(partial(promote_waitlist, pk))
+    participants_changed(taken)
+    relations_changed.send(sender=Participation, user=user,
+                           added=taken, removed=[])
+
+    statuses = relation_statuses(ids, found, present,
+                                 status.HTTP_201_CREATED)
+    statuses.update((pk, status.HTTP_202_ACCEPTED) for pk in waitlisted)
+    return statuses
+
+
+def remove_participations(user, ids):
+    """Отмена участия или записи в лист ожидания. Освободившиеся места
+    отдаются листу ожидания после фиксации транзакции."""
+    left = set(delete_returning(
+        Participation.objects.filter(user=user, event_id__in=ids),
+        'event'
+    ))
+    if left:
+        Event.objects.filter(
+            pk__in=left, participants_count__gt=0
+        ).update(participants_count=F('participants_count') - 1)
+    unlisted = set(delete_returning(
+        Waitlist.objects.filter(user=user,
+                                event_id__in=set(ids) - left),
+        'event'
+    ))
+    for pk in sorted(left):
+        transaction.on_commit(partial(promote_waitlist, pk))
+    participants_changed(left)
+    relations_changed.send(sender=Participation, user=user,
+                           added=[], removed=sorted(left))
+    return removal_statuses(ids, left | unlisted)
+
+
+def add_likes(user, ids):
+    comments = dict(Comment.objects.filter(
+        pk__in=ids
+    ).values_list('pk', 'event_id'))
+    present = set(Like.objects.filter(
+        user=user, comment_id__in=ids
+    ).values_list('comment_id', flat=True))
+    added = sorted(set(comments) - present)
+    Like.objects.bulk_create(
+        [Like(user=user, comment_id=pk) for pk in added],
+        ignore_conflicts=True
+    )
+    likes_changed({pk: comments[pk] for pk in added})
+    relations_changed.send(sender=Like, user=user,
+                           added=added, removed=[])
+    return relation_statuses(ids, comments, present,
+                             status.HTTP_201_CREATED)
+
+
+def remove_likes(user, ids):
+    comments = dict(Comment.objects.filter(
+        pk__in=ids
+    ).values_list('pk', 'event_id'))
+    removed = sorted(delete_returning(
+        Like.objects.filter(user=user, comment_id__in=ids),
+        'comment'
+    ))
+    likes_changed({pk: comments[pk] for pk in removed if pk in comments})
+    relations_changed.send(sender=Like, user=user,
+                           added=[], removed=removed)
+    return removal_statuses(ids, set(removed), comments)
+
+
+HANDLERS = {
+    (FAVORITE, ADD): add_favorites,
+    (FAVORITE, REMOVE): remove_favorites,
+    (PARTICIPATION, ADD): add_participations,
+    (PARTICIPATION, REMOVE): remove_participations,
+    (LIKE, ADD): add_likes,
+    (LIKE, REMOVE): remove_likes,
+}
+
+
+def apply_batch(user, operations):
+    """Применяет операции одной транзакцией. Операции группируются
+    по типу связи и действию, каждая группа выполняется фиксированным
+    числом запросов независимо от количества операций в ней.
+    Возвращает операции в исходном порядке со статусами."""
+    groups = defaultdict(list)
+    for operation in operations:
+        groups[operation['target_type'], operation['op']].append(
+            operation['id']
+        )
+
+    statuses = {}
+    with transaction.atomic():
+        for (target_type, op), ids in sorted(groups.items()):
+            for pk, result in HANDLERS[target_type, op](user, ids).items():
+                statuses[target_type, pk] = result
+
+    return [{**operation,
+             'status': statuses[operation['target_type'], operation['id']]}
+            for operation in operations]
@@ -0,0 +1,106 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from monitoring.metrics import record_cache
+
+from .models import ActivityForEvent
+
+
+def month_key(value):
+    value = timezone.localtime(value)
+    return f'{value.year}-{value.month:02d}'
+
+
+def month_bounds(year, month):
+    start = timezone.make_aware(datetime.datetime(year, month, 1))
+    if month == 12:
+        end = timezone.make_aware(datetime.datetime(year + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime.datetime(year, month + 1, 1))
+    return start, end
+
+
+def version_key(month):
+    return f'calendar:version:{month}'
+
+
+def get_version(month):
+    """Версия сводок за месяц. Если ключ версии вытеснен из кэша,
+    новая версия не совпадает ни с одной из прежних."""
+    version = cache.get(version_key(month))
+    if version is None:
+        version = time.time_ns()
+        cache.add(version_key(month), version, None)
+        version = cache.get(version_key(month), version)
+    return version
+
+
+def invalidate_months(*values):
+    """Сбрасывает сводки за месяцы указанных дат после фиксации
+    транзакции, чтобы в кэш не попали данные до изменения."""
+    months = {month_key(value) for value in values if value is not None}
+
+    def invalidate():
+        for month in months:
+            cache.set(version_key(month), time.time_ns(), None)
+
+    transaction.on_commit(invalidate)
+
+
+def build_rollup(year, month, point=None, radius=None):
+    """Количество мероприятий по дням и видам активности
+    одним сгруппированным запросом."""
+    start, end = month_bounds(year, month)
+    queryset = ActivityForEvent.objects.filter(
+        event__datetime__gte=start,
+        event__datetime__lt=end
+    )
+    if point is not None:
+        queryset = queryset.filter(
+            event__location__point__distance_lte=(point, D(km=radius))
+        )
+    rows = queryset.annotate(
+        day=TruncDay('event__datetime')
+    ).values(
+        'day', 'activity_id', 'activity__name'
+    ).annotate(
+        count=Count('event_id')
+    ).order_by('day', 'activity__name')
+
+    days = {}
+    for row in rows:
+        days.setdefault(row['day'].date().isoformat(), []).append({
+            'id': row['activity_id'],
+            'name': row['activity__name'],
+            'count': row['count'],
+        })
+    return [{'date': day, 'activities': activities}
+            for day, activities in days.items()]
+
+
+def get_calendar(year, month, latitude=None, longitude=None, radius=None):
+    """Сводка за месяц из кэша или из БД."""
+    month_name = f'{year}-{month:02d}'
+    point = None
+    geo_key = ''
+    if latitude is not None and longitude is not None and radius:
+        point = Point(longitude, latitude, srid=4326)
+        geo_key = f':{latitude:.3f}:{longitude:.3f}:{radius:g}'
+
+    key = f'calendar:{month_name}:{get_version(month_name)}{geo_key}'
+    days = cache.get(key)
+    record_cache('calendar', days is not None)
+    if days is None:
+        days = build_rollup(year, month, point, radius)
+        cache.set(key, days, settings.CALENDAR_CACHE_TIMEOUT)
+
+    return {'month': month_name, 'days': days}
@@ -2,13 +2,20 @@ import datetime
 
 from django.contrib.auth import get_user_model
 
+from django.conf import settings
+from django.utils import timezone
+
 from django_filters.rest_framework import (BooleanFilter,
                                            CharFilter,
+                                           ChoiceFilter,
                                            FilterSet,
                                            ModelMultipleChoiceFilter,
                                            NumberFilter)
 
-from .models import Activity, Event
+from rest_framework.exceptions import ValidationError
+
+from .isochrones import get_isochrone
+from .models import Activity, Event, EventSeries
 
 
 class ActivityFilter(FilterSet):
@@ -22,7 +29,7 @@ class ActivityFilter(FilterSet):
 
 class EventFilter(FilterSet):
     """Фильтр для постов по полю 'участвую', по автору поста,
-    по актуальности мероприятия."""
+    по актуальности мероприятия, по времени пути от точки."""
     author = ModelMultipleChoiceFilter(
         field_name='author__username',
         to_field_name='username',
@@ -51,6 +58,13 @@ class EventFilter(FilterSet):
         field_name='users_participation_for_event',
         method='is_past_participation_filter'
     )
+    latitude = NumberFilter(method='travel_point_filter')
+    longitude = NumberFilter(method='travel_point_filter')
+    travel_mode = ChoiceFilter(
+        choices=[(mode, mode) for mode in settings.TRAVEL_SPEEDS],
+        method='travel_point_filter'
+    )
+    travel_minutes = NumberFilter(method='travel_minutes_filter')
 
     class Meta:
         model = Event
@@ -65,6 +79,7 @@ class EventFilter(FilterSet):
     def is_actual_event_filter(self, queryset, name, value):
         if bool(value):
             return queryset.filter(
+                is_archived=False,
                 datetime__gt=datetime.datetime.now()
             )
         return queryset
@@ -81,6 +96,7 @@ class EventFilter(FilterSet):
         if self.request.user.is_anonymous:
             return queryset
         return queryset.filter(**{lookup: self.request.user},
+                               is_archived=False,
                                datetime__gt=datetime.datetime.now())
 
     def is_past_participation_filter(self, queryset, name, value):
@@ -89,3 +105,63 @@ class EventFilter(FilterSet):
             return queryset
         return queryset.filter(**{lookup: self.request.user},
                                datetime__lte=datetime.datetime.now())
+
+    def travel_point_filter(self, queryset, name, value):
+        # Параметры точки используются фильтром travel_minutes.
+        return queryset
+
+    def travel_minutes_filter(self, queryset, name, value):
+        data = self.form.cleaned_data
+        latitude = data.get('latitude')
+        longitude = data.get('longitude')
+        if latitude is None or longitude is None:
+            raise ValidationError(
+                'Для поиска по времени пути укажите latitude и longitude.'
+            )
+        minutes = int(value)
+        if not 1 <= minutes <= settings.ISOCHRONE_MAX_MINUTES:
+            raise ValidationError(
+                'Время пути должно быть от 1 до '
+                f'{settings.ISOCHRONE_MAX_MINUTES} минут.'
+            )
+
+        isochrone = get_isochrone(float(longitude),
+                                  float(latitude),
+                                  minutes,
+                                  data.get('travel_mode') or 'walk')
+        if isochrone is None:
+            return queryset.none()
+        return queryset.filter(location__point__within=isochrone)
+
+
+class EventSeriesFilter(EventFilter):
+    """Фильтр серий с параметрами фильтра мероприятий.
+    У несохраненных занятий серии нет участников, а отбор по дате
+    выполняется после вычисления занятий методом clip."""
+
+    class Meta:
+        model = EventSeries
+        fields = ['activity', 'author']
+
+    def is_exist_filter(self, queryset, name, value):
+        if self.request.user.is_anonymous:
+            return queryset
+        return queryset.none()
+
+    is_actual_participation_filter = is_exist_filter
+    is_past_participation_filter = is_exist_filter
+
+    def is_actual_event_filter(self, queryset, name, value):
+        return queryset
+
+    is_past_event_filter = is_actual_event_filter
+
+    def clip(self, start, end):
+        """Сужает интервал по параметрам is_actual_event и is_past_event."""
+        data = self.form.cleaned_data
+        now = timezone.now()
+        if data.get('is_actual_event'):
+            start = max(start, now)
+        if data.get('is_past_event'):
+            end = min(end, now)
+        return start, end
@@ -0,0 +1,230 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from django.conf import settings
+
+from geopy import Yandex
+from geopy.exc import GeopyError
+
+from rest_framework.exceptions import APIException
+
+from monitoring.stats import track_geocoder
+from utils.files import current_version
+
+
+logger = logging.getLogger('events.geocoder')
+
+GAZETTEER_FILES = ('x', 'y', 'cells', 'offsets', 'hashes', 'hash_order')
+
+# Ограничение поиска ближайшего адреса соседними ячейками сетки.
+CELL_NEIGHBORS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+ABBREVIATIONS = {
+    'улица': 'ул',
+    'проспект': 'пр-кт',
+    'переулок': 'пер',
+    'площадь': 'пл',
+    'бульвар': 'б-р',
+    'шоссе': 'ш',
+    'набережная': 'наб',
+    'дом': 'д',
+    'корпус': 'к',
+    'строение': 'стр',
+    'город': 'г',
+}
+
+GeocoderResult = namedtuple('GeocoderResult',
+                            ('address', 'latitude', 'longitude'))
+
+
+class GeocoderUnavailable(APIException):
+    status_code = 503
+    default_detail = 'Сервис определения адресов недоступен.'
+    default_code = 'geocoder_unavailable'
+
+
+class GazetteerUnavailable(Exception):
+    """Файлы справочника адресов не построены."""
+
+
+def normalize_address(address):
+    """Адрес в виде, не зависящем от регистра, пунктуации
+    и полных или сокращенных названий."""
+    words = re.findall(r'[\w-]+', address.lower().replace('ё', 'е'))
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def address_hash(normalized):
+    return int.from_bytes(
+        hashlib.blake2b(normalized.encode(), digest_size=8).digest(), 'little'
+    )
+
+
+def cell_key(longitude, latitude):
+    """Ключ ячейки сетки справочника; при упорядочении по ключу
+    адреса одной ячейки лежат подряд."""
+    size = settings.GAZETTEER_CELL_SIZE
+    cell_x = math.floor((longitude + 180) / size)
+    cell_y = math.floor((latitude + 90) / size)
+    return (cell_x << 32) + cell_y
+
+
+def parse_point(point):
+    """Координаты из строки 'долгота широта', как в POINT(...)."""
+    longitude, latitude = map(float, re.split(r'[\s,]+', point.strip()))
+    return longitude, latitude
+
+
+def gazetteer_path():
+    return settings.GAZETTEER_ROOT
+
+
+class Gazetteer:
+    """Справочник адресов. Массивы открываются через mmap, поэтому
+    страницы файлов разделяются всеми процессами хоста.
+
+    Записи упорядочены по ячейке сетки для обратного поиска;
+    для прямого поиска отдельно хранятся отсортированные хэши
+    нормализованных адресов и порядок записей для них. Все файлы
+    читаются из каталога одной версии справочника."""
+
+    def __init__(self, version):
+        path = os.path.join(gazetteer_path(), version)
+        for name in GAZETTEER_FILES:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'),
+                                        mmap_mode='r'))
+        self.addresses = np.memmap(os.path.join(path, 'addresses.bin'),
+                                   dtype=np.uint8, mode='r')
+        self.version = version
+
+    def address(self, index):
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.addresses[start:stop]).decode()
+
+    def result(self, index):
+        return GeocoderResult(self.address(index),
+                              float(self.y[index]),
+                              float(self.x[index]))
+
+    def geocode(self, address):
+        normalized = normalize_address(address)
+        key = np.uint64(address_hash(normalized))
+        start = np.searchsorted(self.hashes, key, side='left')
+        stop = np.searchsorted(self.hashes, key, side='right')
+        for position in range(start, stop):
+            index = int(self.hash_order[position])
+            # Проверка на случай совпадения хэшей разных адресов.
+            if normalize_address(self.address(index)) == normalized:
+                return self.result(index)
+        return None
+
+    def reverse(self, longitude, latitude):
+        size = settings.GAZETTEER_CELL_SIZE
+        candidates = []
+        for dx, dy in CELL_NEIGHBORS:
+            key = cell_key(longitude + dx * size, latitude + dy * size)
+            start = np.searchsorted(self.cells, key, side='left')
+            stop = np.searchsorted(self.cells, key, side='right')
+            if start < stop:
+                candidates.append(np.arange(start, stop))
+        if not candidates:
+            return None
+
+        indexes = np.concatenate(candidates)
+        scale = math.cos(math.radians(latitude))
+        distances = np.hypot((self.x[indexes] - longitude) * scale,
+                             self.y[indexes] - latitude)
+        nearest = int(np.argmin(distances))
+        if distances[nearest] * 111320 > settings.GAZETTEER_MAX_DISTANCE:
+            return None
+        return self.result(int(indexes[nearest]))
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Справочник процесса; перечитывается после перестроения справочника."""
+    global _gazetteer
+    version = current_version(gazetteer_path())
+    if version is None:
+        raise GazetteerUnavailable()
+    with _gazetteer_lock:
+        if _gazetteer is None or _gazetteer.version != version:
+            _gazetteer = Gazetteer(version)
+    return _gazetteer
+
+
+class LocalGeocoder:
+    """Геокодер по локальному справочнику адресов."""
+    errors = (GazetteerUnavailable, OSError, ValueError)
+
+    def geocode(self, address):
+        return get_gazetteer().geocode(address)
+
+    def reverse(self, point):
+        return get_gazetteer().reverse(*parse_point(point))
+
+
+class YandexGeocoder:
+    """Геокодер API Яндекс."""
+    errors = (GeopyError,)
+
+    def geocode(self, address):
+        """Поиск координат по адресу."""
+        with track_geocoder():
+            return Yandex(api_key=settings.API_KEY).geocode(address)
+
+    def reverse(self, point):
+        """Поиск адреса по координатам."""
+        with track_geocoder():
+            return Yandex(api_key=settings.API_KEY).reverse(point)
+
+
+GEOCODERS = {
+    'local': LocalGeocoder,
+    'yandex': YandexGeocoder,
+}
+
+
+def get_geocoders():
+    return [GEOCODERS[name]() for name in settings.GEOCODER_BACKENDS]
+
+
+def lookup(method, query):
+    """Опрашивает геокодеры по порядку GEOCODER_BACKENDS до первого
+    найденного результата. Ошибка одного геокодера не прерывает поиск;
+    если не ответил ни один, возвращается 503."""
+    failed = 0
+    geocoders = get_geocoders()
+    for geocoder in geocoders:
+        try:
+            result = getattr(geocoder, method)(query)
+        except geocoder.errors as error:
+            logger.warning('Geocoder %s failed: %r',
+                           type(geocoder).__name__, error)
+            failed += 1
+            continue
+        if result is not None:
+            return result
+    if failed == len(geocoders):
+        raise GeocoderUnavailable()
+    return None
+
+
+def geocode(address):
+    """Поиск координат по адресу."""
+    return lookup('geocode', address)
+
+
+def reverse(point):
+    """Поиск адреса по координатам."""
+    return lookup('reverse', point)
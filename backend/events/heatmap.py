@@ -0,0 +1,104 @@
+import datetime
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import SnapToGrid
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from monitoring.metrics import record_cache
+
+from .calendar import get_version
+from .models import ActivityForEvent, Event
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day,
+                                                          datetime.time()))
+    return start, start + datetime.timedelta(days=1)
+
+
+def cell_key(point):
+    return round(point.x, 6), round(point.y, 6)
+
+
+def cell_polygon(x, y, size):
+    """Координаты квадратной ячейки с центром в узле сетки."""
+    half = size / 2
+    return [[
+        [x - half, y - half],
+        [x + half, y - half],
+        [x + half, y + half],
+        [x - half, y + half],
+        [x - half, y - half],
+    ]]
+
+
+def build_heatmap(day, bbox, cell_size):
+    """Количество мероприятий по ячейкам сетки и по видам активности
+    за день. Группировка выполняется в БД по ST_SnapToGrid."""
+    start, end = day_bounds(day)
+    area = Polygon.from_bbox(bbox)
+    totals = {
+        cell_key(row['cell']): row['count']
+        for row in Event.objects.filter(
+            datetime__gte=start,
+            datetime__lt=end,
+            location__point__within=area
+        ).annotate(
+            cell=SnapToGrid('location__point', cell_size)
+        ).values('cell').annotate(count=Count('id')).order_by()
+    }
+    rows = ActivityForEvent.objects.filter(
+        event__datetime__gte=start,
+        event__datetime__lt=end,
+        event__location__point__within=area
+    ).annotate(
+        cell=SnapToGrid('event__location__point', cell_size)
+    ).values(
+        'cell', 'activity_id', 'activity__name'
+    ).annotate(
+        count=Count('event_id')
+    ).order_by('activity__name')
+
+    cells = {}
+    for row in rows:
+        cells.setdefault(cell_key(row['cell']), []).append({
+            'id': row['activity_id'],
+            'name': row['activity__name'],
+            'count': row['count'],
+        })
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': cell_polygon(x, y, cell_size),
+                },
+                'properties': {
+                    'count': count,
+                    'activities': cells.get((x, y), []),
+                },
+            }
+            for (x, y), count in sorted(totals.items())
+        ],
+    }
+
+
+def get_heatmap(day, bbox, cell_size):
+    """Тепловая карта из кэша или из БД. Кэш сбрасывается вместе
+    со сводками календаря за месяц этого дня."""
+    bbox = tuple(round(value, 3) for value in bbox)
+    month = f'{day.year}-{day.month:02d}'
+    key = (f'heatmap:{day.isoformat()}:{get_version(month)}:'
+           f'{":".join(map(str, bbox))}:{cell_size:g}')
+    heatmap = cache.get(key)
+    record_cache('heatmap', heatmap is not None)
+    if heatmap is None:
+        heatmap = build_heatmap(day, bbox, cell_size)
+        cache.set(key, heatmap, settings.HEATMAP_CACHE_TIMEOUT)
+    return heatmap
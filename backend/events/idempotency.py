@@ -0,0 +1,126 @@
+import hashlib
+import json
+
+from django.db import connection, transaction
+
+from drf_spectacular.utils import OpenApiParameter
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from utils.renderers import APIJSONEncoder
+
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+# Заголовок ключа идемпотентности для схемы OpenAPI.
+IDEMPOTENCY_PARAMETERS = [
+    OpenApiParameter(HEADER, str, OpenApiParameter.HEADER,
+                     description='Повтор запроса с тем же ключом '
+                                 'возвращает сохраненный ответ'),
+]
+
+
+def lock_id(user_id, key):
+    """64-битный идентификатор блокировки пары пользователь - ключ."""
+    digest = hashlib.blake2b(f'{user_id}:{key}'.encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def advisory_lock(user_id, key):
+    """Транзакционная блокировка PostgreSQL на время проверки
+    и резервирования ключа."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                       [lock_id(user_id, key)])
+
+
+def reserve(user, key, fingerprint):
+    """Ключ и признак того, что он зарезервирован этим запросом,
+    как в get_or_create. Резерв фиксируется короткой транзакцией,
+    поэтому блокировка не удерживается во время создания объекта."""
+    with transaction.atomic():
+        advisory_lock(user.pk, key)
+        stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if stored is not None and (stored.is_expired()
+                                   or stored.is_abandoned()):
+            stored.delete()
+            stored = None
+        if stored is not None:
+            return stored, False
+        return IdempotencyKey.objects.create(user=user,
+                                             key=key,
+                                             fingerprint=fingerprint), True
+
+
+def request_fingerprint(request):
+    """Отпечаток запроса по методу, пути и разобранному телу:
+    ключ нельзя повторно использовать для другого запроса."""
+    body = json.dumps(request.data, sort_keys=True, cls=APIJSONEncoder)
+    return hashlib.sha256(
+        f'{request.method} {request.path}\n{body}'.encode()
+    ).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """Миксин вьюсета для заголовка Idempotency-Key в запросах
+    на создание. Успешный ответ сохраняется вместе с ключом
+    и возвращается при повторах без повторного создания объекта
+    и обращений к геокодеру. Ответы с ошибками не сохраняются:
+    запрос с тем же ключом выполняется заново. Повтор, пришедший
+    во время выполнения первого запроса, получает 409."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or request.user.is_anonymous:
+            return super().create(request, *args, **kwargs)
+        if not 0 < len(key) <= KEY_MAX_LENGTH:
+            raise ValidationError({
+                HEADER: f'Ключ должен содержать от 1 до {KEY_MAX_LENGTH} '
+                        'символов.'
+            })
+
+        fingerprint = request_fingerprint(request)
+        stored, reserved = reserve(request.user, key, fingerprint)
+        if not reserved:
+            if stored.fingerprint != fingerprint:
+                return Response(
+                    data={'errors': 'Ключ идемпотентности уже '
+                                    'использован для другого запроса.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if stored.is_pending():
+                response = Response(
+                    data={'errors': 'Запрос с этим ключом идемпотентности '
+                                    'еще выполняется.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Retry-After'] = '1'
+                return response
+            response = Response(stored.response, status=stored.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        # Резерв, брошенный по IDEMPOTENCY_PENDING_TIMEOUT, мог быть
+        # занят другим запросом; обновляется только своя запись.
+        reservation = IdempotencyKey.objects.filter(pk=stored.pk,
+                                                    status_code__isnull=True)
+        try:
+            # Объект и ответ сохраняются одной транзакцией: ключ
+            # с ответом не может появиться без созданного объекта.
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    reservation.update(status_code=response.status_code,
+                                       response=response.data)
+        except BaseException:
+            reservation.delete()
+            raise
+        if not status.is_success(response.status_code):
+            reservation.delete()
+        return response
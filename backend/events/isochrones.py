@@ -0,0 +1,149 @@
+import heapq
+import math
+import os
+import threading
+
+import numpy as np
+import shapely
+from shapely.geometry import MultiPoint
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+
+from rest_framework.exceptions import APIException
+
+from monitoring.metrics import record_cache
+from utils.files import current_version
+
+
+GRAPH_FILES = ('x', 'y', 'indptr', 'indices', 'weights')
+
+# Максимальное расстояние от точки до ближайшего узла графа,
+# при котором точка считается находящейся в пределах карты.
+MAX_SNAP_DISTANCE = 500
+
+
+class StreetGraphUnavailable(APIException):
+    status_code = 503
+    default_detail = 'Граф улиц для выбранного способа передвижения не построен.'
+    default_code = 'street_graph_unavailable'
+
+
+def graph_path(mode):
+    return os.path.join(settings.STREET_GRAPH_ROOT, mode)
+
+
+class StreetGraph:
+    """Граф улиц в формате CSR. Массивы открываются через mmap,
+    поэтому страницы файлов разделяются всеми процессами хоста.
+    Все файлы читаются из каталога одной версии графа."""
+
+    def __init__(self, mode, version):
+        path = os.path.join(graph_path(mode), version)
+        for name in GRAPH_FILES:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'),
+                                        mmap_mode='r'))
+        self.version = version
+
+    def nearest_node(self, longitude, latitude):
+        """Ближайший узел и расстояние до него в метрах."""
+        scale = math.cos(math.radians(latitude))
+        distances = np.hypot((self.x - longitude) * scale, self.y - latitude)
+        node = int(np.argmin(distances))
+        return node, float(distances[node]) * 111320
+
+    def reachable_nodes(self, source, max_distance, max_nodes=None):
+        """Узлы, до которых кратчайший путь не длиннее max_distance метров.
+        Поиск останавливается после max_nodes обработанных узлов: узлы
+        обрабатываются по возрастанию расстояния, поэтому результат
+        остается изохроной, но для меньшего расстояния."""
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        settled = 0
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            settled += 1
+            if max_nodes is not None and settled > max_nodes:
+                break
+            start, stop = self.indptr[node], self.indptr[node + 1]
+            for neighbor, weight in zip(self.indices[start:stop].tolist(),
+                                        self.weights[start:stop].tolist()):
+                candidate = distance + weight
+                if (candidate <= max_distance
+                        and candidate < distances.get(neighbor, math.inf)):
+                    distances[neighbor] = candidate
+                    heapq.heappush(queue, (candidate, neighbor))
+        return np.fromiter(distances, dtype=np.int64)
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(mode):
+    """Граф улиц процесса; перечитывается после перестроения графа."""
+    version = current_version(graph_path(mode))
+    if version is None:
+        raise StreetGraphUnavailable()
+    with _graphs_lock:
+        graph = _graphs.get(mode)
+        if graph is None or graph.version != version:
+            graph = _graphs[mode] = StreetGraph(mode, version)
+    return graph
+
+
+def grid_cell(longitude, latitude):
+    size = settings.ISOCHRONE_GRID_SIZE
+    return math.floor(longitude / size), math.floor(latitude / size)
+
+
+def round_minutes(minutes):
+    """Время пути, округленное вверх до шага ISOCHRONE_MINUTES_STEP,
+    чтобы близкие значения использовали одну изохрону в кэше."""
+    step = settings.ISOCHRONE_MINUTES_STEP
+    return min(math.ceil(minutes / step) * step,
+               settings.ISOCHRONE_MAX_MINUTES)
+
+
+def build_isochrone(graph, longitude, latitude, distance):
+    """Многоугольник мест, достижимых из точки по графу улиц."""
+    source, snap_distance = graph.nearest_node(longitude, latitude)
+    if snap_distance > MAX_SNAP_DISTANCE:
+        return None
+    nodes = graph.reachable_nodes(source, distance,
+                                  settings.ISOCHRONE_MAX_NODES)
+    points = MultiPoint(np.column_stack((graph.x[nodes], graph.y[nodes])))
+    polygon = shapely.concave_hull(points,
+                                   ratio=settings.ISOCHRONE_CONCAVITY)
+    # Небольшой буфер включает здания по обе стороны от улицы.
+    polygon = polygon.buffer(settings.ISOCHRONE_BUFFER)
+    return GEOSGeometry(memoryview(polygon.wkb), srid=4326)
+
+
+def get_isochrone(longitude, latitude, minutes, mode):
+    """Изохрона для ячейки сетки, в которую попадает точка.
+    Кэшируется по ячейке и округленному времени пути, поэтому повторный
+    поиск рядом с той же точкой сводится к запросу ST_Within.
+    Кэш заранее заполняется командой warm_isochrones."""
+    graph = get_graph(mode)
+    minutes = round_minutes(minutes)
+    cell_x, cell_y = grid_cell(longitude, latitude)
+    key = (f'isochrone:{mode}:{graph.version}:{minutes}:'
+           f'{cell_x}:{cell_y}')
+    cached = cache.get(key)
+    record_cache('isochrone', cached is not None)
+    if cached is not None:
+        return GEOSGeometry(memoryview(cached), srid=4326) if cached else None
+
+    size = settings.ISOCHRONE_GRID_SIZE
+    polygon = build_isochrone(graph,
+                              (cell_x + 0.5) * size,
+                              (cell_y + 0.5) * size,
+                              minutes * settings.TRAVEL_SPEEDS[mode])
+    cache.set(key,
+              polygon.wkb.tobytes() if polygon is not None else b'',
+              timeout=settings.ISOCHRONE_CACHE_TIMEOUT)
+    return polygon
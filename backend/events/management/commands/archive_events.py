@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.archive import archive_cutoff, archive_events
+
+
+class Command(BaseCommand):
+    help = ('Mark past events as archived so that upcoming event queries '
+            'only scan the partial index of active events')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.EVENT_ARCHIVE_AFTER_DAYS,
+                            help='Archive events older than this many days')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Events updated per transaction')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        archived = archive_events(cutoff=archive_cutoff(options['days']),
+                                  batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} events '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
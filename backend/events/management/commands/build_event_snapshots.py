@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+from events.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Build JSON snapshots served by the event detail endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Also build snapshots of past events')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        queryset = Event.objects.all() if options['all'] else None
+        built = build_snapshots(queryset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {built} event snapshots '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
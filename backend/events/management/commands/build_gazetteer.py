@@ -0,0 +1,117 @@
+import csv
+import os
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.geocoder import (GAZETTEER_FILES,
+                             address_hash,
+                             cell_key,
+                             gazetteer_path,
+                             normalize_address)
+from utils.files import publish_version
+
+
+class Command(BaseCommand):
+    help = ('Build the local address gazetteer from a CSV file '
+            '(address,latitude,longitude) or an OSM XML extract')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.csv or .osm file')
+
+    def read_csv(self, path):
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                yield (row['address'],
+                       float(row['longitude']),
+                       float(row['latitude']))
+
+    def osm_address(self, tags):
+        if 'addr:street' not in tags or 'addr:housenumber' not in tags:
+            return None
+        return ', '.join(part for part in (tags.get('addr:city'),
+                                           tags['addr:street'],
+                                           tags['addr:housenumber'])
+                         if part)
+
+    def read_osm(self, path):
+        """Адреса точек и центры контуров зданий с тегами addr:*."""
+        nodes = {}
+        for _, element in ElementTree.iterparse(path):
+            if element.tag == 'node':
+                longitude = float(element.get('lon'))
+                latitude = float(element.get('lat'))
+                nodes[element.get('id')] = (longitude, latitude)
+                address = self.osm_address({
+                    tag.get('k'): tag.get('v')
+                    for tag in element.iter('tag')
+                })
+                if address:
+                    yield address, longitude, latitude
+                element.clear()
+            elif element.tag == 'way':
+                address = self.osm_address({
+                    tag.get('k'): tag.get('v')
+                    for tag in element.iter('tag')
+                })
+                points = [nodes[ref.get('ref')]
+                          for ref in element.iter('nd')
+                          if ref.get('ref') in nodes]
+                if address and points:
+                    longitude, latitude = np.mean(points, axis=0)
+                    yield address, float(longitude), float(latitude)
+                element.clear()
+
+    def to_arrays(self, entries):
+        unique = {}
+        for address, longitude, latitude in entries:
+            unique.setdefault(normalize_address(address),
+                              (address, longitude, latitude))
+        rows = list(unique.values())
+
+        x = np.array([row[1] for row in rows], dtype=np.float64)
+        y = np.array([row[2] for row in rows], dtype=np.float64)
+        cells = np.array([cell_key(*row[1:]) for row in rows],
+                         dtype=np.int64)
+        order = np.argsort(cells, kind='stable')
+        rows = [rows[index] for index in order]
+
+        encoded = [row[0].encode() for row in rows]
+        hashes = np.array([address_hash(normalize_address(row[0]))
+                           for row in rows], dtype=np.uint64)
+        hash_order = np.argsort(hashes, kind='stable')
+        return {
+            'x': x[order],
+            'y': y[order],
+            'cells': cells[order],
+            'offsets': np.concatenate((
+                [0], np.cumsum([len(value) for value in encoded])
+            )).astype(np.int64),
+            'hashes': hashes[hash_order],
+            'hash_order': hash_order.astype(np.int64),
+        }, b''.join(encoded)
+
+    def save(self, arrays, addresses):
+        """Сохраняет файлы в каталог новой версии справочника
+        и переключает на нее ссылку current: процессы видят либо старый
+        справочник целиком, либо новый."""
+        with publish_version(gazetteer_path()) as directory:
+            with open(os.path.join(directory, 'addresses.bin'), 'wb') as file:
+                file.write(addresses)
+            for name in GAZETTEER_FILES:
+                np.save(os.path.join(directory, f'{name}.npy'), arrays[name])
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File {path} does not exist')
+
+        entries = (self.read_osm(path) if path.endswith('.osm')
+                   else self.read_csv(path))
+        arrays, addresses = self.to_arrays(entries)
+        self.save(arrays, addresses)
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {len(arrays["x"])} addresses to {gazetteer_path()}'
+        ))
@@ -0,0 +1,45 @@
+import datetime
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from events.heatmap import get_heatmap
+
+
+class Command(BaseCommand):
+    help = ('Aggregate events into a grid heatmap per day and save it '
+            'as GeoJSON. Results are cached for the staff endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bbox', required=True,
+                            help='min_lon,min_lat,max_lon,max_lat')
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            default=None, help='First day, YYYY-MM-DD')
+        parser.add_argument('--days', type=int, default=1)
+        parser.add_argument('--cell-size', type=float,
+                            default=settings.HEATMAP_CELL_SIZE,
+                            help='Grid cell size in degrees')
+        parser.add_argument('--output', default=None,
+                            help='Directory for <date>.geojson files')
+
+    def handle(self, *args, **options):
+        try:
+            bbox = tuple(map(float, options['bbox'].split(',')))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            raise CommandError('--bbox must contain four numbers')
+
+        first_day = options['date'] or timezone.localdate()
+        for offset in range(options['days']):
+            day = first_day + datetime.timedelta(days=offset)
+            heatmap = get_heatmap(day, bbox, options['cell_size'])
+            if options['output']:
+                path = f'{options["output"]}/{day.isoformat()}.geojson'
+                with open(path, 'w', encoding='utf-8') as file:
+                    json.dump(heatmap, file, ensure_ascii=False)
+            self.stdout.write(
+                f'{day.isoformat()}: {len(heatmap["features"])} cells'
+            )
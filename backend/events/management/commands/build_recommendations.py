@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.recommendations import RecommendationBuilder
+
+
+class Command(BaseCommand):
+    help = 'Precompute top-K upcoming event recommendations for active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--days', type=int, default=None,
+                            help='Recommend events within this many days')
+        parser.add_argument('--history-days', type=int, default=365,
+                            help='Participations used to find usual venues')
+        parser.add_argument('--batch-size', type=int, default=256,
+                            help='Users scored per matrix batch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = RecommendationBuilder(
+            top_k=options['top_k'],
+            days=options['days'],
+            history_days=options['history_days'],
+            batch_size=options['batch_size'],
+        ).build()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {result["recommendations"]} recommendations for '
+            f'{result["users"]} users and {result["events"]} events '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.similar import rebuild_similar_events
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the nearest neighbor table of similar events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=256,
+                            help='Events scored per matrix batch')
+        parser.add_argument('--past-days', type=int, default=30,
+                            help='Also rebuild neighbors of recent events')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = rebuild_similar_events(batch_size=options['batch_size'],
+                                        past_days=options['past_days'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {result["neighbors"]} neighbors for '
+            f'{result["events"]} events '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
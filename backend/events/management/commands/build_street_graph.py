@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import osmnx
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.isochrones import GRAPH_FILES, graph_path
+from utils.files import publish_version
+
+
+# Виды дорог, недоступные для способа передвижения.
+EXCLUDED_HIGHWAYS = {
+    'walk': {'motorway', 'motorway_link', 'trunk', 'trunk_link'},
+    'bike': {'motorway', 'motorway_link', 'trunk', 'trunk_link',
+             'steps', 'corridor'},
+}
+EXCLUDED_ACCESS = {
+    'walk': ('foot', 'no'),
+    'bike': ('bicycle', 'no'),
+}
+
+
+def as_set(value):
+    if isinstance(value, list):
+        return set(value)
+    return {value}
+
+
+class Command(BaseCommand):
+    help = ('Build walking and cycling street graphs from a local OSM '
+            'extract and save them as memory-mappable CSR arrays')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='OSM XML extract (.osm)')
+        parser.add_argument('--mode', action='append',
+                            choices=sorted(settings.TRAVEL_SPEEDS),
+                            help='Build only the given modes')
+
+    def load_graph(self, path, mode):
+        graph = osmnx.graph_from_xml(path,
+                                     bidirectional=mode == 'walk',
+                                     simplify=True,
+                                     retain_all=False)
+        tag, forbidden = EXCLUDED_ACCESS[mode]
+        graph.remove_edges_from([
+            (u, v, key) for u, v, key, data in graph.edges(keys=True,
+                                                           data=True)
+            if as_set(data.get('highway')) & EXCLUDED_HIGHWAYS[mode]
+            or forbidden in as_set(data.get(tag))
+        ])
+        return graph
+
+    def to_csr(self, graph):
+        nodes = list(graph.nodes)
+        index = {node: position for position, node in enumerate(nodes)}
+        x = np.array([graph.nodes[node]['x'] for node in nodes])
+        y = np.array([graph.nodes[node]['y'] for node in nodes])
+
+        edges = np.array([
+            (index[u], index[v], data['length'])
+            for u, v, data in graph.edges(data=True)
+        ], dtype=np.float64).reshape(-1, 3)
+        edges = edges[np.argsort(edges[:, 0], kind='stable')]
+        sources = edges[:, 0].astype(np.int64)
+        indptr = np.concatenate((
+            [0], np.cumsum(np.bincount(sources, minlength=len(nodes)))
+        )).astype(np.int64)
+        return {
+            'x': x,
+            'y': y,
+            'indptr': indptr,
+            'indices': edges[:, 1].astype(np.int64),
+            'weights': edges[:, 2].astype(np.float32),
+        }
+
+    def save(self, arrays, mode):
+        """Сохраняет массивы в каталог новой версии графа и переключает
+        на нее ссылку current: процессы видят либо старый граф целиком,
+        либо новый."""
+        with publish_version(graph_path(mode)) as directory:
+            for name in GRAPH_FILES:
+                np.save(os.path.join(directory, f'{name}.npy'), arrays[name])
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'File {options["path"]} does not exist')
+
+        for mode in options['mode'] or sorted(settings.TRAVEL_SPEEDS):
+            graph = self.load_graph(options['path'], mode)
+            arrays = self.to_csr(graph)
+            self.save(arrays, mode)
+            self.stdout.write(self.style.SUCCESS(
+                f'{mode}: {len(arrays["x"])} nodes, '
+                f'{len(arrays["indices"])} edges'
+            ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from utils.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Average subscriptions per user')
+        parser.add_argument('--participations', type=int, default=5,
+                            help='Average participations per user')
+        parser.add_argument('--favorites', type=int, default=3,
+                            help='Average favorite events per user')
+        parser.add_argument('--comments', type=int, default=3,
+                            help='Average comments per event')
+        parser.add_argument('--likes', type=int, default=2,
+                            help='Average likes per comment')
+        parser.add_argument('--days', type=int, default=90,
+                            help='Events are spread over +-days from now')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of popularity')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(seed=options['seed'],
+                                     skew=options['skew'],
+                                     batch_size=options['batch_size'])
+        dataset = generator.generate(
+            users=options['users'],
+            events=options['events'],
+            follows=options['follows'],
+            participations=options['participations'],
+            favorites=options['favorites'],
+            comments=options['comments'],
+            likes=options['likes'],
+            days=options['days'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated {len(dataset["users"])} users, '
+            f'{len(dataset["events"])} events, '
+            f'{len(dataset["comments"])} comments'
+        ))
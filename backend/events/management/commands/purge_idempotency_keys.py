@@ -0,0 +1,27 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = ('Delete expired idempotency keys. Requests repeated with '
+            'these keys are executed again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int,
+                            default=settings.IDEMPOTENCY_KEY_TTL,
+                            help='Keep keys newer than this many hours')
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            created__lt=timezone.now() - datetime.timedelta(
+                hours=options['hours']
+            )
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} idempotency keys'
+        ))
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.isochrones import get_graph, get_isochrone
+
+
+class Command(BaseCommand):
+    help = ('Precompute cached isochrones for every grid cell covered '
+            'by the street graph, so that travel time search does not '
+            'run the graph search inside requests')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append',
+                            choices=sorted(settings.TRAVEL_SPEEDS),
+                            help='Warm only the given modes')
+        parser.add_argument('--minutes', type=int, nargs='+',
+                            default=[15, 30],
+                            help='Travel times to precompute')
+        parser.add_argument('--bbox',
+                            help='min_longitude,min_latitude,'
+                                 'max_longitude,max_latitude')
+
+    def grid_cells(self, graph, bbox):
+        x = np.asarray(graph.x)
+        y = np.asarray(graph.y)
+        if bbox is not None:
+            min_x, min_y, max_x, max_y = bbox
+            inside = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+            x, y = x[inside], y[inside]
+        size = settings.ISOCHRONE_GRID_SIZE
+        return np.unique(np.column_stack((np.floor(x / size),
+                                          np.floor(y / size))), axis=0)
+
+    def handle(self, *args, **options):
+        bbox = None
+        if options['bbox']:
+            try:
+                bbox = tuple(map(float, options['bbox'].split(',')))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4:
+                raise CommandError('Invalid --bbox')
+
+        started = time.perf_counter()
+        size = settings.ISOCHRONE_GRID_SIZE
+        built = 0
+        for mode in options['mode'] or sorted(settings.TRAVEL_SPEEDS):
+            graph = get_graph(mode)
+            cells = self.grid_cells(graph, bbox)
+            for minutes in options['minutes']:
+                for cell_x, cell_y in cells:
+                    get_isochrone((cell_x + 0.5) * size,
+                                  (cell_y + 0.5) * size,
+                                  minutes,
+                                  mode)
+                    built += 1
+            self.stdout.write(f'{mode}: {len(cells)} cells')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {built} isochrones '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.5 on 2026-10-19 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from utils.db import count_subquery
+
+
+def recount_participants(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Participation = apps.get_model('events', 'Participation')
+    Event.objects.update(participants_count=count_subquery(
+        Participation.objects.all(), 'event'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Максимальное количество участников'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='participants_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество участников'),
+        ),
+        migrations.CreateModel(
+            name='Waitlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_for_event', to='events.event', verbose_name='Мероприятие')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_for_user', to=settings.AUTH_USER_MODEL, verbose_name='Участник')),
+            ],
+            options={
+                'verbose_name': 'Лист ожидания',
+                'verbose_name_plural': 'Лист ожидания',
+                'ordering': ['created', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='waitlist',
+            index=models.Index(fields=['event', 'created'], name='waitlist_event_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlist',
+            constraint=models.UniqueConstraint(fields=('user', 'event'), name='unique_waitlist'),
+        ),
+        migrations.RunPython(recount_participants, migrations.RunPython.noop),
+    ]
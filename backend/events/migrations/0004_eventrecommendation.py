@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0003_event_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата расчета')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations_for_event', to='events.event', verbose_name='Мероприятие')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations_for_user', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация',
+                'verbose_name_plural': 'Рекомендации',
+                'ordering': ['user', '-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='eventrecommendation',
+            index=models.Index(fields=['user', '-score'], name='recommendation_user_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventrecommendation',
+            constraint=models.UniqueConstraint(fields=('user', 'event'), name='unique_recommendation'),
+        ),
+    ]
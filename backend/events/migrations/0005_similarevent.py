@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_eventrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_events', to='events.event', verbose_name='Мероприятие')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to_events', to='events.event', verbose_name='Похожее мероприятие')),
+            ],
+            options={
+                'verbose_name': 'Похожее мероприятие',
+                'verbose_name_plural': 'Похожие мероприятия',
+                'ordering': ['event', '-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='similarevent',
+            index=models.Index(fields=['event', '-score'], name='similar_event_score_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0005_similarevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=124, verbose_name='Название серии')),
+                ('description', models.TextField(verbose_name='Описание серии')),
+                ('duration', models.PositiveIntegerField(verbose_name='Длительность занятия (мин)')),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True, verbose_name='Максимальное количество участников')),
+                ('dtstart', models.DateTimeField(verbose_name='Дата и время первого занятия')),
+                ('rrule', models.CharField(help_text='Например, FREQ=WEEKLY;BYDAY=TU,TH', max_length=256, verbose_name='Правило повторения (RFC 5545)')),
+                ('activity', models.ManyToManyField(related_name='series', to='events.activity', verbose_name='Вид активности серии')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_author', to=settings.AUTH_USER_MODEL)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='events.location')),
+            ],
+            options={
+                'verbose_name': 'Серия мероприятий',
+                'verbose_name_plural': 'Серии мероприятий',
+                'ordering': ['-dtstart'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='events.eventseries', verbose_name='Серия мероприятий'),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('series', 'datetime'), name='unique_series_occurrence'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_eventseries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='is_archived',
+            field=models.BooleanField(default=False, help_text='Устанавливается командой archive_events', verbose_name='В архиве'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['datetime'], name='event_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['datetime'], name='event_active_datetime_idx'),
+        ),
+    ]
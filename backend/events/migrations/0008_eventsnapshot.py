@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-19 21:10
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_is_archived'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSnapshot',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='events.event', verbose_name='Мероприятие')),
+                ('data', models.BinaryField(verbose_name='JSON мероприятия')),
+                ('comment_ids', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(), default=list, size=None, verbose_name='ID комментариев в снимке')),
+                ('updated', models.DateTimeField(verbose_name='Дата построения')),
+            ],
+            options={
+                'verbose_name': 'Снимок мероприятия',
+                'verbose_name_plural': 'Снимки мероприятий',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.5 on 2026-10-19 22:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.renderers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0008_eventsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ')),
+                ('fingerprint', models.CharField(help_text='SHA-256 метода, пути и тела запроса', max_length=64, verbose_name='Отпечаток запроса')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('response', models.JSONField(encoder=utils.renderers.APIJSONEncoder, verbose_name='Ответ')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата запроса')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import utils.renderers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencykey',
+            name='response',
+            field=models.JSONField(blank=True, encoder=utils.renderers.APIJSONEncoder, null=True, verbose_name='Ответ'),
+        ),
+        migrations.AlterField(
+            model_name='idempotencykey',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Код ответа'),
+        ),
+    ]
@@ -1,6 +1,14 @@
+import datetime
+
 from django.conf import settings
 from django.contrib.gis.db import models as gismodels
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.utils import timezone
+
+from utils.db import count_subquery
+from utils.fields import ALL_FIELDS
+from utils.renderers import APIJSONEncoder
 
 
 class Activity(models.Model):
@@ -37,6 +45,109 @@ class Location(gismodels.Model):
         return self.address
 
 
+class EventQuerySet(models.QuerySet):
+    """Набор запросов для мероприятий."""
+
+    def with_user_data(self, user, selection=ALL_FIELDS):
+        """Данные, необходимые сериализатору мероприятия,
+        за фиксированное число запросов. Данные полей, не выбранных
+        в selection, не загружаются."""
+        queryset = self
+        related = [name for name in ('author', 'location')
+                   if selection.expands(name)]
+        if related:
+            queryset = queryset.select_related(*related)
+        if selection.includes('activity'):
+            queryset = queryset.prefetch_related('activity')
+        if selection.includes('comments'):
+            queryset = queryset.prefetch_related(models.Prefetch(
+                'comments',
+                queryset=Comment.objects.with_user_data(
+                    user
+                ).order_by('-id')[:3],
+                to_attr='latest_comments'
+            ))
+
+        annotations = {}
+        if selection.includes('is_favorite'):
+            annotations['favorite_flag'] = (
+                models.Value(False) if user.is_anonymous
+                else models.Exists(FavoriteEvent.objects.filter(
+                    event=models.OuterRef('pk'), user=user
+                ))
+            )
+        if selection.includes('is_participate'):
+            annotations['participate_flag'] = (
+                models.Value(False) if user.is_anonymous
+                else models.Exists(Participation.objects.filter(
+                    event=models.OuterRef('pk'), user=user
+                ))
+            )
+        return queryset.annotate(**annotations)
+
+    def upcoming(self):
+        """Предстоящие мероприятия. Условие is_archived=False позволяет
+        использовать небольшой частичный индекс по дате вместо индекса
+        по всей таблице."""
+        return self.filter(is_archived=False, datetime__gte=timezone.now())
+
+    def recount_participants(self):
+        """Пересчитывает счетчик участников по таблице участия."""
+        return self.update(participants_count=count_subquery(
+            Participation.objects.all(), 'event'
+        ))
+
+
+class EventSeries(models.Model):
+    """Модель серии регулярных мероприятий.
+    Занятия серии вычисляются по правилу повторения и сохраняются
+    в Event только при первой записи на занятие или комментарии к нему."""
+    name = models.CharField(
+        verbose_name='Название серии',
+        max_length=124
+    )
+    description = models.TextField(verbose_name='Описание серии')
+    activity = models.ManyToManyField(
+        Activity,
+        related_name='series',
+        verbose_name='Вид активности серии'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='series_author',
+        on_delete=models.CASCADE
+    )
+    location = models.ForeignKey(
+        Location,
+        related_name='series',
+        on_delete=models.CASCADE
+    )
+    duration = models.PositiveIntegerField(
+        verbose_name='Длительность занятия (мин)',
+    )
+    capacity = models.PositiveIntegerField(
+        verbose_name='Максимальное количество участников',
+        null=True,
+        blank=True
+    )
+    dtstart = models.DateTimeField(
+        verbose_name='Дата и время первого занятия'
+    )
+    rrule = models.CharField(
+        verbose_name='Правило повторения (RFC 5545)',
+        max_length=256,
+        help_text='Например, FREQ=WEEKLY;BYDAY=TU,TH'
+    )
+
+    class Meta:
+        ordering = ['-dtstart']
+        verbose_name = 'Серия мероприятий'
+        verbose_name_plural = 'Серии мероприятий'
+
+    def __str__(self):
+        return self.name
+
+
 class Event(models.Model):
     """Модель мероприятия."""
     name = models.CharField(
@@ -65,15 +176,67 @@ class Event(models.Model):
         related_name='events',
         on_delete=models.CASCADE
     )
+    capacity = models.PositiveIntegerField(
+        verbose_name='Максимальное количество участников',
+        null=True,
+        blank=True
+    )
+    participants_count = models.PositiveIntegerField(
+        verbose_name='Количество участников',
+        default=0
+    )
+    series = models.ForeignKey(
+        EventSeries,
+        verbose_name='Серия мероприятий',
+        related_name='events',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    is_archived = models.BooleanField(
+        verbose_name='В архиве',
+        default=False,
+        help_text='Устанавливается командой archive_events'
+    )
+
+    objects = EventQuerySet.as_manager()
+
+    # Счетчики, которые меняются только условными UPDATE с F().
+    COUNTER_FIELDS = ('participants_count',)
 
     class Meta:
         ordering = ['-datetime']
         verbose_name = 'Мероприятие'
         verbose_name_plural = 'Мероприятия'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'datetime'],
+                name='unique_series_occurrence'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['datetime'],
+                         name='event_datetime_idx'),
+            models.Index(fields=['datetime'],
+                         condition=models.Q(is_archived=False),
+                         name='event_active_datetime_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Сохранение существующего мероприятия не перезаписывает
+        счетчики значениями, прочитанными до изменения: участие,
+        добавленное за это время, не теряется."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class ActivityForEvent(models.Model):
     """Вспомогательная модель для связи 'вид активности - мероприятие'."""
@@ -101,6 +264,25 @@ class ActivityForEvent(models.Model):
         return f'{self.event}: {self.activity}'
 
 
+class CommentQuerySet(models.QuerySet):
+    """Набор запросов для комментариев."""
+
+    def with_user_data(self, user):
+        """Данные, необходимые сериализатору комментария,
+        за фиксированное число запросов."""
+        if user.is_anonymous:
+            liked_flag = models.Value(False)
+        else:
+            liked_flag = models.Exists(Like.objects.filter(
+                comment=models.OuterRef('pk'), user=user
+            ))
+
+        return self.select_related('author').annotate(
+            liked_flag=liked_flag,
+            likes_total=count_subquery(Like.objects.all(), 'comment')
+        )
+
+
 class Comment(models.Model):
     """Модель комментария к мероприятию."""
     event = models.ForeignKey(
@@ -127,6 +309,8 @@ class Comment(models.Model):
         verbose_name='Лайки'
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Комментарий'
@@ -194,6 +378,208 @@ class Participation(models.Model):
                 f'{self.event}')
 
 
+class Waitlist(models.Model):
+    """Модель листа ожидания участия в мероприятии."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Участник',
+        related_name='waitlist_for_user',
+        on_delete=models.CASCADE
+    )
+    event = models.ForeignKey(
+        Event,
+        verbose_name='Мероприятие',
+        related_name='waitlist_for_event',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ['created', 'id']
+        verbose_name = 'Лист ожидания'
+        verbose_name_plural = 'Лист ожидания'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'event'],
+                name='unique_waitlist'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['event', 'created'],
+                         name='waitlist_event_created_idx')
+        ]
+
+    def __str__(self):
+        return (f'Пользователь {self.user.username} в листе ожидания '
+                f'мероприятия {self.event}')
+
+
+class EventRecommendation(models.Model):
+    """Модель рекомендации мероприятия пользователю.
+    Заполняется командой build_recommendations."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        related_name='recommendations_for_user',
+        on_delete=models.CASCADE
+    )
+    event = models.ForeignKey(
+        Event,
+        verbose_name='Мероприятие',
+        related_name='recommendations_for_event',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField('Оценка')
+    created = models.DateTimeField(
+        'Дата расчета',
+        auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ['user', '-score']
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'event'],
+                name='unique_recommendation'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='recommendation_user_score_idx')
+        ]
+
+    def __str__(self):
+        return (f'Мероприятие {self.event} рекомендовано пользователю '
+                f'{self.user.username}')
+
+
+class SimilarEvent(models.Model):
+    """Модель похожего мероприятия. Обновляется при создании
+    и изменении мероприятий и командой build_similar_events."""
+    event = models.ForeignKey(
+        Event,
+        verbose_name='Мероприятие',
+        related_name='similar_events',
+        on_delete=models.CASCADE
+    )
+    similar = models.ForeignKey(
+        Event,
+        verbose_name='Похожее мероприятие',
+        related_name='similar_to_events',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['event', '-score']
+        verbose_name = 'Похожее мероприятие'
+        verbose_name_plural = 'Похожие мероприятия'
+        indexes = [
+            models.Index(fields=['event', '-score'],
+                         name='similar_event_score_idx')
+        ]
+
+    def __str__(self):
+        return f'Мероприятие {self.similar} похоже на {self.event}'
+
+
+class EventSnapshot(models.Model):
+    """Модель готового JSON публичной части мероприятия, который
+    отдается при просмотре мероприятия без сериализации.
+    Удаляется при изменении данных мероприятия и перестраивается
+    в фоне после фиксации транзакции."""
+    event = models.OneToOneField(
+        Event,
+        verbose_name='Мероприятие',
+        related_name='snapshot',
+        primary_key=True,
+        on_delete=models.CASCADE
+    )
+    data = models.BinaryField('JSON мероприятия')
+    comment_ids = ArrayField(
+        models.PositiveIntegerField(),
+        verbose_name='ID комментариев в снимке',
+        default=list
+    )
+    updated = models.DateTimeField('Дата построения')
+
+    class Meta:
+        verbose_name = 'Снимок мероприятия'
+        verbose_name_plural = 'Снимки мероприятий'
+
+    def __str__(self):
+        return f'Снимок мероприятия {self.event_id}'
+
+
+class IdempotencyKey(models.Model):
+    """Модель ключа идемпотентности запроса на создание объекта.
+    Хранит ответ на первый запрос с ключом, который возвращается
+    при повторах в течение IDEMPOTENCY_KEY_TTL часов. Пока первый
+    запрос выполняется, ключ зарезервирован: код и тело ответа пусты."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        related_name='idempotency_keys',
+        on_delete=models.CASCADE
+    )
+    key = models.CharField('Ключ', max_length=255)
+    fingerprint = models.CharField(
+        'Отпечаток запроса',
+        max_length=64,
+        help_text='SHA-256 метода, пути и тела запроса'
+    )
+    status_code = models.PositiveSmallIntegerField(
+        'Код ответа',
+        null=True,
+        blank=True
+    )
+    response = models.JSONField(
+        'Ответ',
+        encoder=APIJSONEncoder,
+        null=True,
+        blank=True
+    )
+    created = models.DateTimeField(
+        'Дата запроса',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.key} ({self.user_id})'
+
+    def is_expired(self):
+        return self.created < timezone.now() - datetime.timedelta(
+            hours=settings.IDEMPOTENCY_KEY_TTL
+        )
+
+    def is_pending(self):
+        return self.status_code is None
+
+    def is_abandoned(self):
+        """Запрос, зарезервировавший ключ, не сохранил ответ вовремя."""
+        return self.is_pending() and (
+            self.created < timezone.now() - datetime.timedelta(
+                seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT
+            )
+        )
+
+
 class Like(models.Model):
     """Модель лайков комментариев."""
     user = models.ForeignKey(
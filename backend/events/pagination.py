@@ -4,3 +4,5 @@ from rest_framework.pagination import PageNumberPagination
 class CustomPaginator(PageNumberPagination):
     """Кастомный пагинатор для вывода определенного количества объектов."""
     page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,111 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import Event, Participation, Waitlist
+
+
+PARTICIPANT = 'participant'
+WAITLISTED = 'waitlisted'
+ALREADY_EXISTS = 'exists'
+
+
+def take_place(event_id):
+    """Занимает место одним условным UPDATE счетчика участников.
+    Блокировка строки мероприятия держится только до конца
+    короткой транзакции, в которой создается участие."""
+    return Event.objects.filter(pk=event_id).filter(
+        Q(capacity__isnull=True)
+        | Q(participants_count__lt=F('capacity'))
+    ).update(participants_count=F('participants_count') + 1)
+
+
+def add_participant(user_id, event_id):
+    """Создает участие, если есть свободное место."""
+    with transaction.atomic():
+        if not take_place(event_id):
+            return False
+        participation = Participation(user_id=user_id, event_id=event_id)
+        participation._place_taken = True
+        participation.save()
+    return True
+
+
+def lock_event(event_id):
+    """Блокирует строку мероприятия до конца транзакции: запись
+    в обход листа ожидания и перевод из него выполняются по очереди.
+    Возвращает вместимость и счетчик участников или None."""
+    return Event.objects.select_for_update().filter(
+        pk=event_id
+    ).values_list('capacity', 'participants_count').first()
+
+
+def promote_waitlist(event_id):
+    """Переводит пользователей из листа ожидания в участники в порядке
+    записи, пока есть свободные места. Каждый перевод выполняется
+    в короткой транзакции под блокировкой мероприятия, поэтому
+    параллельные вызовы не обгоняют друг друга."""
+    while True:
+        with transaction.atomic():
+            state = lock_event(event_id)
+            if state is None:
+                return
+            capacity, participants_count = state
+            if capacity is not None and participants_count >= capacity:
+                return
+            entry = Waitlist.objects.filter(event_id=event_id).first()
+            if entry is None:
+                return
+            entry.delete()
+            try:
+                add_participant(entry.user_id, event_id)
+            except IntegrityError:
+                # Пользователь уже участвует, запись в листе ожидания
+                # просто удаляется.
+                pass
+
+
+def participate(user, event):
+    """Записывает пользователя на мероприятие или в лист ожидания.
+    Пока лист ожидания не пуст, новые пользователи встают в его
+    конец, а свободные места отдаются по очереди."""
+    if (Participation.objects.filter(user=user, event=event).exists()
+            or Waitlist.objects.filter(user=user, event=event).exists()):
+        return ALREADY_EXISTS
+
+    try:
+        with transaction.atomic():
+            lock_event(event.pk)
+            if (not Waitlist.objects.filter(event=event).exists()
+                    and add_participant(user.pk, event.pk)):
+                return PARTICIPANT
+            Waitlist.objects.create(user=user, event=event)
+    except IntegrityError:
+        return ALREADY_EXISTS
+
+    promote_waitlist(event.pk)
+    if Participation.objects.filter(user=user, event=event).exists():
+        return PARTICIPANT
+    return WAITLISTED
+
+
+def leave(user, event):
+    """Отменяет участие или запись в лист ожидания.
+    Освободившееся место отдается первому в листе ожидания."""
+    deleted, _ = Participation.objects.filter(user=user, event=event).delete()
+    if deleted:
+        promote_waitlist(event.pk)
+        return True
+    deleted, _ = Waitlist.objects.filter(user=user, event=event).delete()
+    return bool(deleted)
+
+
+def waitlist_position(user, event):
+    entry = Waitlist.objects.filter(user=user, event=event).first()
+    if entry is None:
+        return None
+    return Waitlist.objects.filter(
+        event=event
+    ).filter(
+        Q(created__lt=entry.created)
+        | Q(created=entry.created, id__lt=entry.id)
+    ).count() + 1
@@ -0,0 +1,242 @@
+import datetime
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import FavoriteActivity, Subscribe
+
+from .models import (Activity,
+                     ActivityForEvent,
+                     Event,
+                     EventRecommendation,
+                     Participation)
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def unit_vectors(points):
+    """Переводит массив точек (долгота, широта) в единичные векторы,
+    чтобы расстояния считались через скалярное произведение."""
+    longitude, latitude = np.radians(
+        np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    ).T
+    cos_latitude = np.cos(latitude)
+    return np.stack((cos_latitude * np.cos(longitude),
+                     cos_latitude * np.sin(longitude),
+                     np.sin(latitude)), axis=1)
+
+
+def index_of(ids):
+    return {value: index for index, value in enumerate(ids)}
+
+
+class RecommendationBuilder:
+    """Пакетный расчет рекомендаций предстоящих мероприятий.
+
+    Оценка мероприятия для пользователя складывается из доли видов
+    активности мероприятия среди любимых активностей пользователя,
+    близости к центру мест, где пользователь уже участвовал,
+    популярности мероприятия и подписки на его автора.
+    Матрицы пользователь × мероприятие считаются порциями пользователей.
+    """
+
+    def __init__(self, top_k=None, days=None, history_days=365,
+                 batch_size=256, weights=None):
+        self.top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+        self.days = days or settings.RECOMMENDATIONS_DAYS
+        self.history_days = history_days
+        self.batch_size = batch_size
+        self.weights = {**settings.RECOMMENDATION_WEIGHTS, **(weights or {})}
+        self.now = timezone.now()
+
+    def load_events(self):
+        events = Event.objects.filter(
+            is_archived=False,
+            datetime__gte=self.now,
+            datetime__lte=self.now + datetime.timedelta(days=self.days)
+        ).order_by()
+        rows = list(events.values_list('id',
+                                       'author_id',
+                                       'location__point',
+                                       'participants_count'))
+        self.event_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.event_index = index_of(self.event_ids.tolist())
+        author_ids = [row[1] for row in rows]
+        self.event_vectors = unit_vectors(
+            [(row[2].x, row[2].y) for row in rows]
+        )
+
+        counts = np.log1p(np.array([row[3] for row in rows],
+                                   dtype=np.float32))
+        if counts.size and counts.max():
+            counts /= counts.max()
+        self.popularity = counts
+
+        activity_index = index_of(Activity.objects.values_list('id',
+                                                               flat=True))
+        self.event_activities = np.zeros(
+            (len(rows), len(activity_index)), dtype=np.float32
+        )
+        for event_id, activity_id in ActivityForEvent.objects.filter(
+            event__in=events
+        ).values_list('event_id', 'activity_id').iterator():
+            self.event_activities[self.event_index[event_id],
+                                  activity_index[activity_id]] = 1
+        self.event_activities /= np.maximum(
+            self.event_activities.sum(axis=1, keepdims=True), 1
+        )
+        self.activity_index = activity_index
+
+        authors = sorted(set(author_ids))
+        self.author_index = index_of(authors)
+        self.event_authors = np.array(
+            [self.author_index[author_id] for author_id in author_ids],
+            dtype=np.int64
+        )
+        self.event_author_ids = np.array(author_ids, dtype=np.int64)
+        return events
+
+    def load_users(self, events):
+        users = get_user_model().objects.filter(is_active=True)
+        self.user_ids = np.array(
+            sorted(users.values_list('id', flat=True)), dtype=np.int64
+        )
+        self.user_index = index_of(self.user_ids.tolist())
+        user_count = len(self.user_ids)
+
+        self.user_activities = np.zeros(
+            (user_count, len(self.activity_index)), dtype=np.float32
+        )
+        for user_id, activity_id in FavoriteActivity.objects.filter(
+            user__in=users
+        ).values_list('user_id', 'activity_id').iterator():
+            self.user_activities[self.user_index[user_id],
+                                 self.activity_index[activity_id]] = 1
+
+        venue_users, venue_points = [], []
+        for user_id, point in Participation.objects.filter(
+            user__in=users,
+            event__datetime__gte=self.now - datetime.timedelta(
+                days=self.history_days
+            )
+        ).values_list('user_id', 'event__location__point').iterator():
+            venue_users.append(self.user_index[user_id])
+            venue_points.append((point.x, point.y))
+        venues = np.zeros((user_count, 3))
+        np.add.at(venues, np.array(venue_users, dtype=np.int64),
+                  unit_vectors(venue_points))
+        norms = np.linalg.norm(venues, axis=1)
+        self.has_venues = norms > 0
+        self.venue_vectors = venues / np.where(self.has_venues,
+                                               norms, 1)[:, None]
+
+        self.follows = self.pairs(
+            Subscribe.objects.filter(
+                user__in=users, author_id__in=list(self.author_index)
+            ).values_list('user_id', 'author_id'),
+            self.author_index
+        )
+        self.excluded = self.pairs(
+            Participation.objects.filter(
+                user__in=users, event__in=events
+            ).values_list('user_id', 'event_id'),
+            self.event_index
+        )
+
+    def pairs(self, queryset, column_index):
+        """Пары (строка пользователя, столбец), отсортированные
+        по строке, чтобы порции выбирались бинарным поиском."""
+        pairs = np.array([
+            (self.user_index[user_id], column_index[column_id])
+            for user_id, column_id in queryset.iterator()
+        ], dtype=np.int64).reshape(-1, 2)
+        return pairs[np.argsort(pairs[:, 0], kind='stable')]
+
+    def batch_pairs(self, pairs, start, stop):
+        left, right = np.searchsorted(pairs[:, 0], (start, stop))
+        rows, columns = pairs[left:right].T
+        return rows - start, columns
+
+    def score(self, start, stop):
+        """Матрица оценок для пользователей с индексами [start, stop)."""
+        weights = self.weights
+        rows = stop - start
+
+        scores = weights['activity'] * (
+            self.user_activities[start:stop] @ self.event_activities.T
+        )
+
+        cosine = np.clip(self.venue_vectors[start:stop]
+                         @ self.event_vectors.T, -1, 1)
+        distance = np.arccos(cosine) * EARTH_RADIUS_KM
+        proximity = np.exp(
+            -distance / settings.RECOMMENDATION_DISTANCE_SCALE_KM
+        )
+        proximity[~self.has_venues[start:stop]] = 0
+        scores += weights['distance'] * proximity.astype(np.float32)
+
+        scores += weights['popularity'] * self.popularity
+
+        followed = np.zeros((rows, len(self.author_index)), dtype=np.float32)
+        followed[self.batch_pairs(self.follows, start, stop)] = 1
+        scores += weights['follow'] * followed[:, self.event_authors]
+
+        scores[self.batch_pairs(self.excluded, start, stop)] = -np.inf
+        own = self.event_author_ids[None, :] == self.user_ids[start:stop,
+                                                              None]
+        scores[own] = -np.inf
+        return scores
+
+    def top(self, scores):
+        """Индексы и оценки лучших мероприятий для каждой строки."""
+        count = min(self.top_k, scores.shape[1])
+        candidates = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        best = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-best, axis=1, kind='stable')
+        return (np.take_along_axis(candidates, order, axis=1),
+                np.take_along_axis(best, order, axis=1))
+
+    def save(self, start, stop, indexes, scores):
+        user_ids = self.user_ids[start:stop].tolist()
+        recommendations = [
+            EventRecommendation(user_id=user_id,
+                                event_id=int(self.event_ids[event]),
+                                score=float(score))
+            for user_id, events, event_scores in zip(user_ids,
+                                                     indexes,
+                                                     scores)
+            for event, score in zip(events, event_scores)
+            if np.isfinite(score) and score > 0
+        ]
+        with transaction.atomic():
+            EventRecommendation.objects.filter(user_id__in=user_ids).delete()
+            EventRecommendation.objects.bulk_create(recommendations,
+                                                    batch_size=1000)
+        return len(recommendations)
+
+    def build(self):
+        """Пересчитывает рекомендации всех активных пользователей."""
+        events = self.load_events()
+        self.load_users(events)
+
+        created = 0
+        if len(self.event_ids):
+            for start in range(0, len(self.user_ids), self.batch_size):
+                stop = min(start + self.batch_size, len(self.user_ids))
+                indexes, scores = self.top(self.score(start, stop))
+                created += self.save(start, stop, indexes, scores)
+
+        EventRecommendation.objects.filter(
+            event__datetime__lt=self.now
+        ).delete()
+        EventRecommendation.objects.exclude(user__is_active=True).delete()
+        return {
+            'users': len(self.user_ids),
+            'events': len(self.event_ids),
+            'recommendations': created,
+        }
@@ -1,18 +1,42 @@
-from django.db import transaction
 from django.conf import settings
-
-from geopy import Yandex
+from django.db import transaction
+from django.utils import timezone
 
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from .models import (Activity,
                      Event,
+                     EventSeries,
                      Comment,
                      Location,
                      Participation)
 
-from users.serializers import CustomUserContextSerializer
+from users.serializers import (CustomUserContextSerializer,
+                               user_context_representation)
+from utils.fields import ALL_FIELDS, SparseFieldsSerializerMixin
+
+from . import geocoder
+from .series import Occurrence, parse_rule
+from .similar import refresh_similar_events
+
+
+EVENT_FIELDS = ('id',
+                'name',
+                'description',
+                'activity',
+                'datetime',
+                'author',
+                'duration',
+                'location',
+                'comments',
+                'is_favorite',
+                'is_participate',
+                'participants_count',
+                'capacity',
+                'series',
+                'occurrence')
+EVENT_EXPANDABLE_FIELDS = ('activity', 'author', 'location')
 
 
 class ActivitySerializer(serializers.ModelSerializer):
@@ -59,17 +83,52 @@ class CommentSerializer(serializers.ModelSerializer):
         return instance
 
     def get_is_liked(self, comment):
+        if hasattr(comment, 'liked_flag'):
+            return comment.liked_flag
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return comment.users_for_liked_comment.filter(user=user).exists()
 
     def get_likes_count(self, comment):
+        if hasattr(comment, 'likes_total'):
+            return comment.likes_total
         return comment.users_for_liked_comment.all().count()
 
 
-class EventSerializer(serializers.ModelSerializer):
+class GeocodedLocationMixin:
+    """Дополняет локацию адресом или координатами через геокодер."""
+
+    def get_location(self, location):
+        if location.get('address'):
+            location_data = geocoder.geocode(location['address'])
+            if location_data is None:
+                raise serializers.ValidationError(
+                    {'location': 'Адрес не найден.'}
+                )
+            location['address'] = location_data.address
+            location['point'] = f'POINT({location_data.longitude} {location_data.latitude})'
+
+        elif location.get('point'):
+            point = location.get('point')
+            location_data = geocoder.reverse(point)
+            if location_data is None:
+                raise serializers.ValidationError(
+                    {'location': 'Адрес по координатам не найден.'}
+                )
+
+            location['address'] = location_data.address
+            location['point'] = f'POINT({point})'
+
+        return location
+
+
+class EventSerializer(SparseFieldsSerializerMixin,
+                      GeocodedLocationMixin,
+                      serializers.ModelSerializer):
     """Сериализатор для создания и обновления постов о мероприятиях."""
+    expandable_fields = EVENT_EXPANDABLE_FIELDS
+
     name = serializers.CharField(required=True)
     activity = serializers.PrimaryKeyRelatedField(
         queryset=Activity.objects.all(), many=True
@@ -79,51 +138,26 @@ class EventSerializer(serializers.ModelSerializer):
         default=serializers.CurrentUserDefault()
     )
     duration = serializers.IntegerField(required=True)
+    capacity = serializers.IntegerField(min_value=1,
+                                        required=False,
+                                        allow_null=True)
     location = LocationSerializer()
     is_favorite = serializers.SerializerMethodField()
     is_participate = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
     participants_count = serializers.SerializerMethodField()
+    series = serializers.PrimaryKeyRelatedField(read_only=True)
+    occurrence = serializers.SerializerMethodField()
 
     class Meta:
         model = Event
-        fields = ('id',
-                  'name',
-                  'description',
-                  'activity',
-                  'datetime',
-                  'author',
-                  'duration',
-                  'location',
-                  'comments',
-                  'is_favorite',
-                  'is_participate',
-                  'participants_count')
+        fields = EVENT_FIELDS
         
         validators = [
             UniqueTogetherValidator(queryset=Event.objects.all(),
                                     fields=['name', 'author', 'datetime'])
         ]
         
-    def get_location(self, location):
-        if location.get('address'):
-            location_data = Yandex(
-                api_key=settings.API_KEY
-            ).geocode(location['address'])
-            location['address'] = location_data.address
-            location['point'] = f'POINT({location_data.longitude} {location_data.latitude})'
-
-        elif location.get('point'):
-            point = location.get('point')
-            location_data = Yandex(
-                api_key=settings.API_KEY
-            ).reverse(point)
-
-            location['address'] = location_data.address
-            location['point'] = f'POINT({point})'
-
-        return location
-
 
     def validate_name(self, value):
         if len(value) > 124:
@@ -166,37 +200,50 @@ class EventSerializer(serializers.ModelSerializer):
         event.activity.set(activity_list)
 
         Participation.objects.create(event=event, user=user)
+        transaction.on_commit(lambda: refresh_similar_events(event.pk))
         return event
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        activity_list = validated_data.pop('activity', instance.activity)
+        activity_list = validated_data.pop('activity', None)
         instance = super().update(instance, validated_data)
-        instance.save()
-        instance.activity.clear()
-        instance.activity.set(activity_list)
+        if activity_list is not None:
+            instance.activity.set(activity_list)
+        transaction.on_commit(lambda: refresh_similar_events(instance.pk))
         return instance
 
     def get_is_favorite(self, event):
+        if hasattr(event, 'favorite_flag'):
+            return event.favorite_flag
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return user.favorite_for_user.filter(event=event).exists()
 
     def get_is_participate(self, event):
+        if hasattr(event, 'participate_flag'):
+            return event.participate_flag
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return user.events_participation_for_user.filter(event=event).exists()
 
     def get_participants_count(self, event):
-        return event.users_participation_for_event.all().count()
+        return event.participants_count
+
+    def get_occurrence(self, event):
+        if event.series_id is None:
+            return None
+        return format_occurrence(event.datetime)
 
     def get_comments(self, event):
         request = self.context.get('request')
-        event = event.comments.all().order_by('-id')[:3]
+        if hasattr(event, 'latest_comments'):
+            comments = event.latest_comments
+        else:
+            comments = event.comments.all().order_by('-id')[:3]
         serializer = CommentSerializer(
-            event,
+            comments,
             context={'request': request},
             many=True
         )
@@ -204,6 +251,300 @@ class EventSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['activity'] = instance.activity.values()
+        selection = self.context.get('selection', ALL_FIELDS)
+        if 'activity' in data and selection.expands('activity'):
+            data['activity'] = activity_representation(
+                instance.activity.all()
+            )
         # data['location'] = instance.location.address
         return data
+
+
+class CalendarQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса календаря мероприятий."""
+    month = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$',
+                                   required=False)
+    latitude = serializers.FloatField(min_value=-90, max_value=90,
+                                      required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180,
+                                       required=False)
+    radius = serializers.FloatField(min_value=0.1, max_value=500,
+                                    required=False)
+
+    def validate(self, data):
+        geo_fields = [field for field in ('latitude', 'longitude', 'radius')
+                      if field in data]
+        if geo_fields and len(geo_fields) != 3:
+            raise serializers.ValidationError(
+                'Для поиска по радиусу укажите latitude, longitude и radius.'
+            )
+        return data
+
+
+class HeatmapQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса тепловой карты мероприятий."""
+    date = serializers.DateField(required=False)
+    bbox = serializers.RegexField(
+        r'^-?\d+(\.\d+)?(,-?\d+(\.\d+)?){3}$',
+        help_text='min_longitude,min_latitude,max_longitude,max_latitude'
+    )
+    cell_size = serializers.FloatField(min_value=0.001, max_value=1,
+                                       required=False)
+
+    def validate_bbox(self, value):
+        min_x, min_y, max_x, max_y = map(float, value.split(','))
+        if not (-180 <= min_x < max_x <= 180 and -90 <= min_y < max_y <= 90):
+            raise serializers.ValidationError(
+                'Некорректные границы области.'
+            )
+        return min_x, min_y, max_x, max_y
+
+
+def format_date(value):
+    """Дата в формате '%d.%m.%Y' в текущем часовом поясе,
+    как у DateTimeField(format='%d.%m.%Y')."""
+    return timezone.localtime(value).strftime('%d.%m.%Y')
+
+
+def format_occurrence(value):
+    """Дата и время занятия серии в ISO 8601, по которым занятие
+    указывается при записи и комментировании."""
+    return timezone.localtime(value).isoformat()
+
+
+class CommentReadSerializer(serializers.BaseSerializer):
+    """Быстрый сериализатор списков комментариев только для чтения.
+    Принимает объекты из Comment.objects.with_user_data() и возвращает
+    то же представление, что и CommentSerializer."""
+
+    def to_representation(self, comment):
+        return {
+            'id': comment.id,
+            'author': user_context_representation(comment.author),
+            'text': comment.text,
+            'pub_date': format_date(comment.pub_date),
+            'event': comment.event_id,
+            'is_liked': comment.liked_flag,
+            'likes_count': comment.likes_total,
+        }
+
+
+def activity_representation(activities, expanded=True):
+    if not expanded:
+        return [activity.id for activity in activities]
+    return [{'id': activity.id, 'name': activity.name}
+            for activity in activities]
+
+
+def location_representation(location):
+    return {
+        'id': location.id,
+        'address': location.address,
+        'point': str(location.point),
+    }
+
+
+class EventReadSerializer(serializers.BaseSerializer):
+    """Быстрый сериализатор списков мероприятий только для чтения.
+    Принимает объекты из Event.objects.with_user_data() и возвращает
+    то же представление, что и EventSerializer. Значения полей,
+    не выбранных параметром fields, не вычисляются."""
+
+    def to_representation(self, event):
+        selection = self.context.get('selection', ALL_FIELDS)
+        if isinstance(event, Occurrence):
+            values = self.occurrence_values(event, selection)
+        else:
+            values = self.event_values(event, selection)
+        return {name: value() for name, value in values.items()
+                if selection.includes(name)}
+
+    def event_values(self, event, selection):
+        comment_representation = CommentReadSerializer().to_representation
+        return {
+            'id': lambda: event.id,
+            'name': lambda: event.name,
+            'description': lambda: event.description,
+            'activity': lambda: activity_representation(
+                event.activity.all(), selection.expands('activity')
+            ),
+            'datetime': lambda: format_date(event.datetime),
+            'author': lambda: (
+                user_context_representation(event.author)
+                if selection.expands('author') else event.author_id
+            ),
+            'duration': lambda: event.duration,
+            'location': lambda: (
+                location_representation(event.location)
+                if selection.expands('location') else event.location_id
+            ),
+            'comments': lambda: [
+                comment_representation(comment)
+                for comment in event.latest_comments
+            ],
+            'is_favorite': lambda: event.favorite_flag,
+            'is_participate': lambda: event.participate_flag,
+            'participants_count': lambda: event.participants_count,
+            'capacity': lambda: event.capacity,
+            'series': lambda: event.series_id,
+            'occurrence': lambda: (
+                format_occurrence(event.datetime)
+                if event.series_id is not None else None
+            ),
+        }
+
+    def occurrence_values(self, occurrence, selection):
+        """Несохраненное занятие серии в том же формате."""
+        series = occurrence.series
+        return {
+            'id': lambda: None,
+            'name': lambda: series.name,
+            'description': lambda: series.description,
+            'activity': lambda: activity_representation(
+                series.activity.all(), selection.expands('activity')
+            ),
+            'datetime': lambda: format_date(occurrence.datetime),
+            'author': lambda: (
+                user_context_representation(series.author)
+                if selection.expands('author') else series.author_id
+            ),
+            'duration': lambda: series.duration,
+            'location': lambda: (
+                location_representation(series.location)
+                if selection.expands('location') else series.location_id
+            ),
+            'comments': lambda: [],
+            'is_favorite': lambda: False,
+            'is_participate': lambda: False,
+            'participants_count': lambda: 0,
+            'capacity': lambda: series.capacity,
+            'series': lambda: series.id,
+            'occurrence': lambda: format_occurrence(occurrence.datetime),
+        }
+
+
+class EventSeriesSerializer(GeocodedLocationMixin,
+                            serializers.ModelSerializer):
+    """Сериализатор серий регулярных мероприятий.
+    Изменение серии не затрагивает уже сохраненные занятия."""
+    activity = serializers.PrimaryKeyRelatedField(
+        queryset=Activity.objects.all(), many=True, allow_empty=False
+    )
+    author = CustomUserContextSerializer(
+        default=serializers.CurrentUserDefault()
+    )
+    duration = serializers.IntegerField(min_value=1)
+    capacity = serializers.IntegerField(min_value=1,
+                                        required=False,
+                                        allow_null=True)
+    location = LocationSerializer()
+
+    class Meta:
+        model = EventSeries
+        fields = ('id',
+                  'name',
+                  'description',
+                  'activity',
+                  'author',
+                  'duration',
+                  'location',
+                  'capacity',
+                  'dtstart',
+                  'rrule')
+
+    def validate(self, data):
+        rule = data.get('rrule', getattr(self.instance, 'rrule', None))
+        dtstart = data.get('dtstart', getattr(self.instance, 'dtstart', None))
+        try:
+            parse_rule(rule, dtstart)
+        except (TypeError, ValueError) as error:
+            raise serializers.ValidationError(
+                {'rrule': f'Некорректное правило повторения: {error}'}
+            )
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        activity_list = validated_data.pop('activity')
+        location = self.get_location(validated_data.pop('location'))
+        location = Location.objects.create(**location)
+
+        series = EventSeries.objects.create(location=location,
+                                            **validated_data)
+        series.activity.set(activity_list)
+        return series
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        activity_list = validated_data.pop('activity', None)
+        location = validated_data.pop('location', None)
+        if location is not None:
+            location = self.get_location(location)
+            validated_data['location'] = Location.objects.create(**location)
+        instance = super().update(instance, validated_data)
+        if activity_list is not None:
+            instance.activity.set(activity_list)
+        return instance
+
+
+class OccurrenceWindowSerializer(serializers.Serializer):
+    """Сериализатор интервала дат, в котором в список мероприятий
+    добавляются занятия серий."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if not data:
+            return data
+        if len(data) != 2:
+            raise serializers.ValidationError(
+                'Для вывода занятий серий укажите date_from и date_to.'
+            )
+        days = (data['date_to'] - data['date_from']).days
+        if not 0 <= days < settings.SERIES_MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(
+                'Интервал должен быть не длиннее '
+                f'{settings.SERIES_MAX_WINDOW_DAYS} дней.'
+            )
+        return data
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    """Сериализатор занятия серии для записи и комментариев."""
+    occurrence = serializers.DateTimeField()
+    text = serializers.CharField(required=False)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """Сериализатор операции пакетного запроса."""
+    op = serializers.ChoiceField(choices=(('add', 'Добавить'),
+                                          ('remove', 'Удалить')))
+    target_type = serializers.ChoiceField(
+        choices=(('favorite', 'Избранное'),
+                 ('participation', 'Участие в мероприятии'),
+                 ('like', 'Лайк комментария'))
+    )
+    id = serializers.IntegerField(min_value=1)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Сериализатор пакетного запроса избранного, участия и лайков."""
+    operations = serializers.ListField(
+        child=BatchOperationSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_OPERATIONS
+    )
+
+    def validate_operations(self, value):
+        targets = {(item['target_type'], item['id']) for item in value}
+        if len(targets) != len(value):
+            raise serializers.ValidationError(
+                'Каждый объект можно указать в пакете только один раз.'
+            )
+        return value
+
+
+class BatchResultSerializer(BatchOperationSerializer):
+    """Сериализатор результата операции пакетного запроса: статус
+    совпадает с кодом ответа одиночного эндпоинта."""
+    status = serializers.IntegerField()
@@ -0,0 +1,103 @@
+import datetime
+
+from dateutil.rrule import DAILY, rrule, rrulestr
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Event, Participation
+from .similar import refresh_similar_events
+
+
+class Occurrence:
+    """Занятие серии, еще не сохраненное в Event."""
+    __slots__ = ('series', 'datetime')
+
+    def __init__(self, series, datetime):
+        self.series = series
+        self.datetime = datetime
+
+
+def parse_rule(rule, dtstart):
+    """Правило повторения серии. Даты занятий считаются в текущем
+    часовом поясе, поэтому время занятия не сдвигается при переходе
+    на летнее время."""
+    rule = rrulestr(rule, dtstart=timezone.localtime(dtstart))
+    if not isinstance(rule, rrule):
+        raise ValueError('Укажите одно правило RRULE.')
+    if rule._freq > DAILY:
+        raise ValueError('Занятия серии не могут повторяться чаще раза в день.')
+    return rule
+
+
+def occurrence_datetimes(series, start, end):
+    """Даты занятий серии в интервале [start, end)."""
+    return [
+        moment for moment in parse_rule(series.rrule,
+                                        series.dtstart).between(start,
+                                                                end,
+                                                                inc=True)
+        if moment < end
+    ]
+
+
+def is_occurrence(series, moment):
+    return bool(parse_rule(series.rrule, series.dtstart).between(moment,
+                                                                 moment,
+                                                                 inc=True))
+
+
+def expand(series_list, start, end):
+    """Несохраненные занятия серий в интервале [start, end).
+    Занятия, для которых уже есть Event, пропускаются: они попадают
+    в выдачу как обычные мероприятия."""
+    materialized = set(Event.objects.filter(
+        series__in=series_list,
+        datetime__gte=start,
+        datetime__lt=end
+    ).values_list('series_id', 'datetime'))
+
+    return [
+        Occurrence(series, moment)
+        for series in series_list
+        for moment in occurrence_datetimes(series, start, end)
+        if (series.pk, moment) not in materialized
+    ]
+
+
+def materialize(series, moment):
+    """Мероприятие для занятия серии. Создается при первой записи
+    на занятие или первом комментарии; место проведения и виды
+    активности берутся из серии без копирования локации."""
+    event = Event.objects.filter(series=series, datetime=moment).first()
+    if event is not None:
+        return event
+
+    try:
+        with transaction.atomic():
+            event = Event.objects.create(series=series,
+                                         datetime=moment,
+                                         name=series.name,
+                                         description=series.description,
+                                         author_id=series.author_id,
+                                         duration=series.duration,
+                                         location_id=series.location_id,
+                                         capacity=series.capacity)
+            event.activity.set(series.activity.all())
+            Participation.objects.create(event=event,
+                                         user_id=series.author_id)
+    except IntegrityError:
+        return Event.objects.get(series=series, datetime=moment)
+
+    transaction.on_commit(lambda: refresh_similar_events(event.pk))
+    return event
+
+
+def window_bounds(date_from, date_to):
+    """Границы интервала по датам включительно в текущем часовом поясе."""
+    start = timezone.make_aware(datetime.datetime.combine(date_from,
+                                                          datetime.time()))
+    end = timezone.make_aware(datetime.datetime.combine(
+        date_to + datetime.timedelta(days=1), datetime.time()
+    ))
+    return start, end
@@ -0,0 +1,229 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_save)
+from django.db.models import Count, F, Q
+from django.dispatch import receiver
+
+from .archive import archive_cutoff
+from .calendar import invalidate_months
+from . import snapshots
+from .models import (Activity,
+                     ActivityForEvent,
+                     Comment,
+                     Event,
+                     Like,
+                     Location,
+                     Participation)
+from .participation import promote_waitlist
+from .serializers import format_date
+from .stream import publish
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_datetime(sender, instance, **kwargs):
+    """Запоминает прежние дату и вместимость мероприятия для сброса
+    сводок и перевода пользователей из листа ожидания."""
+    instance._previous_datetime = instance._previous_capacity = None
+    if instance.pk is not None:
+        instance._previous_datetime, instance._previous_capacity = (
+            Event.objects.filter(pk=instance.pk).values_list(
+                'datetime', 'capacity'
+            ).first() or (None, None)
+        )
+
+
+@receiver(pre_save, sender=Event)
+def unarchive_rescheduled_event(sender, instance, **kwargs):
+    """Возвращает из архива мероприятие, перенесенное на более позднюю дату."""
+    if instance.is_archived and instance.datetime >= archive_cutoff():
+        instance.is_archived = False
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_calendar(sender, instance, **kwargs):
+    invalidate_months(instance.datetime,
+                      getattr(instance, '_previous_datetime', None))
+
+
+@receiver(post_save, sender=Event)
+def promote_on_capacity_growth(sender, instance, created, **kwargs):
+    """Места, добавленные увеличением вместимости, отдаются листу
+    ожидания, а не первому следующему запросу на участие."""
+    previous = getattr(instance, '_previous_capacity', None)
+    if created or previous is None:
+        return
+    if instance.capacity is None or instance.capacity > previous:
+        transaction.on_commit(partial(promote_waitlist, instance.pk))
+
+
+@receiver(post_save, sender=ActivityForEvent)
+@receiver(post_delete, sender=ActivityForEvent)
+def invalidate_activity_calendar(sender, instance, **kwargs):
+    invalidate_months(*Event.objects.filter(
+        pk=instance.event_id
+    ).values_list('datetime', flat=True))
+
+
+@receiver(m2m_changed, sender=Event.activity.through)
+def invalidate_event_activities_calendar(sender, instance, action,
+                                         **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if isinstance(instance, Event):
+            invalidate_months(instance.datetime)
+        else:
+            invalidate_months(*Event.objects.filter(
+                pk__in=kwargs['pk_set'] or ()
+            ).values_list('datetime', flat=True))
+
+
+@receiver(post_save, sender=Location)
+def invalidate_location_calendar(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_months(*Event.objects.filter(
+            location=instance
+        ).values_list('datetime', flat=True))
+
+
+@receiver(post_save, sender=Participation)
+def increase_participants_count(sender, instance, created, **kwargs):
+    """Учитывает участие, созданное в обход записи через лист ожидания
+    (автор мероприятия, админка)."""
+    if created and not getattr(instance, '_place_taken', False):
+        Event.objects.filter(pk=instance.event_id).update(
+            participants_count=F('participants_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Participation)
+def decrease_participants_count(sender, instance, **kwargs):
+    Event.objects.filter(
+        pk=instance.event_id, participants_count__gt=0
+    ).update(participants_count=F('participants_count') - 1)
+
+
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def publish_participants_count(sender, instance, **kwargs):
+    event_id = instance.event_id
+
+    def build():
+        count = Event.objects.filter(pk=event_id).values_list(
+            'participants_count', flat=True
+        ).first()
+        if count is None:
+            return None
+        return {'type': 'participants',
+                'event': event_id,
+                'participants_count': count}
+
+    publish(build)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    message = {
+        'type': 'comment' if created else 'comment_updated',
+        'event': instance.event_id,
+        'comment': {
+            'id': instance.id,
+            'author': {'id': instance.author.id,
+                       'username': instance.author.username},
+            'text': instance.text,
+            'pub_date': format_date(instance.pub_date),
+        },
+    }
+    publish(lambda: message)
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deleted(sender, instance, **kwargs):
+    message = {'type': 'comment_deleted',
+               'event': instance.event_id,
+               'comment': {'id': instance.id}}
+    publish(lambda: message)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def publish_likes_count(sender, instance, **kwargs):
+    comment_id = instance.comment_id
+
+    def build():
+        comment = Comment.objects.filter(pk=comment_id).annotate(
+            likes_total=Count('users_for_liked_comment')
+        ).values('event_id', 'likes_total').first()
+        if comment is None:
+            return None
+        return {'type': 'likes',
+                'event': comment['event_id'],
+                'comment': {'id': comment_id,
+                            'likes_count': comment['likes_total']}}
+
+    publish(build)
+
+
+@receiver(post_save, sender=Event)
+def invalidate_event_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=ActivityForEvent)
+@receiver(post_delete, sender=ActivityForEvent)
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_related_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate(instance.event_id)
+
+
+@receiver(m2m_changed, sender=Event.activity.through)
+def invalidate_event_activities_snapshot(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if isinstance(instance, Event):
+            snapshots.invalidate(instance.pk)
+        elif kwargs['pk_set']:
+            snapshots.invalidate(*kwargs['pk_set'])
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_comment_snapshot(sender, instance, **kwargs):
+    if Like.comment.is_cached(instance):
+        event_ids = [instance.comment.event_id]
+    else:
+        event_ids = Comment.objects.filter(
+            pk=instance.comment_id
+        ).values_list('event_id', flat=True)
+    snapshots.invalidate(*event_ids)
+
+
+@receiver(post_save, sender=Activity)
+def invalidate_activity_snapshots(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.invalidate_queryset(Event.objects.filter(activity=instance))
+
+
+@receiver(post_save, sender=Location)
+def invalidate_location_snapshots(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.invalidate_queryset(Event.objects.filter(location=instance))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_snapshots(sender, instance, created, update_fields,
+                              **kwargs):
+    """Имя пользователя входит в снимки его мероприятий
+    и мероприятий с его комментариями."""
+    if created or (update_fields is not None
+                   and 'username' not in update_fields):
+        return
+    snapshots.invalidate_queryset(Event.objects.filter(
+        Q(author=instance) | Q(comments__author=instance)
+    ))
@@ -0,0 +1,215 @@
+import datetime
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.gis.measure import D
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Activity, ActivityForEvent, Event, SimilarEvent
+from .recommendations import EARTH_RADIUS_KM, index_of, unit_vectors
+
+
+class EventFeatures:
+    """Признаки мероприятий для расчета похожести: виды активности,
+    координаты и время начала."""
+
+    def __init__(self, queryset, activity_index):
+        queryset = queryset.order_by()
+        rows = list(queryset.values_list('id',
+                                         'location__point',
+                                         'datetime'))
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.vectors = unit_vectors([(row[1].x, row[1].y) for row in rows])
+        self.timestamps = np.array([row[2].timestamp() for row in rows])
+
+        event_index = index_of(self.ids.tolist())
+        self.activities = np.zeros((len(rows), len(activity_index)),
+                                   dtype=np.float32)
+        for event_id, activity_id in ActivityForEvent.objects.filter(
+            event__in=queryset.values('pk')
+        ).values_list('event_id', 'activity_id').iterator():
+            self.activities[event_index[event_id],
+                            activity_index[activity_id]] = 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, start, stop):
+        part = EventFeatures.__new__(EventFeatures)
+        part.ids = self.ids[start:stop]
+        part.vectors = self.vectors[start:stop]
+        part.timestamps = self.timestamps[start:stop]
+        part.activities = self.activities[start:stop]
+        return part
+
+
+def similarity(targets, candidates):
+    """Матрица похожести: коэффициент Жаккара по видам активности,
+    близость места и близость времени проведения."""
+    weights = settings.SIMILAR_EVENTS_WEIGHTS
+
+    shared = targets.activities @ candidates.activities.T
+    union = (targets.activities.sum(axis=1)[:, None]
+             + candidates.activities.sum(axis=1)[None, :] - shared)
+    scores = weights['activity'] * shared / np.maximum(union, 1)
+
+    cosine = np.clip(targets.vectors @ candidates.vectors.T, -1, 1)
+    distance = np.arccos(cosine) * EARTH_RADIUS_KM
+    scores += weights['distance'] * np.exp(
+        -distance / settings.SIMILAR_EVENTS_DISTANCE_KM
+    )
+
+    days = np.abs(targets.timestamps[:, None]
+                  - candidates.timestamps[None, :]) / (60 * 60 * 24)
+    scores += weights['time'] * np.exp(-days / settings.SIMILAR_EVENTS_DAYS)
+
+    scores[targets.ids[:, None] == candidates.ids[None, :]] = -np.inf
+    return scores
+
+
+def top_neighbors(scores, candidate_ids, top_k):
+    """Лучшие соседи для каждой строки в виде списков (id, оценка)."""
+    count = min(top_k, scores.shape[1])
+    if not count:
+        return [[] for _ in range(scores.shape[0])]
+    indexes = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+    best = np.take_along_axis(scores, indexes, axis=1)
+    order = np.argsort(-best, axis=1, kind='stable')
+    indexes = np.take_along_axis(indexes, order, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return [
+        [(int(candidate_ids[index]), float(score))
+         for index, score in zip(row_indexes, row_scores)
+         if np.isfinite(score)]
+        for row_indexes, row_scores in zip(indexes, best)
+    ]
+
+
+def upcoming_events():
+    return Event.objects.upcoming()
+
+
+def refresh_similar_events(event_id):
+    """Обновляет соседей одного мероприятия и добавляет его в списки
+    соседей мероприятий-кандидатов. Кандидаты отбираются индексами:
+    общий вид активности или близкое место проведения в пределах
+    окна по времени, за которым вклад времени в оценку пренебрежимо мал."""
+    event = Event.objects.filter(pk=event_id).select_related(
+        'location'
+    ).first()
+    if event is None:
+        return
+
+    top_k = settings.SIMILAR_EVENTS_TOP_K
+    window = datetime.timedelta(days=4 * settings.SIMILAR_EVENTS_DAYS)
+    activity_index = index_of(Activity.objects.values_list('id', flat=True))
+    candidates = EventFeatures(
+        upcoming_events().exclude(pk=event_id).filter(
+            datetime__gte=event.datetime - window,
+            datetime__lte=event.datetime + window
+        ).filter(
+            Q(activity__events_for_activity__event=event_id)
+            | Q(location__point__distance_lte=(
+                event.location.point,
+                D(km=settings.SIMILAR_EVENTS_DISTANCE_KM)
+            ))
+        ).distinct(),
+        activity_index
+    )
+    target = EventFeatures(Event.objects.filter(pk=event_id), activity_index)
+    scores = similarity(target, candidates)[0]
+
+    with transaction.atomic():
+        SimilarEvent.objects.filter(
+            Q(event_id=event_id) | Q(similar_id=event_id)
+        ).delete()
+        rows = [
+            SimilarEvent(event_id=event_id, similar_id=similar_id,
+                         score=score)
+            for similar_id, score in top_neighbors(
+                scores[None, :], candidates.ids, top_k
+            )[0]
+        ]
+
+        updated = []
+        if event.datetime >= timezone.now():
+            # Мероприятие попадает в список соседа, если список еще
+            # не заполнен или мероприятие похоже больше худшего из соседей.
+            worst = {
+                row['event_id']: (row['worst'], row['total'])
+                for row in SimilarEvent.objects.filter(
+                    event_id__in=candidates.ids.tolist()
+                ).values('event_id').annotate(
+                    worst=Min('score'), total=Count('id')
+                ).order_by()
+            }
+            for candidate_id, score in zip(candidates.ids.tolist(),
+                                           scores.tolist()):
+                worst_score, total = worst.get(candidate_id, (0, 0))
+                if total < top_k or score > worst_score:
+                    rows.append(SimilarEvent(event_id=candidate_id,
+                                             similar_id=event_id,
+                                             score=score))
+                    updated.append(candidate_id)
+
+        SimilarEvent.objects.bulk_create(rows, batch_size=1000)
+        trim_similar_events(updated, top_k)
+
+
+def trim_similar_events(event_ids, top_k):
+    """Удаляет соседей мероприятий за пределами top_k лучших по оценке."""
+    if not event_ids:
+        return
+    kept = {}
+    extra = []
+    for pk, event_id in SimilarEvent.objects.filter(
+        event_id__in=event_ids
+    ).order_by('event_id', '-score', 'pk').values_list('pk', 'event_id'):
+        kept[event_id] = kept.get(event_id, 0) + 1
+        if kept[event_id] > top_k:
+            extra.append(pk)
+    if extra:
+        SimilarEvent.objects.filter(pk__in=extra).delete()
+
+
+def rebuild_similar_events(batch_size=256, past_days=30):
+    """Пересчитывает соседей всех мероприятий, начиная с прошедших
+    за past_days дней, и удаляет лишние строки, накопленные
+    инкрементальными обновлениями."""
+    top_k = settings.SIMILAR_EVENTS_TOP_K
+    cutoff = timezone.now() - datetime.timedelta(days=past_days)
+    activity_index = index_of(Activity.objects.values_list('id', flat=True))
+    candidates = EventFeatures(upcoming_events(), activity_index)
+    targets = EventFeatures(
+        Event.objects.filter(
+            datetime__gte=cutoff
+        ),
+        activity_index
+    )
+
+    created = 0
+    for start in range(0, len(targets), batch_size):
+        part = targets.rows(start, start + batch_size)
+        neighbors = top_neighbors(similarity(part, candidates),
+                                  candidates.ids, top_k)
+        rows = [
+            SimilarEvent(event_id=event_id, similar_id=similar_id,
+                         score=score)
+            for event_id, event_neighbors in zip(part.ids.tolist(),
+                                                 neighbors)
+            for similar_id, score in event_neighbors
+        ]
+        with transaction.atomic():
+            SimilarEvent.objects.filter(
+                event_id__in=part.ids.tolist()
+            ).delete()
+            SimilarEvent.objects.bulk_create(rows, batch_size=1000)
+        created += len(rows)
+
+    SimilarEvent.objects.filter(
+        Q(event__datetime__lt=cutoff) | Q(similar__datetime__lt=timezone.now())
+    ).delete()
+    return {'events': len(targets), 'neighbors': created}
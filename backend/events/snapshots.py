@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import (DatabaseError,
+                       IntegrityError,
+                       close_old_connections,
+                       connection,
+                       transaction)
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from monitoring.metrics import record_cache
+from utils.fields import FieldSelection
+from utils.renderers import json_dumps
+
+from .models import (Event,
+                     EventSnapshot,
+                     FavoriteEvent,
+                     Like,
+                     Participation)
+from .serializers import (EVENT_EXPANDABLE_FIELDS,
+                          EVENT_FIELDS,
+                          EventReadSerializer)
+
+
+logger = logging.getLogger('events.snapshots')
+
+# Поля, которые зависят от пользователя и добавляются к снимку
+# при каждом запросе.
+USER_FIELDS = ('is_favorite', 'is_participate')
+
+SNAPSHOT_SELECTION = FieldSelection(
+    set(EVENT_FIELDS) - set(USER_FIELDS),
+    frozenset(EVENT_EXPANDABLE_FIELDS)
+)
+
+
+def lock_snapshot(event_id):
+    """Транзакционная блокировка PostgreSQL снимка мероприятия:
+    перестроения одного снимка в разных процессах выполняются
+    по очереди, поэтому последним записывается снимок, данные
+    которого прочитаны позже."""
+    digest = hashlib.blake2b(f'event-snapshot:{event_id}'.encode(),
+                             digest_size=8).digest()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                       [int.from_bytes(digest, 'big', signed=True)])
+
+
+def build_snapshot(event_id, replace=True):
+    """Строит и сохраняет снимок мероприятия. Отметки лайков
+    в комментариях снимка сброшены, как у анонимного пользователя.
+    Перестроение после изменений (replace=True) заменяет снимок
+    под блокировкой мероприятия. Построение при просмотре
+    (replace=False) только добавляет отсутствующий снимок и не
+    перезаписывает снимок, сохраненный перестроением: его данные
+    могли быть прочитаны позже."""
+    try:
+        with transaction.atomic():
+            if replace:
+                lock_snapshot(event_id)
+            event = Event.objects.with_user_data(
+                AnonymousUser(), SNAPSHOT_SELECTION
+            ).filter(pk=event_id).first()
+            if event is None:
+                return None
+
+            data = EventReadSerializer(
+                event, context={'selection': SNAPSHOT_SELECTION}
+            ).data
+            snapshot = EventSnapshot(
+                event_id=event_id,
+                data=json_dumps(data),
+                comment_ids=[comment['id'] for comment in data['comments']],
+                updated=timezone.now()
+            )
+            if replace:
+                EventSnapshot.objects.bulk_create(
+                    [snapshot],
+                    update_conflicts=True,
+                    unique_fields=['event'],
+                    update_fields=['data', 'comment_ids', 'updated']
+                )
+            else:
+                EventSnapshot.objects.bulk_create([snapshot],
+                                                  ignore_conflicts=True)
+    except IntegrityError:
+        # Мероприятие удалено во время построения.
+        return None
+    return snapshot
+
+
+def build_snapshots(queryset=None):
+    """Строит снимки мероприятий из queryset (по умолчанию
+    предстоящих), возвращает количество построенных снимков."""
+    if queryset is None:
+        queryset = Event.objects.upcoming()
+    built = 0
+    event_ids = queryset.order_by().values_list('pk', flat=True)
+    for event_id in event_ids.iterator():
+        if build_snapshot(event_id) is not None:
+            built += 1
+    return built
+
+
+class SnapshotWorker:
+    """Фоновый поток процесса, перестраивающий снимки после фиксации
+    изменений. Повторные изменения одного мероприятия до перестроения
+    объединяются. Если перестроение не удалось, снимок будет построен
+    при следующем просмотре мероприятия."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = set()
+        self.thread = None
+
+    def submit(self, event_ids):
+        with self.lock:
+            self.pending.update(event_ids)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run,
+                                               name='event-snapshots',
+                                               daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            with self.lock:
+                event_ids, self.pending = self.pending, set()
+            try:
+                for event_id in sorted(event_ids):
+                    build_snapshot(event_id)
+            except DatabaseError:
+                logger.exception('Event snapshot rebuild failed')
+            finally:
+                close_old_connections()
+
+
+worker = SnapshotWorker()
+
+
+def rebuild(event_ids):
+    if settings.EVENT_SNAPSHOT_ASYNC:
+        worker.submit(event_ids)
+    else:
+        for event_id in event_ids:
+            build_snapshot(event_id)
+
+
+def invalidate(*event_ids):
+    """Удаляет снимки мероприятий в текущей транзакции, чтобы после
+    фиксации изменений устаревший снимок не был отдан, и ставит
+    их в очередь на перестроение."""
+    event_ids = {event_id for event_id in event_ids if event_id is not None}
+    if not event_ids:
+        return
+    EventSnapshot.objects.filter(event_id__in=event_ids).delete()
+    transaction.on_commit(lambda: rebuild(event_ids))
+
+
+def invalidate_queryset(queryset):
+    """То же для мероприятий из queryset (изменение вида активности,
+    места проведения или имени пользователя). Перестраиваются все
+    затронутые мероприятия, а не только имевшие снимок: снимок,
+    построенный при просмотре по данным до изменения, мог быть
+    сохранен уже после удаления."""
+    invalidate(*queryset.order_by().values_list('pk', flat=True).distinct())
+
+
+def get_snapshot(event_id, user):
+    """Снимок мероприятия с отметками пользователя одним запросом."""
+    queryset = EventSnapshot.objects.filter(event_id=event_id)
+    if not user.is_anonymous:
+        queryset = queryset.annotate(
+            favorite_flag=Exists(FavoriteEvent.objects.filter(
+                event=OuterRef('event_id'), user=user
+            )),
+            participate_flag=Exists(Participation.objects.filter(
+                event=OuterRef('event_id'), user=user
+            )),
+            liked_ids=ArraySubquery(Like.objects.filter(
+                comment__event=OuterRef('event_id'), user=user
+            ).values('comment_id'))
+        )
+    return queryset.first()
+
+
+def json_bool(value):
+    return b'true' if value else b'false'
+
+
+def render_snapshot(event_id, user):
+    """JSON мероприятия в том же представлении, что и EventSerializer.
+    Отметки пользователя дописываются к байтам снимка; снимок
+    разбирается заново, только если пользователь лайкнул один
+    из показанных в нем комментариев. Возвращает None, если
+    мероприятия нет."""
+    snapshot = get_snapshot(event_id, user)
+    record_cache('event_snapshot', snapshot is not None)
+    if snapshot is None:
+        if build_snapshot(event_id, replace=False) is None:
+            return None
+        snapshot = get_snapshot(event_id, user)
+        if snapshot is None:
+            return None
+
+    data = bytes(snapshot.data)
+    liked = set(getattr(snapshot, 'liked_ids', None) or ())
+    if liked.intersection(snapshot.comment_ids):
+        payload = json.loads(data)
+        for comment in payload['comments']:
+            comment['is_liked'] = comment['id'] in liked
+        data = json_dumps(payload)
+
+    return b'{"is_favorite":%s,"is_participate":%s,%s' % (
+        json_bool(getattr(snapshot, 'favorite_flag', False)),
+        json_bool(getattr(snapshot, 'participate_flag', False)),
+        data[1:]
+    )
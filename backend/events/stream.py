@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+
+logger = logging.getLogger('events.stream')
+
+CHANNEL = 'event_updates'
+
+# Ограничение PostgreSQL на размер payload в NOTIFY - 8000 байт.
+MAX_PAYLOAD_SIZE = 7000
+
+
+class Subscribers:
+    """Очереди клиентов потока обновлений, сгруппированные по мероприятию.
+    Одно уведомление раздается всем подписчикам процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues = {}
+
+    def subscribe(self, event_id):
+        queue = asyncio.Queue(maxsize=settings.EVENT_STREAM_QUEUE_SIZE)
+        item = (asyncio.get_running_loop(), queue)
+        with self.lock:
+            self.queues.setdefault(event_id, set()).add(item)
+        return item
+
+    def unsubscribe(self, event_id, item):
+        with self.lock:
+            queues = self.queues.get(event_id, set())
+            queues.discard(item)
+            if not queues:
+                self.queues.pop(event_id, None)
+
+    def dispatch(self, message):
+        with self.lock:
+            items = list(self.queues.get(message['event'], ()))
+        for loop, queue in items:
+            loop.call_soon_threadsafe(deliver, queue, message)
+
+
+def deliver(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Медленный клиент пропускает обновление, а не задерживает
+        # рассылку остальным.
+        logger.warning('Event stream queue is full')
+
+
+subscribers = Subscribers()
+
+
+class LocalBroker:
+    """Рассылка внутри процесса. Подходит для одного процесса
+    и для БД без LISTEN/NOTIFY."""
+
+    def publish(self, message):
+        subscribers.dispatch(message)
+
+    def start(self):
+        pass
+
+
+class PostgresBroker:
+    """Рассылка через LISTEN/NOTIFY: каждый процесс держит одно
+    соединение, слушающее канал, и раздает уведомления своим подписчикам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def publish(self, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [CHANNEL, json.dumps(message)])
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run,
+                                               name='event-stream-listener',
+                                               daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except psycopg2.Error:
+                logger.exception('Event stream listener failed')
+                time.sleep(settings.EVENT_STREAM_RECONNECT_DELAY)
+
+    def listen(self):
+        params = connections['default'].get_connection_params()
+        listener = psycopg2.connect(**params)
+        try:
+            listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while True:
+                if select.select([listener], [], [], 5) == ([], [], []):
+                    continue
+                listener.poll()
+                while listener.notifies:
+                    notify = listener.notifies.pop(0)
+                    subscribers.dispatch(json.loads(notify.payload))
+        finally:
+            listener.close()
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'postgres': PostgresBroker,
+}
+
+broker = BROKERS[settings.EVENT_STREAM_BROKER]()
+
+
+def compact(message):
+    """Укладывает сообщение в ограничение NOTIFY: текст длинного
+    комментария клиент получит отдельным запросом."""
+    if (len(json.dumps(message).encode()) > MAX_PAYLOAD_SIZE
+            and 'comment' in message):
+        message['comment'] = {**message['comment'],
+                              'text': None,
+                              'truncated': True}
+    return message
+
+
+def publish(build):
+    """Отправляет подписчикам обновление, которое функция build строит
+    после фиксации транзакции, когда счетчики уже обновлены."""
+    def send():
+        message = build()
+        if message is not None:
+            broker.publish(compact(message))
+
+    transaction.on_commit(send)
+
+
+def publish_many(build):
+    """То же для функции build, которая строит список обновлений."""
+    def send():
+        for message in build():
+            broker.publish(compact(message))
+
+    transaction.on_commit(send)
+
+
+def format_message(message):
+    return (f'event: {message["type"]}\n'
+            f'data: {json.dumps(message, ensure_ascii=False)}\n\n')
+
+
+async def stream(event_id):
+    """Поток Server-Sent Events с обновлениями мероприятия.
+    Пустые комментарии периодически поддерживают соединение.
+    Django 4.2 не прерывает потоковый ответ при отключении клиента,
+    поэтому поток завершается через EVENT_STREAM_LIFETIME секунд,
+    а клиент переподключается через интервал из директивы retry;
+    так подписки ушедших клиентов не накапливаются."""
+    broker.start()
+    item = subscribers.subscribe(event_id)
+    loop, queue = item
+    deadline = loop.time() + settings.EVENT_STREAM_LIFETIME
+    try:
+        yield f'retry: {settings.EVENT_STREAM_RETRY_MS}\n\n'
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(),
+                    min(settings.EVENT_STREAM_HEARTBEAT, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_message(message)
+    finally:
+        subscribers.unsubscribe(event_id, item)
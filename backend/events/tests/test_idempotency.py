@@ -0,0 +1,87 @@
+import datetime
+import hashlib
+import json
+
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from events.models import Comment, IdempotencyKey
+from utils.dataset import DatasetGenerator
+from utils.renderers import APIJSONEncoder
+
+
+class IdempotencyKeyTests(TestCase):
+    """Создание комментария с заголовком Idempotency-Key: ключ
+    резервируется до создания объекта, повтор во время выполнения
+    первого запроса получает 409, а не ждет его завершения."""
+    KEY = 'comment-1'
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = DatasetGenerator(seed=1).generate(
+            users=2, events=1, follows=0, participations=0,
+            favorites=0, comments=0, likes=0
+        )
+        cls.user = dataset['users'][0]
+        cls.event = dataset['events'][0]
+        cls.url = f'/api/events/{cls.event.pk}/comments/'
+        cls.data = {'text': 'Комментарий'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, data=None):
+        return self.client.post(self.url, data or self.data, format='json',
+                                HTTP_IDEMPOTENCY_KEY=self.KEY)
+
+    def fingerprint(self, data):
+        body = json.dumps(data, sort_keys=True, cls=APIJSONEncoder)
+        return hashlib.sha256(
+            f'POST {self.url}\n{body}'.encode()
+        ).hexdigest()
+
+    def comments(self):
+        return Comment.objects.filter(event=self.event).count()
+
+    def test_replays_stored_response(self):
+        first = self.post()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self.post()
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.comments(), 1)
+
+    def test_pending_key_returns_conflict(self):
+        IdempotencyKey.objects.create(user=self.user, key=self.KEY,
+                                      fingerprint=self.fingerprint(self.data))
+        response = self.post()
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.comments(), 0)
+
+    def test_abandoned_key_is_reserved_again(self):
+        stored = IdempotencyKey.objects.create(
+            user=self.user, key=self.KEY,
+            fingerprint=self.fingerprint(self.data)
+        )
+        IdempotencyKey.objects.filter(pk=stored.pk).update(
+            created=timezone.now() - datetime.timedelta(hours=1)
+        )
+        response = self.post()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stored = IdempotencyKey.objects.get(user=self.user, key=self.KEY)
+        self.assertEqual(stored.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.comments(), 1)
+
+    def test_failed_request_releases_key(self):
+        response = self.post({'text': ''})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.filter(
+            user=self.user, key=self.KEY
+        ).exists())
+        self.assertEqual(self.post().status_code, status.HTTP_201_CREATED)
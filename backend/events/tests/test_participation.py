@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from events import participation
+from events.models import Event, Participation, Waitlist
+from utils.dataset import DatasetGenerator
+
+
+class ConcurrentParticipationTests(TransactionTestCase):
+    """Запись на мероприятие и отмена участия из параллельных потоков:
+    вместимость не превышается, счетчик совпадает с числом участий,
+    лист ожидания обслуживается по очереди."""
+    USERS = 30
+    CAPACITY = 10
+    WORKERS = 12
+
+    def setUp(self):
+        dataset = DatasetGenerator(seed=1).generate(
+            users=self.USERS, events=1, follows=0, participations=0,
+            favorites=0, comments=0, likes=0
+        )
+        self.users = dataset['users']
+        self.event = dataset['events'][0]
+        Participation.objects.filter(event=self.event).delete()
+        Event.objects.filter(pk=self.event.pk).update(
+            capacity=self.CAPACITY, participants_count=0
+        )
+        self.event.refresh_from_db()
+
+    def run_concurrently(self, function, items):
+        barrier = threading.Barrier(min(self.WORKERS, len(items)))
+
+        def worker(item):
+            try:
+                try:
+                    barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                return function(item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            return list(executor.map(worker, items))
+
+    def fill_sequentially(self):
+        """Записывает пользователей по одному: первые CAPACITY становятся
+        участниками, остальные встают в лист ожидания по порядку."""
+        for user in self.users:
+            participation.participate(user, self.event)
+
+    def participants(self):
+        return set(Participation.objects.filter(
+            event=self.event
+        ).values_list('user_id', flat=True))
+
+    def waitlist(self):
+        return list(Waitlist.objects.filter(
+            event=self.event
+        ).values_list('user_id', flat=True))
+
+    def assertCounterMatches(self):
+        self.event.refresh_from_db()
+        participants = self.participants()
+        self.assertEqual(self.event.participants_count, len(participants))
+        self.assertLessEqual(len(participants), self.event.capacity)
+        return participants
+
+    def test_concurrent_participate_never_oversells(self):
+        results = self.run_concurrently(
+            lambda user: participation.participate(user, self.event),
+            self.users
+        )
+
+        self.assertEqual(results.count(participation.PARTICIPANT),
+                         self.CAPACITY)
+        self.assertEqual(results.count(participation.WAITLISTED),
+                         self.USERS - self.CAPACITY)
+        self.assertEqual(len(self.assertCounterMatches()), self.CAPACITY)
+        self.assertEqual(len(self.waitlist()), self.USERS - self.CAPACITY)
+
+    def test_concurrent_leave_promotes_waitlist_in_order(self):
+        self.fill_sequentially()
+        leaving = self.users[:5]
+
+        self.run_concurrently(
+            lambda user: participation.leave(user, self.event),
+            leaving
+        )
+
+        participants = self.assertCounterMatches()
+        self.assertEqual(
+            participants,
+            {user.pk for user in self.users[5:self.CAPACITY + 5]}
+        )
+        self.assertEqual(self.waitlist(),
+                         [user.pk for user in self.users[self.CAPACITY + 5:]])
+
+    def test_new_request_does_not_skip_waitlist(self):
+        self.fill_sequentially()
+        first_waiting = self.users[self.CAPACITY]
+        # Место освобождается без перевода из листа ожидания,
+        # как при удалении участия в обход leave().
+        Participation.objects.filter(event=self.event,
+                                     user=self.users[0]).delete()
+        Waitlist.objects.filter(event=self.event,
+                                user=self.users[-1]).delete()
+
+        result = participation.participate(self.users[-1], self.event)
+
+        self.assertEqual(result, participation.WAITLISTED)
+        participants = self.assertCounterMatches()
+        self.assertIn(first_waiting.pk, participants)
+        self.assertEqual(self.waitlist()[-1], self.users[-1].pk)
+
+    def test_capacity_growth_promotes_waitlist(self):
+        self.fill_sequentially()
+
+        self.event.capacity = self.CAPACITY + 3
+        self.event.save()
+
+        participants = self.assertCounterMatches()
+        self.assertEqual(
+            participants,
+            {user.pk for user in self.users[:self.CAPACITY + 3]}
+        )
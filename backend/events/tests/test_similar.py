@@ -0,0 +1,42 @@
+from django.test import TestCase, override_settings
+
+from events.models import SimilarEvent
+from events.similar import refresh_similar_events, trim_similar_events
+from utils.dataset import DatasetGenerator
+
+
+class TrimSimilarEventsTests(TestCase):
+    """Инкрементальное обновление не растит списки соседей
+    сверх SIMILAR_EVENTS_TOP_K."""
+    TOP_K = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = DatasetGenerator(seed=1).generate(
+            users=2, events=8, follows=0, participations=0,
+            favorites=0, comments=0, likes=0
+        )
+        cls.events = dataset['events']
+
+    def test_keeps_best_neighbors(self):
+        event, *others = self.events
+        SimilarEvent.objects.bulk_create([
+            SimilarEvent(event=event, similar=other, score=score)
+            for score, other in enumerate(others)
+        ])
+        trim_similar_events([event.pk], self.TOP_K)
+        self.assertEqual(
+            list(SimilarEvent.objects.filter(event=event).values_list(
+                'similar_id', flat=True
+            )),
+            [other.pk for other in reversed(others)][:self.TOP_K]
+        )
+
+    def test_refresh_does_not_exceed_top_k(self):
+        with override_settings(SIMILAR_EVENTS_TOP_K=self.TOP_K):
+            for event in self.events:
+                refresh_similar_events(event.pk)
+        for event in self.events:
+            self.assertLessEqual(
+                SimilarEvent.objects.filter(event=event).count(), self.TOP_K
+            )
@@ -0,0 +1,44 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from events import stream
+
+
+@override_settings(EVENT_STREAM_LIFETIME=0.2, EVENT_STREAM_HEARTBEAT=0.05)
+@mock.patch.object(stream, 'broker', stream.LocalBroker())
+class EventStreamTests(SimpleTestCase):
+    """Поток завершается сам и снимает подписку, даже если клиент
+    ушел и сервер продолжает читать генератор."""
+    EVENT_ID = 1
+
+    def collect(self, on_subscribed=None):
+        async def consume():
+            chunks = []
+            async for chunk in stream.stream(self.EVENT_ID):
+                chunks.append(chunk)
+                if len(chunks) == 1:
+                    self.assertIn(self.EVENT_ID, stream.subscribers.queues)
+                    if on_subscribed is not None:
+                        on_subscribed()
+            return chunks
+
+        return asyncio.run(consume())
+
+    def test_stream_ends_and_unsubscribes(self):
+        chunks = self.collect()
+
+        self.assertTrue(chunks[0].startswith('retry: '))
+        self.assertIn(': ping\n\n', chunks)
+        self.assertNotIn(self.EVENT_ID, stream.subscribers.queues)
+
+    def test_stream_delivers_updates(self):
+        message = {'type': 'participants',
+                   'event': self.EVENT_ID,
+                   'participants_count': 3}
+
+        chunks = self.collect(lambda: stream.broker.publish(message))
+
+        self.assertIn(stream.format_message(message), chunks)
+        self.assertNotIn(self.EVENT_ID, stream.subscribers.queues)
@@ -1,7 +1,12 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from .views import ActivityViewSet, EventViewSet, CommentViewSet
+from .views import (ActivityViewSet,
+                    BatchViewSet,
+                    CommentViewSet,
+                    EventSeriesViewSet,
+                    EventViewSet,
+                    event_stream)
 
 app_name = 'events'
 
@@ -9,6 +14,8 @@ router_events_v1 = routers.DefaultRouter()
 
 router_events_v1.register('activities', ActivityViewSet, basename='activities')
 router_events_v1.register('events', EventViewSet, basename='events')
+router_events_v1.register('series', EventSeriesViewSet, basename='series')
+router_events_v1.register('batch', BatchViewSet, basename='batch')
 router_events_v1.register(
     r'events/(?P<event_id>\d+)/comments',
     CommentViewSet,
@@ -16,5 +23,8 @@ router_events_v1.register(
 )
 
 urlpatterns = [
+    path('events/<int:event_id>/stream/',
+         event_stream,
+         name='event-stream'),
     path('', include(router_events_v1.urls)),
 ]
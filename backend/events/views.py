@@ -2,7 +2,12 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.generics import get_object_or_404
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -10,18 +15,79 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 
 from .models import (Activity,
                      Event,
+                     EventSeries,
                      FavoriteEvent,
-                     Participation,
                      Like)
 
+from . import batch, participation, series, snapshots, stream
+from .calendar import get_calendar
+from .heatmap import get_heatmap
 from .serializers import (ActivitySerializer,
+                          BatchResultSerializer,
+                          BatchSerializer,
+                          CalendarQuerySerializer,
+                          CommentReadSerializer,
+                          CommentSerializer,
+                          EVENT_EXPANDABLE_FIELDS,
+                          EVENT_FIELDS,
+                          EventReadSerializer,
                           EventSerializer,
-                          CommentSerializer)
+                          EventSeriesSerializer,
+                          HeatmapQuerySerializer,
+                          OccurrenceSerializer,
+                          OccurrenceWindowSerializer)
 
+from .idempotency import IDEMPOTENCY_PARAMETERS, IdempotentCreateMixin
 from .permissions import IsAdminAuthorOrReadOnly
 from .pagination import CustomPaginator
-from .filters import EventFilter, ActivityFilter
+from .filters import EventFilter, EventSeriesFilter, ActivityFilter
 from utils.crud import create_relation, delete_relation
+from utils.fields import SPARSE_FIELDS_PARAMETERS, SparseFieldsMixin
+
+
+def participate_response(request, event):
+    """Записывает пользователя на мероприятие или в лист ожидания."""
+    result = participation.participate(request.user, event)
+    if result == participation.ALREADY_EXISTS:
+        return Response(
+            data={'errors': 'Попытка повторного добавления объекта'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if result == participation.WAITLISTED:
+        return Response(
+            data={
+                'detail': 'Свободных мест нет, вы добавлены '
+                          'в лист ожидания.',
+                'waitlist_position': participation.waitlist_position(
+                    request.user, event
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+    serializer = EventSerializer(
+        Event.objects.with_user_data(request.user).get(pk=event.pk),
+        context={'request': request}
+    )
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+async def event_stream(request, event_id):
+    """Поток Server-Sent Events с новыми комментариями, лайками
+    и изменением количества участников мероприятия.
+    Под WSGI-сервером поток занимал бы рабочий процесс целиком,
+    поэтому эндпоинт доступен только под ASGI."""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Поток событий доступен только при запуске '
+                            'ASGI-сервером.',
+                            status=status.HTTP_501_NOT_IMPLEMENTED,
+                            content_type='text/plain; charset=utf-8')
+    if not await Event.objects.filter(pk=event_id).aexists():
+        raise Http404
+    response = StreamingHttpResponse(stream.stream(event_id),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @extend_schema(tags=['Активности'])
@@ -41,31 +107,159 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
 
 @extend_schema(tags=['Мероприятие'])
 @extend_schema_view(
-    list=extend_schema(summary='Получение списка мероприятий'),
-    create=extend_schema(summary='Создание нового мероприятия'),
-    retrieve=extend_schema(summary='Получение данных о мероприятии'),
+    list=extend_schema(summary='Получение списка мероприятий',
+                       parameters=[OccurrenceWindowSerializer,
+                                   *SPARSE_FIELDS_PARAMETERS],
+                       responses=EventSerializer),
+    create=extend_schema(summary='Создание нового мероприятия',
+                         parameters=IDEMPOTENCY_PARAMETERS),
+    retrieve=extend_schema(summary='Получение данных о мероприятии',
+                           parameters=SPARSE_FIELDS_PARAMETERS),
     update=extend_schema(summary='Изменение данные о мероприятии'),
     partial_update=extend_schema(summary='Частичное изменение данных о мероприятии'),
     destroy=extend_schema(summary='Удаление данных о мероприятии'),
 )
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(IdempotentCreateMixin,
+                   SparseFieldsMixin,
+                   viewsets.ModelViewSet):
     """Вьюсет для работы с постами мероприятий."""
     queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = CustomPaginator
+    throttle_scopes = {'create': 'event_write',
+                       'update': 'event_write',
+                       'partial_update': 'event_write',
+                       'favorite': 'favorite',
+                       'participate': 'participate'}
     filter_backends = (DjangoFilterBackend,)
     filterset_class = EventFilter
+    sparse_fields = EVENT_FIELDS
+    expandable_fields = EVENT_EXPANDABLE_FIELDS
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        return Event.objects.with_user_data(self.request.user,
+                                            self.get_field_selection())
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EventReadSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """Список мероприятий. Если указан интервал date_from - date_to,
+        в него добавляются несохраненные занятия серий за этот интервал."""
+        window = OccurrenceWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        if not window.validated_data:
+            return super().list(request, *args, **kwargs)
+
+        start, end = series.window_bounds(window.validated_data['date_from'],
+                                          window.validated_data['date_to'])
+        events = self.filter_queryset(Event.objects.all()).filter(
+            datetime__gte=start, datetime__lt=end
+        ).values_list('id', 'datetime')
+        series_filter = EventSeriesFilter(
+            request.query_params,
+            queryset=EventSeries.objects.filter(dtstart__lt=end),
+            request=request
+        )
+        series_filter.is_valid()
+        series_list = list(series_filter.qs.select_related(
+            'author', 'location'
+        ).prefetch_related('activity'))
+        occurrences = series.expand(series_list,
+                                    *series_filter.clip(start, end))
+
+        items = sorted(
+            [(moment, pk) for pk, moment in events]
+            + [(occurrence.datetime, occurrence)
+               for occurrence in occurrences],
+            key=lambda item: item[0],
+            reverse=True
+        )
+        page = self.paginate_queryset([item for _, item in items])
+        loaded = self.get_queryset().in_bulk(
+            [item for item in page if not isinstance(item, series.Occurrence)]
+        )
+        serializer = EventReadSerializer(
+            [loaded.get(item, item) for item in page],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Мероприятие из готового снимка с отметками пользователя.
+        Выбор полей и форматы, кроме JSON, обрабатываются сериализатором."""
+        if (self.get_field_selection().fields is not None
+                or request.accepted_renderer.format != 'json'):
+            return super().retrieve(request, *args, **kwargs)
+
+        content = snapshots.render_snapshot(self.kwargs['pk'], request.user)
+        if content is None:
+            raise Http404
+        return HttpResponse(content, content_type='application/json')
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'calendar', 'similar']:
             self.permission_classes = [permissions.AllowAny]
+        elif self.action == 'heatmap':
+            self.permission_classes = [permissions.IsAdminUser]
         elif self.request.method in ['PATCH', 'DELETE']:
             self.permission_classes = [IsAdminAuthorOrReadOnly]
         else:
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
-    
+
+    @extend_schema(summary='Календарь мероприятий',
+                   parameters=[CalendarQuerySerializer])
+    @action(methods=['GET'], detail=False)
+    def calendar(self, request):
+        query = CalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        month = data.get('month') or timezone.localtime().strftime('%Y-%m')
+        year, month = map(int, month.split('-'))
+        return Response(get_calendar(year,
+                                     month,
+                                     data.get('latitude'),
+                                     data.get('longitude'),
+                                     data.get('radius')))
+
+    @extend_schema(summary='Тепловая карта мероприятий',
+                   parameters=[HeatmapQuerySerializer])
+    @action(methods=['GET'],
+            detail=False,
+            permission_classes=[permissions.IsAdminUser])
+    def heatmap(self, request):
+        query = HeatmapQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        return Response(get_heatmap(
+            data.get('date') or timezone.localdate(),
+            data['bbox'],
+            data.get('cell_size') or settings.HEATMAP_CELL_SIZE
+        ))
+
+    @extend_schema(summary='Похожие мероприятия',
+                   responses=EventSerializer(many=True))
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk):
+        get_object_or_404(Event, pk=pk)
+        similar_events = Event.objects.filter(
+            similar_to_events__event_id=pk
+        ).upcoming().with_user_data(request.user).order_by(
+            '-similar_to_events__score'
+        )[:settings.SIMILAR_EVENTS_TOP_K]
+        serializer = EventReadSerializer(
+            similar_events, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
     @extend_schema(summary='Избранное')
     @action(methods=['POST', 'DELETE'],
             detail=True,
@@ -84,43 +278,138 @@ class EventViewSet(viewsets.ModelViewSet):
                                pk,
                                'event')
 
-    @extend_schema(summary='Заявка на участие в мероприятии')
+    @extend_schema(summary='Заявка на участие в мероприятии '
+                           'или запись в лист ожидания')
     @action(methods=['POST', 'DELETE'],
             detail=True,
             permission_classes=[permissions.IsAuthenticated, ])
     def participate(self, request, pk):
+        event = get_object_or_404(Event, pk=pk)
+
         if request.method == 'POST':
-            return create_relation(request,
-                                   Event,
-                                   Participation,
-                                   pk,
-                                   EventSerializer,
-                                   'event')
-        return delete_relation(request,
-                               Event,
-                               Participation,
-                               pk,
-                               'event')
+            return participate_response(request, event)
+
+        if participation.leave(request.user, event):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            data={'errors': 'Попытка удаления несуществующего объекта'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+@extend_schema(tags=['Пакетные операции'])
+class BatchViewSet(viewsets.ViewSet):
+    """Вьюсет пакетного добавления и удаления избранного,
+    участия в мероприятиях и лайков комментариев."""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'create': 'batch'}
+
+    @extend_schema(summary='Пакет операций с избранным, участием и лайками',
+                   request=BatchSerializer,
+                   responses=BatchResultSerializer(many=True))
+    def create(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(batch.apply_batch(
+            request.user, serializer.validated_data['operations']
+        ))
+
+
+@extend_schema(tags=['Серия мероприятий'])
+@extend_schema_view(
+    list=extend_schema(summary='Получение списка серий мероприятий'),
+    create=extend_schema(summary='Создание серии мероприятий'),
+    retrieve=extend_schema(summary='Получение данных о серии мероприятий'),
+    update=extend_schema(summary='Изменение серии мероприятий'),
+    partial_update=extend_schema(summary='Частичное изменение серии мероприятий'),
+    destroy=extend_schema(summary='Удаление серии мероприятий'),
+)
+class EventSeriesViewSet(viewsets.ModelViewSet):
+    """Вьюсет для серий регулярных мероприятий. Занятие сохраняется
+    как мероприятие при первой записи на него или первом комментарии,
+    дальше с ним работают через эндпоинты мероприятий."""
+    serializer_class = EventSeriesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPaginator
+    throttle_scopes = {'create': 'event_write',
+                       'update': 'event_write',
+                       'partial_update': 'event_write',
+                       'participate': 'participate'}
+
+    def get_queryset(self):
+        return EventSeries.objects.select_related(
+            'author', 'location'
+        ).prefetch_related('activity')
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            self.permission_classes = [permissions.AllowAny]
+        elif self.request.method in ['PUT', 'PATCH', 'DELETE']:
+            self.permission_classes = [IsAdminAuthorOrReadOnly]
+        else:
+            self.permission_classes = [permissions.IsAuthenticated]
+        return super().get_permissions()
+
+    def get_occurrence(self, request, pk):
+        event_series = get_object_or_404(EventSeries, pk=pk)
+        serializer = OccurrenceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moment = serializer.validated_data['occurrence']
+        if not series.is_occurrence(event_series, moment):
+            raise ValidationError(
+                {'occurrence': 'В это время занятия серии нет.'}
+            )
+        return event_series, serializer.validated_data
+
+    @extend_schema(summary='Заявка на участие в занятии серии',
+                   request=OccurrenceSerializer,
+                   responses=EventSerializer)
+    @action(methods=['POST'], detail=True)
+    def participate(self, request, pk):
+        event_series, data = self.get_occurrence(request, pk)
+        event = series.materialize(event_series, data['occurrence'])
+        return participate_response(request, event)
+
+    @extend_schema(summary='Комментарий к занятию серии',
+                   request=OccurrenceSerializer,
+                   responses=CommentSerializer)
+    @action(methods=['POST'], detail=True)
+    def comment(self, request, pk):
+        event_series, data = self.get_occurrence(request, pk)
+        serializer = CommentSerializer(data={'text': data.get('text')},
+                                       context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        event = series.materialize(event_series, data['occurrence'])
+        serializer.save(author=request.user, event=event)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 @extend_schema(tags=['Комментарий к мероприятию'])
 @extend_schema_view(
-    list=extend_schema(summary='Получение списока комментариев к мероприятию'),
-    create=extend_schema(summary='Создание комментария к мероприятию'),
+    list=extend_schema(summary='Получение списока комментариев к мероприятию',
+                       responses=CommentSerializer),
+    create=extend_schema(summary='Создание комментария к мероприятию',
+                         parameters=IDEMPOTENCY_PARAMETERS),
     retrieve=extend_schema(summary='Получение комментария к мероприятию'),
     update=extend_schema(summary='Изменение комментария к мероприятию'),
     partial_update=extend_schema(summary='Частичное изменение комментария к мероприятию'),
     destroy=extend_schema(summary='Удаление коментария к мероприятию'),
 )
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """Сериализатор для комментариев к постам."""
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPaginator
+    throttle_scopes = {'like': 'like'}
 
     def get_queryset(self):
         post = get_object_or_404(Event, id=self.kwargs['event_id'])
-        return post.comments.all()
+        return post.comments.with_user_data(self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CommentReadSerializer
+        return super().get_serializer_class()
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -0,0 +1,33 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from utils.admin import LargeTableAdmin
+
+from .models import QueuedEmail
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(LargeTableAdmin):
+    list_display = ('id',
+                    'subject',
+                    'recipients',
+                    'status',
+                    'attempts',
+                    'created',
+                    'sent')
+    list_filter = ('status',)
+    exclude = ('message',)
+    readonly_fields = ('subject',
+                       'from_email',
+                       'recipients',
+                       'attempts',
+                       'last_error',
+                       'created',
+                       'sent')
+    actions = ('requeue',)
+
+    @admin.action(description='Поставить в очередь повторно')
+    def requeue(self, request, queryset):
+        queryset.update(status=QueuedEmail.QUEUED,
+                        attempts=0,
+                        next_attempt=timezone.now())
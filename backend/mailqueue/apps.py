@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class MailqueueConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'mailqueue'
+    verbose_name = 'Очередь писем'
@@ -0,0 +1,27 @@
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import sanitize_address
+
+from .models import QueuedEmail
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который сохраняет письма в очередь
+    и сразу возвращает управление. Письма отправляет команда
+    send_queued_mail."""
+
+    def send_messages(self, email_messages):
+        queued = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            encoding = message.encoding or 'utf-8'
+            queued.append(QueuedEmail(
+                subject=message.subject[:998],
+                from_email=sanitize_address(message.from_email, encoding),
+                recipients=[sanitize_address(address, encoding)
+                            for address in recipients],
+                message=message.message().as_bytes(linesep='\r\n'),
+            ))
+        QueuedEmail.objects.bulk_create(queued)
+        return len(queued)
@@ -0,0 +1,50 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mailqueue.models import QueuedEmail
+from mailqueue.sender import MailSender
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails in batches over one SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the queue')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between polls of an empty queue')
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help='Delete sent emails older than this')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            deleted, _ = QueuedEmail.objects.filter(
+                status=QueuedEmail.SENT,
+                sent__lt=timezone.now() - datetime.timedelta(
+                    days=options['purge_days']
+                )
+            ).delete()
+            self.stdout.write(f'Deleted {deleted} sent emails')
+
+        sender = MailSender()
+        try:
+            while True:
+                processed, sent, failed = sender.send_batch(
+                    options['batch_size']
+                )
+                if processed:
+                    self.stdout.write(
+                        f'Sent {sent}, failed {failed} of {processed}'
+                    )
+                if processed < options['batch_size']:
+                    if not options['loop']:
+                        break
+                    # Соединение не держится открытым, пока очередь пуста.
+                    sender.close()
+                    time.sleep(options['interval'])
+        finally:
+            sender.close()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailqueue', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='queuedemail',
+            name='status',
+            field=models.CharField(choices=[('queued', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Статус'),
+        ),
+    ]
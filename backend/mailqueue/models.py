@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils import timezone
+
+
+class QueuedEmail(models.Model):
+    """Модель письма в очереди на отправку.
+    Хранит готовое MIME-сообщение, чтобы при отправке
+    не зависеть от шаблонов и вложений исходного письма."""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.CharField('Тема', max_length=998, blank=True)
+    from_email = models.CharField('Отправитель', max_length=254)
+    recipients = models.JSONField('Получатели')
+    message = models.BinaryField('Сообщение')
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    next_attempt = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now
+    )
+    sent = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Письма'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'],
+                         name='queued_email_pending_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.subject} ({", ".join(self.recipients)})'
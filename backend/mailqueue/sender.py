@@ -0,0 +1,114 @@
+import datetime
+import email as email_parser
+import smtplib
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+# Ошибки, при которых повторная отправка бессмысленна.
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused,
+                    smtplib.SMTPSenderRefused)
+
+
+class RawEmailMessage(EmailMessage):
+    """Письмо из очереди для бэкендов без SMTP-соединения:
+    отдает сохраненное MIME-сообщение без повторной сборки."""
+
+    def __init__(self, queued):
+        super().__init__(from_email=queued.from_email,
+                         to=queued.recipients)
+        self.raw = bytes(queued.message)
+
+    def message(self):
+        return email_parser.message_from_bytes(self.raw)
+
+
+class MailSender:
+    """Отправляет письма из очереди через одно SMTP-соединение,
+    которое открывается при первой отправке и переоткрывается
+    после разрыва. Бэкенды без SMTP-соединения (console, locmem,
+    filebased) получают письма через send_messages."""
+
+    def __init__(self):
+        self.backend = get_connection(settings.MAILQUEUE_BACKEND)
+
+    def send(self, email):
+        if not hasattr(self.backend, 'connection'):
+            self.backend.send_messages([RawEmailMessage(email)])
+            return
+        for reconnect in (True, False):
+            if self.backend.connection is None:
+                self.backend.open()
+            try:
+                self.backend.connection.sendmail(email.from_email,
+                                                 email.recipients,
+                                                 bytes(email.message))
+                return
+            except smtplib.SMTPServerDisconnected:
+                self.backend.close()
+                if not reconnect:
+                    raise
+
+    def close(self):
+        self.backend.close()
+
+    def claim(self, batch_size):
+        """Забирает порцию писем, срок отправки которых наступил,
+        в короткой транзакции: письма переводятся в статус «отправляется»
+        с арендой на MAILQUEUE_LEASE секунд. Строки блокируются
+        с SKIP LOCKED, поэтому несколько обработчиков не заберут одно
+        письмо. Письма обработчика, завершившегося во время отправки,
+        забираются снова после окончания аренды."""
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(QueuedEmail.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                status__in=(QueuedEmail.QUEUED, QueuedEmail.SENDING),
+                next_attempt__lte=now
+            ).order_by('next_attempt', 'id')[:batch_size])
+            lease = now + datetime.timedelta(seconds=settings.MAILQUEUE_LEASE)
+            QueuedEmail.objects.filter(
+                pk__in=[email.pk for email in emails]
+            ).update(status=QueuedEmail.SENDING, next_attempt=lease)
+        return emails
+
+    def send_batch(self, batch_size):
+        """Отправляет порцию писем. Транзакция не держится открытой
+        во время отправки: результат каждого письма сохраняется
+        отдельным запросом сразу после отправки."""
+        sent = failed = 0
+        emails = self.claim(batch_size)
+        for email in emails:
+            try:
+                self.send(email)
+            except (smtplib.SMTPException, OSError) as error:
+                self.retry_later(email, error)
+                failed += 1
+            else:
+                email.status = QueuedEmail.SENT
+                email.sent = timezone.now()
+                sent += 1
+            email.save(update_fields=['status',
+                                      'attempts',
+                                      'last_error',
+                                      'next_attempt',
+                                      'sent'])
+        return len(emails), sent, failed
+
+    def retry_later(self, email, error):
+        email.attempts += 1
+        email.last_error = repr(error)
+        if (isinstance(error, PERMANENT_ERRORS)
+                or email.attempts >= settings.MAILQUEUE_MAX_ATTEMPTS):
+            email.status = QueuedEmail.FAILED
+            return
+        email.status = QueuedEmail.QUEUED
+        email.next_attempt = timezone.now() + datetime.timedelta(
+            seconds=settings.MAILQUEUE_RETRY_DELAY * 2 ** (email.attempts - 1)
+        )
@@ -0,0 +1,18 @@
+import json
+import logging
+
+
+class JSONFormatter(logging.Formatter):
+    """Форматтер структурированных логов в формате JSON."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'data', {}))
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
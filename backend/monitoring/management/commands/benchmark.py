@@ -0,0 +1,228 @@
+import datetime
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.authtoken.models import Token
+
+from events.models import Activity, Comment, Event
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированной последовательности."""
+    if not values:
+        return None
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def classify(status_code):
+    """Категория ответа для сводки: ошибки сервера, отказы по частоте
+    запросов и прочие ошибки клиента (например, повторное добавление
+    в избранное) учитываются отдельно."""
+    if status_code >= 500:
+        return 'errors'
+    if status_code == 429:
+        return 'throttled'
+    if status_code >= 400:
+        return 'client_errors'
+    return 'ok'
+
+
+class Scenario:
+    """Сценарий нагрузки: набор HTTP-запросов к одному эндпоинту."""
+
+    def __init__(self, name, requests_factory):
+        self.name = name
+        self.requests_factory = requests_factory
+
+
+class Command(BaseCommand):
+    help = 'Run load benchmark against running API and save results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--user', default=None,
+                            help='Email of the user to authenticate as')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds per scenario')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--scenario', action='append', default=None,
+                            help='Run only the given scenarios')
+        parser.add_argument('--output', default=None,
+                            help='Path to JSON file with results')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def get_token(self, email):
+        users = get_user_model().objects.filter(is_active=True)
+        user = users.get(email=email) if email else users.first()
+        if user is None:
+            raise CommandError('No active users. Run generate_data first.')
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def get_scenarios(self, rng):
+        event_ids = list(Event.objects.values_list('id', flat=True)[:1000])
+        comment_ids = list(
+            Comment.objects.values_list('event_id', 'id')[:1000]
+        )
+        activities = list(Activity.objects.values_list('name', flat=True))
+        if not event_ids or not comment_ids:
+            raise CommandError('No data. Run generate_data first.')
+
+        def toggle(relation):
+            event_id = rng.choice(event_ids)
+            url = f'/api/events/{event_id}/{relation}/'
+            return [('POST', url, None), ('DELETE', url, None)]
+
+        return [
+            Scenario('events-list', lambda: [
+                ('GET', '/api/events/', None)
+            ]),
+            Scenario('events-list-filtered', lambda: [
+                ('GET', '/api/events/', {
+                    'is_actual_event': 1,
+                    'activities': rng.choice(activities),
+                })
+            ]),
+            Scenario('events-detail', lambda: [
+                ('GET', f'/api/events/{rng.choice(event_ids)}/', None)
+            ]),
+            Scenario('comments-list', lambda: [
+                ('GET',
+                 '/api/events/{}/comments/'.format(
+                     rng.choice(comment_ids)[0]
+                 ),
+                 None)
+            ]),
+            Scenario('recommendations', lambda: [
+                ('GET', '/api/users/recommendations/', None)
+            ]),
+            Scenario('favorite-toggle', lambda: toggle('favorite')),
+            Scenario('participate-toggle', lambda: toggle('participate')),
+        ]
+
+    def run_scenario(self, scenario, session_factory, base_url, duration,
+                     concurrency):
+        latencies = []
+        outcomes = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            session = session_factory()
+            local_latencies = []
+            local_outcomes = Counter()
+            while time.perf_counter() < deadline:
+                for method, url, params in scenario.requests_factory():
+                    start = time.perf_counter()
+                    try:
+                        response = session.request(method,
+                                                   base_url + url,
+                                                   params=params)
+                        outcome = classify(response.status_code)
+                    except requests.RequestException:
+                        outcome = 'errors'
+                    local_latencies.append(time.perf_counter() - start)
+                    local_outcomes[outcome] += 1
+            with lock:
+                latencies.extend(local_latencies)
+                outcomes.update(local_outcomes)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(worker) for _ in range(concurrency)]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': outcomes['errors'],
+            'client_errors': outcomes['client_errors'],
+            'throttled': outcomes['throttled'],
+            'rps': round(len(latencies) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2)
+            if latencies else None,
+            **{
+                f'p{percent}_ms': round(
+                    percentile(latencies, percent) * 1000, 2
+                ) if latencies else None
+                for percent in (50, 95, 99)
+            },
+        }
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        token = self.get_token(options['user'])
+
+        def session_factory():
+            session = requests.Session()
+            session.headers['Authorization'] = f'Token {token}'
+            return session
+
+        scenarios = self.get_scenarios(rng)
+        if options['scenario']:
+            scenarios = [scenario for scenario in scenarios
+                         if scenario.name in options['scenario']]
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = self.run_scenario(
+                scenario,
+                session_factory,
+                options['base_url'].rstrip('/'),
+                options['duration'],
+                options['concurrency']
+            )
+            stats = results[scenario.name]
+            self.stdout.write(
+                f'{scenario.name}: {stats["rps"]} rps, '
+                f'p50 {stats["p50_ms"]} ms, p95 {stats["p95_ms"]} ms, '
+                f'p99 {stats["p99_ms"]} ms, errors {stats["errors"]}, '
+                f'4xx {stats["client_errors"]}, 429 {stats["throttled"]}'
+            )
+
+        report = {
+            'commit': self.get_commit(),
+            'timestamp': datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            'base_url': options['base_url'],
+            'duration': options['duration'],
+            'concurrency': options['concurrency'],
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f'Results saved to {options["output"]}')
+            )
+
+        throttled = [name for name, stats in results.items()
+                     if stats['throttled']]
+        if throttled:
+            raise CommandError(
+                f'Requests were throttled in {", ".join(throttled)}: '
+                'latency and rps are not comparable. Run the server with '
+                'THROTTLING_ENABLED=False.'
+            )
@@ -0,0 +1,83 @@
+import io
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from events.models import Event
+from events.serializers import EventReadSerializer
+from utils.dataset import DatasetGenerator
+from utils.parsers import ORJSONParser
+from utils.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = ('Compare stdlib and orjson based renderer and parser '
+            'on event list payloads')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--generate', action='store_true',
+                            help='Generate data in a rolled back transaction')
+
+    def measure(self, function, repeat):
+        return min(timeit.repeat(function, number=1, repeat=repeat))
+
+    def report(self, name, slow_time, fast_time):
+        self.stdout.write(
+            f'{name}: {slow_time * 1000:.3f} ms -> '
+            f'{fast_time * 1000:.3f} ms, x{slow_time / fast_time:.1f}'
+        )
+
+    def run(self, options):
+        user = get_user_model().objects.filter(is_active=True).first()
+        events = list(
+            Event.objects.with_user_data(user)[:options['page_size']]
+        )
+        if not events:
+            raise CommandError('No data. Use --generate or generate_data.')
+
+        request = Request(APIRequestFactory().get('/api/events/'))
+        request.user = user
+        data = EventReadSerializer(events, many=True,
+                                   context={'request': request}).data
+
+        payload = JSONRenderer().render(data)
+        if ORJSONRenderer().render(data) != payload:
+            raise CommandError('orjson renderer output differs')
+        self.stdout.write(f'Payload: {len(events)} events, '
+                          f'{len(payload)} bytes')
+
+        repeat = options['repeat']
+        self.report(
+            'render',
+            self.measure(lambda: JSONRenderer().render(data), repeat),
+            self.measure(lambda: ORJSONRenderer().render(data), repeat),
+        )
+        self.report(
+            'parse',
+            self.measure(
+                lambda: JSONParser().parse(io.BytesIO(payload)), repeat
+            ),
+            self.measure(
+                lambda: ORJSONParser().parse(io.BytesIO(payload)), repeat
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed')
+        if not options['generate']:
+            return self.run(options)
+
+        with transaction.atomic():
+            DatasetGenerator(seed=0).generate(users=200, events=500)
+            self.run(options)
+            transaction.set_rollback(True)
@@ -0,0 +1,91 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from events.models import Comment, Event
+from events.serializers import (CommentReadSerializer,
+                                CommentSerializer,
+                                EventReadSerializer,
+                                EventSerializer)
+from users.serializers import CustomUserReadSerializer, CustomUserSerializer
+from utils.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = ('Compare DRF model serializers with fast read-only serializers '
+            'on list pages: check identical output and measure speedup')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--generate', action='store_true',
+                            help='Generate data in a rolled back transaction')
+
+    def get_request(self, user):
+        request = Request(APIRequestFactory().get('/api/events/'))
+        request.user = user
+        return request
+
+    def compare(self, name, slow, fast, objects, request, repeat):
+        objects = list(objects)
+        context = {'request': request}
+        renderer = JSONRenderer()
+
+        slow_bytes = renderer.render(slow(objects, many=True,
+                                          context=context).data)
+        fast_bytes = renderer.render(fast(objects, many=True,
+                                          context=context).data)
+        if slow_bytes != fast_bytes:
+            raise CommandError(f'{name}: fast serializer output differs')
+
+        slow_time = min(timeit.repeat(
+            lambda: slow(objects, many=True, context=context).data,
+            number=1, repeat=repeat
+        ))
+        fast_time = min(timeit.repeat(
+            lambda: fast(objects, many=True, context=context).data,
+            number=1, repeat=repeat
+        ))
+        self.stdout.write(
+            f'{name} ({len(objects)} objects): '
+            f'{slow_time * 1000:.2f} ms -> {fast_time * 1000:.2f} ms, '
+            f'x{slow_time / fast_time:.1f}'
+        )
+
+    def run(self, options):
+        user = get_user_model().objects.filter(is_active=True).first()
+        if user is None or not Event.objects.exists():
+            raise CommandError('No data. Use --generate or generate_data.')
+        request = self.get_request(user)
+        size = options['page_size']
+
+        self.compare(
+            'events', EventSerializer, EventReadSerializer,
+            Event.objects.with_user_data(user)[:size],
+            request, options['repeat']
+        )
+        self.compare(
+            'comments', CommentSerializer, CommentReadSerializer,
+            Comment.objects.with_user_data(user)[:size],
+            request, options['repeat']
+        )
+        self.compare(
+            'users', CustomUserSerializer, CustomUserReadSerializer,
+            get_user_model().objects.with_user_data(user)[:size],
+            request, options['repeat']
+        )
+
+    def handle(self, *args, **options):
+        if not options['generate']:
+            return self.run(options)
+
+        with transaction.atomic():
+            DatasetGenerator(seed=0).generate(users=200, events=500)
+            self.run(options)
+            transaction.set_rollback(True)
@@ -0,0 +1,297 @@
+import atexit
+import bisect
+import fcntl
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, math.inf)
+
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Latency of API requests by view action'
+    ),
+    'db_queries_total': (
+        'counter', 'Number of DB queries by view action'
+    ),
+    'db_query_duration_seconds_total': (
+        'counter', 'Time spent in DB queries by view action'
+    ),
+    'geocoder_request_duration_seconds': (
+        'histogram', 'Latency of external geocoder calls'
+    ),
+    'geocoder_errors_total': (
+        'counter', 'Number of failed geocoder calls'
+    ),
+    'cache_requests_total': (
+        'counter', 'Number of cache lookups by result'
+    ),
+    'throttled_requests_total': (
+        'counter', 'Number of requests rejected by throttling'
+    ),
+    'cache_hit_ratio': (
+        'gauge', 'Share of cache lookups that were hits'
+    ),
+}
+
+
+def labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Метрики текущего процесса. Периодически сохраняются в файл,
+    чтобы эндпоинт /metrics мог агрегировать данные всех процессов."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, labels=None, value=1):
+        with self.lock:
+            self.counters[(name, labels_key(labels or {}))] += value
+        self.flush()
+
+    def observe(self, name, value, labels=None):
+        key = (name, labels_key(labels or {}))
+        with self.lock:
+            counts, total = self.histograms.get(
+                key, ([0] * len(DEFAULT_BUCKETS), 0.0)
+            )
+            counts[bisect.bisect_left(DEFAULT_BUCKETS, value)] += 1
+            self.histograms[key] = (counts, total + value)
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, dict(labels), list(counts), total]
+                    for (name, labels), (counts, total)
+                    in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+
+        root = metrics_root()
+        descriptor, path = tempfile.mkstemp(dir=root, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path, os.path.join(root, f'{os.getpid()}.json'))
+
+
+def metrics_root():
+    os.makedirs(settings.METRICS_ROOT, exist_ok=True)
+    return settings.METRICS_ROOT
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, force=True)
+
+
+def observe_request(view, method, status, duration, request_stats):
+    labels = {'view': view, 'method': method, 'status': str(status)}
+    registry.observe('http_request_duration_seconds', duration, labels)
+    if request_stats is not None:
+        registry.inc('db_queries_total', {'view': view},
+                     request_stats.queries)
+        registry.inc('db_query_duration_seconds_total', {'view': view},
+                     request_stats.db_time)
+
+
+def observe_geocoder(duration, failed):
+    registry.observe('geocoder_request_duration_seconds', duration)
+    if failed:
+        registry.inc('geocoder_errors_total')
+
+
+def record_cache(cache, hit):
+    """Учитывает попадание или промах кэша с указанным именем."""
+    registry.inc('cache_requests_total',
+                 {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def record_throttle(scope, kind):
+    registry.inc('throttled_requests_total', {'scope': scope, 'kind': kind})
+
+
+def process_alive(pid):
+    """Проверяет, что процесс хоста с указанным PID еще работает."""
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Файл с суммой метрик завершившихся процессов: счетчики не уменьшаются
+# после перезапуска воркеров, и Prometheus не видит ложного сброса.
+ARCHIVE = 'archive.json'
+
+
+def empty_metrics():
+    return defaultdict(float), {}
+
+
+def merge(metrics, data):
+    """Добавляет к суммам метрики из снимка процесса или архива."""
+    counters, histograms = metrics
+    for name, labels, value in data['counters']:
+        counters[(name, labels_key(labels))] += value
+    for name, labels, counts, total in data['histograms']:
+        key = (name, labels_key(labels))
+        merged_counts, merged_total = histograms.get(
+            key, ([0] * len(DEFAULT_BUCKETS), 0.0)
+        )
+        histograms[key] = (
+            [left + right for left, right in zip(merged_counts, counts)],
+            merged_total + total
+        )
+
+
+def load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def dump(metrics):
+    counters, histograms = metrics
+    return {
+        'counters': [[name, dict(labels), value]
+                     for (name, labels), value in counters.items()],
+        'histograms': [[name, dict(labels), counts, total]
+                       for (name, labels), (counts, total)
+                       in histograms.items()],
+    }
+
+
+def archive_dead(root):
+    """Переносит метрики завершившихся процессов в архив и удаляет
+    их файлы. Вызывается под блокировкой каталога. Архив записывается
+    до удаления файлов, поэтому прерванный перенос не теряет данные."""
+    dead = [filename for filename in os.listdir(root)
+            if filename.endswith('.json') and filename != ARCHIVE
+            and not process_alive(filename[:-len('.json')])]
+    if not dead:
+        return
+
+    archive = empty_metrics()
+    data = load(os.path.join(root, ARCHIVE))
+    if data is not None:
+        merge(archive, data)
+    for filename in dead:
+        data = load(os.path.join(root, filename))
+        if data is not None:
+            merge(archive, data)
+
+    descriptor, path = tempfile.mkstemp(dir=root, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(dump(archive), file)
+    os.replace(path, os.path.join(root, ARCHIVE))
+    for filename in dead:
+        try:
+            os.remove(os.path.join(root, filename))
+        except OSError:
+            pass
+
+
+def collect():
+    """Суммирует метрики всех процессов хоста, включая архив
+    завершившихся."""
+    registry.flush(force=True)
+    root = metrics_root()
+    metrics = empty_metrics()
+    # Сбор и перенос в архив выполняются под одной блокировкой:
+    # иначе параллельный сбор мог бы учесть метрики процесса дважды,
+    # в архиве и в еще не удаленном файле.
+    with open(os.path.join(root, 'archive.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_dead(root)
+        for filename in os.listdir(root):
+            if not filename.endswith('.json'):
+                continue
+            data = load(os.path.join(root, filename))
+            if data is not None:
+                merge(metrics, data)
+    return metrics
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in items
+    ) + '}'
+
+
+def format_bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(bound)
+
+
+def render():
+    """Метрики в текстовом формате Prometheus."""
+    counters, histograms = collect()
+
+    hits = defaultdict(lambda: [0.0, 0.0])
+    for (name, labels), value in counters.items():
+        if name == 'cache_requests_total':
+            labels = dict(labels)
+            hits[labels['cache']][labels['result'] == 'hit'] += value
+    gauges = {
+        ('cache_hit_ratio', (('cache', cache),)): hit / (hit + miss)
+        for cache, (miss, hit) in hits.items() if hit + miss
+    }
+
+    lines = []
+    for metric, (metric_type, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        for (name, labels), value in sorted({**counters, **gauges}.items()):
+            if name == metric:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), (counts, total) in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels, le=format_bound(bound))} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
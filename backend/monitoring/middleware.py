@@ -0,0 +1,137 @@
+import cProfile
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .metrics import observe_request
+from .profiling import save_profile
+from .stats import collect_stats, get_current_stats
+
+
+logger = logging.getLogger('monitoring.queries')
+
+
+class QueryCountMiddleware:
+    """Мидлварь, фиксирующая количество запросов к БД, их суммарное время
+    и повторяющиеся SQL-запросы для каждого HTTP-запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_stats() as stats:
+            response = self.get_response(request)
+
+        db_time_ms = round(stats.db_time * 1000, 2)
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = stats.queries
+            response['X-DB-Time-Ms'] = db_time_ms
+            response['X-DB-Duplicate-Queries'] = stats.duplicates
+
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_time_ms': db_time_ms,
+            'duplicates': stats.duplicates,
+        }
+        if stats.queries > settings.QUERY_BUDGET:
+            data['duplicated_sql'] = stats.duplicated_statements()
+            logger.warning('Query budget exceeded', extra={'data': data})
+        else:
+            logger.info('Request queries', extra={'data': data})
+
+        return response
+
+
+class ProfilingMiddleware:
+    """Мидлварь профилирования запросов с помощью cProfile.
+    Включается заголовком X-Profile для персонала или случайной
+    выборкой запросов с долей PROFILING_SAMPLE_RATE."""
+
+    header = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_staff_request(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        for authentication_class in authentication_classes:
+            try:
+                result = authentication_class().authenticate(request)
+            except exceptions.APIException:
+                return False
+            if result is not None:
+                return result[0].is_staff
+        return False
+
+    def should_profile(self, request):
+        if request.META.get(self.header):
+            return self.is_staff_request(request)
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        with ExitStack() as stack:
+            request_stats = get_current_stats()
+            if request_stats is None:
+                request_stats = stack.enter_context(collect_stats())
+
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError:
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+
+        name = save_profile(profiler, request, response,
+                            request_stats, elapsed)
+        if request.META.get(self.header):
+            response['X-Profile-Id'] = name
+        return response
+
+
+class MetricsMiddleware:
+    """Мидлварь, собирающая метрики задержки и обращений к БД
+    для каждого действия вьюсета."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        observe_request(getattr(request, 'metrics_view', 'unresolved'),
+                        request.method,
+                        response.status_code,
+                        time.perf_counter() - start,
+                        get_current_stats())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.metrics_view = view_func.__name__
+            return None
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        request.metrics_view = f'{view_class.__name__}.{action}'
+        return None
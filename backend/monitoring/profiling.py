@@ -0,0 +1,121 @@
+import json
+import os
+import pstats
+import re
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+
+PROFILE_NAME_RE = re.compile(r'^[\w-]+$')
+
+
+def profiles_root():
+    os.makedirs(settings.PROFILING_ROOT, exist_ok=True)
+    return settings.PROFILING_ROOT
+
+
+def serialization_time(stats):
+    """Время сериализации: наибольшее накопленное время среди методов
+    to_representation (вложенные вызовы уже входят во внешний).
+    Включает ленивые запросы к БД, выполненные из сериализаторов."""
+    return max(
+        (cumulative
+         for (_, _, function), (_, _, _, cumulative, _)
+         in stats.stats.items()
+         if function == 'to_representation'),
+        default=0.0
+    )
+
+
+def top_functions(stats, limit=30):
+    rows = sorted(stats.stats.items(),
+                  key=lambda item: item[1][3],
+                  reverse=True)[:limit]
+    return [
+        {
+            'function': f'{filename}:{line}({function})',
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        }
+        for (filename, line, function), (_, calls, total, cumulative, _)
+        in rows
+    ]
+
+
+def save_profile(profiler, request, response, request_stats, elapsed):
+    """Сохраняет профиль запроса и сводку по времени выполнения."""
+    stats = pstats.Stats(profiler)
+    serialization = serialization_time(stats)
+    name = (f'{timezone.now():%Y%m%d%H%M%S}-'
+            f'{uuid.uuid4().hex[:8]}')
+    root = profiles_root()
+
+    profiler.dump_stats(os.path.join(root, f'{name}.prof'))
+    metadata = {
+        'name': name,
+        'created': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'breakdown_ms': {
+            'total': round(elapsed * 1000, 3),
+            'db': round(request_stats.db_time * 1000, 3),
+            'geocoder': round(request_stats.geocoder_time * 1000, 3),
+            'serialization': round(serialization * 1000, 3),
+        },
+        'queries': request_stats.queries,
+        'geocoder_calls': request_stats.geocoder_calls,
+        'top_functions': top_functions(stats),
+    }
+    with open(os.path.join(root, f'{name}.json'), 'w',
+              encoding='utf-8') as file:
+        json.dump(metadata, file, ensure_ascii=False)
+
+    remove_old_profiles(root)
+    return name
+
+
+def remove_old_profiles(root):
+    names = sorted(
+        filename[:-len('.json')] for filename in os.listdir(root)
+        if filename.endswith('.json')
+    )
+    for name in names[:-settings.PROFILING_MAX_FILES]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(root, name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    root = profiles_root()
+    profiles = []
+    for filename in sorted(os.listdir(root), reverse=True):
+        if filename.endswith('.json'):
+            metadata = get_profile(filename[:-len('.json')])
+            if metadata is not None:
+                metadata.pop('top_functions', None)
+                profiles.append(metadata)
+    return profiles
+
+
+def get_profile(name):
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    try:
+        with open(os.path.join(profiles_root(), f'{name}.json'),
+                  encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def get_profile_path(name):
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(profiles_root(), f'{name}.prof')
+    return path if os.path.exists(path) else None
@@ -0,0 +1,79 @@
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+from .metrics import observe_geocoder
+
+
+_current_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Статистика обращений к БД в рамках одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.geocoder_calls = 0
+        self.geocoder_errors = 0
+        self.geocoder_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Количество повторных выполнений одинаковых SQL-запросов."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def duplicated_statements(self):
+        return {sql: count
+                for sql, count in self.statements.items()
+                if count > 1}
+
+
+def get_current_stats():
+    """Статистика текущего запроса или None вне запроса."""
+    return _current_stats.get()
+
+
+@contextmanager
+def collect_stats():
+    """Собирает статистику запросов ко всем подключениям к БД."""
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def track_geocoder():
+    """Учитывает время и ошибки обращения к внешнему геокодеру."""
+    stats = get_current_stats()
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_geocoder(elapsed, failed)
+        if stats is not None:
+            stats.geocoder_calls += 1
+            stats.geocoder_errors += failed
+            stats.geocoder_time += elapsed
@@ -0,0 +1,274 @@
+import datetime
+from contextlib import contextmanager
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from events.geocoder import GeocoderResult
+from events.models import Comment, Event
+from events.recommendations import RecommendationBuilder
+from events.similar import rebuild_similar_events
+from events.snapshots import build_snapshots
+from utils.dataset import DEFAULT_PASSWORD, DatasetGenerator
+
+
+PAGE_SIZES = (1, 10, 50)
+
+# Максимально допустимое количество запросов к БД для списков.
+# Количество запросов не должно зависеть от размера страницы.
+LIST_BUDGETS = {
+    'activities-list': ('/api/activities/', 1),
+    'events-list': ('/api/events/', 4),
+    'comments-list': ('/api/events/{comment_event}/comments/', 3),
+    'series-list': ('/api/series/', 3),
+    'users-list': ('/api/users/', 3),
+    'users-subscriptions': ('/api/users/subscriptions/', 3),
+}
+
+# Бюджеты эндпоинтов чтения и связей пользователя с объектами.
+BUDGETS = {
+    'activities-detail': ('GET', '/api/activities/{activity}/', 1),
+    'events-detail': ('GET', '/api/events/{event}/', 1),
+    'events-similar': ('GET', '/api/events/{event}/similar/', 4),
+    'events-calendar': ('GET', '/api/events/calendar/?month={month}', 4),
+    'events-favorite-create': ('POST', '/api/events/{event}/favorite/', 9),
+    'events-favorite-delete': ('DELETE', '/api/events/{event}/favorite/', 5),
+    'events-participate-create': (
+        'POST', '/api/events/{event}/participate/', 14
+    ),
+    'events-participate-delete': (
+        'DELETE', '/api/events/{event}/participate/', 11
+    ),
+    'comments-detail': (
+        'GET', '/api/events/{comment_event}/comments/{comment}/', 2
+    ),
+    'comments-like-create': (
+        'POST', '/api/events/{comment_event}/comments/{comment}/like/', 9
+    ),
+    'comments-like-delete': (
+        'DELETE', '/api/events/{comment_event}/comments/{comment}/like/', 10
+    ),
+    'users-detail': ('GET', '/api/users/{author}/', 2),
+    'users-me': ('GET', '/api/users/me/', 3),
+    'users-subscribe-create': ('POST', '/api/users/{author}/subscribe/', 7),
+    'users-subscribe-delete': ('DELETE', '/api/users/{author}/subscribe/', 5),
+    'users-recommendations': ('GET', '/api/users/recommendations/', 3),
+}
+
+# Бюджеты изменяющих эндпоинтов. Запись затрагивает счетчики, журнал
+# синхронизации, снимки и сводки календаря, поэтому бюджеты выше,
+# но не зависят от объема данных.
+EVENT_CREATE_BUDGET = 30
+EVENT_UPDATE_BUDGET = 20
+EVENT_DELETE_BUDGET = 50
+COMMENT_CREATE_BUDGET = 15
+COMMENT_UPDATE_BUDGET = 12
+COMMENT_DELETE_BUDGET = 20
+SERIES_CREATE_BUDGET = 20
+BATCH_BUDGET = 30
+SYNC_BUDGET = 8
+
+GEOCODED = GeocoderResult('Москва, Тверская улица, 1', 55.7575, 37.6134)
+
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'query-budget-{alias}'}
+    for alias in ('default', 'throttle')
+}
+
+
+@override_settings(CACHES=TEST_CACHES, THROTTLING_ENABLED=False)
+@mock.patch('events.geocoder.lookup', return_value=GEOCODED)
+class QueryBudgetTests(TestCase):
+    """Количество запросов к БД эндпоинтов API на связанных данных:
+    не больше бюджета и не зависит от размера страницы или пакета."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = DatasetGenerator(seed=0).generate(users=30, events=60)
+        RecommendationBuilder().build()
+        rebuild_similar_events()
+        build_snapshots(Event.objects.all())
+
+        cls.user = dataset['users'][0]
+        cls.activity = dataset['activities'][0]
+        events = Event.objects.exclude(
+            users_favorite_for_event__user=cls.user
+        ).exclude(
+            users_participation_for_event__user=cls.user
+        ).order_by('pk')
+        # Без ограничения мест пакетная запись не уходит в лист ожидания,
+        # и число запросов пакета не зависит от свободных мест.
+        Event.objects.filter(pk__in=events.values('pk')).update(capacity=None)
+        cls.free_events = list(events.values_list('pk', flat=True)[:12])
+        cls.free_comments = list(Comment.objects.exclude(
+            users_for_liked_comment__user=cls.user
+        ).order_by('pk').values_list('pk', flat=True)[:12])
+        comment = Comment.objects.get(pk=cls.free_comments[0])
+        author = get_user_model().objects.exclude(
+            subscribers__user=cls.user
+        ).exclude(pk=cls.user.pk).first()
+
+        cls.ids = {
+            'activity': cls.activity.pk,
+            'event': cls.free_events[0],
+            'comment_event': comment.event_id,
+            'comment': comment.pk,
+            'author': author.pk,
+            'month': timezone.localdate().strftime('%Y-%m'),
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @contextmanager
+    def assertQueryBudget(self, name, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        self.assertLessEqual(
+            len(context.captured_queries), budget,
+            f'{name}: {len(context.captured_queries)} queries, '
+            f'budget {budget}'
+        )
+
+    def request(self, method, url, expected_status=None, **kwargs):
+        response = getattr(self.client, method.lower())(url, **kwargs)
+        if expected_status is None:
+            self.assertLess(response.status_code, 400, f'{method} {url}')
+        else:
+            self.assertEqual(response.status_code, expected_status,
+                             f'{method} {url}')
+        return response
+
+    def test_lists_do_not_depend_on_page_size(self, lookup):
+        for name, (url, budget) in LIST_BUDGETS.items():
+            url = url.format(**self.ids)
+            with self.subTest(name):
+                # Первый запрос заполняет кэши процесса.
+                self.request('GET', url)
+                counts = []
+                for page_size in PAGE_SIZES:
+                    with self.assertQueryBudget(name, budget) as context:
+                        self.request('GET', url,
+                                     data={'page_size': page_size})
+                    counts.append(len(context.captured_queries))
+                self.assertEqual(len(set(counts)), 1,
+                                 f'{name}: {counts} by page size')
+
+    def test_endpoints(self, lookup):
+        for name, (method, url, budget) in BUDGETS.items():
+            with self.subTest(name), self.assertQueryBudget(name, budget):
+                self.request(method, url.format(**self.ids))
+
+    def test_auth(self, lookup):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as context:
+            response = client.post('/api/auth/token/login/',
+                                   {'email': self.user.email,
+                                    'password': DEFAULT_PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), 6)
+
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.post('/api/auth/token/logout/')
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(len(context.captured_queries), 4)
+
+    def test_event_write(self, lookup):
+        data = {
+            'name': 'Пробежка в парке',
+            'description': 'Бюджет запросов',
+            'activity': [self.activity.pk],
+            'datetime': (timezone.now()
+                         + datetime.timedelta(days=3)).isoformat(),
+            'duration': 60,
+            'capacity': 10,
+            'location': {'address': GEOCODED.address},
+        }
+        with self.assertQueryBudget('events-create', EVENT_CREATE_BUDGET):
+            response = self.request('POST', '/api/events/',
+                                    status.HTTP_201_CREATED,
+                                    data=data, format='json')
+        url = f'/api/events/{response.data["id"]}/'
+
+        with self.assertQueryBudget('events-update', EVENT_UPDATE_BUDGET):
+            self.request('PATCH', url, data={'name': 'Пробежка у реки'},
+                         format='json')
+        with self.assertQueryBudget('events-delete', EVENT_DELETE_BUDGET):
+            self.request('DELETE', url, status.HTTP_204_NO_CONTENT)
+
+    def test_comment_write(self, lookup):
+        url = f'/api/events/{self.ids["comment_event"]}/comments/'
+        with self.assertQueryBudget('comments-create',
+                                    COMMENT_CREATE_BUDGET):
+            response = self.request('POST', url, status.HTTP_201_CREATED,
+                                    data={'text': 'Бюджет запросов'},
+                                    format='json')
+        url = f'{url}{response.data["id"]}/'
+
+        with self.assertQueryBudget('comments-update',
+                                    COMMENT_UPDATE_BUDGET):
+            self.request('PATCH', url, data={'text': 'Новый текст'},
+                         format='json')
+        with self.assertQueryBudget('comments-delete',
+                                    COMMENT_DELETE_BUDGET):
+            self.request('DELETE', url, status.HTTP_204_NO_CONTENT)
+
+    def test_series(self, lookup):
+        data = {
+            'name': 'Йога по понедельникам',
+            'description': 'Бюджет запросов',
+            'activity': [self.activity.pk],
+            'duration': 60,
+            'location': {'address': GEOCODED.address},
+            'dtstart': timezone.now().isoformat(),
+            'rrule': 'FREQ=WEEKLY;BYDAY=MO',
+        }
+        with self.assertQueryBudget('series-create', SERIES_CREATE_BUDGET):
+            response = self.request('POST', '/api/series/',
+                                    status.HTTP_201_CREATED,
+                                    data=data, format='json')
+        with self.assertQueryBudget('series-detail', 2):
+            self.request('GET', f'/api/series/{response.data["id"]}/')
+
+    def batch_queries(self, events, comments):
+        operations = [
+            *({'op': 'add', 'target_type': 'favorite', 'id': pk}
+              for pk in events),
+            *({'op': 'add', 'target_type': 'participation', 'id': pk}
+              for pk in events),
+            *({'op': 'add', 'target_type': 'like', 'id': pk}
+              for pk in comments),
+        ]
+        with self.assertQueryBudget('batch', BATCH_BUDGET) as context:
+            self.request('POST', '/api/batch/',
+                         data={'operations': operations}, format='json')
+        return len(context.captured_queries)
+
+    def test_batch_does_not_depend_on_size(self, lookup):
+        single = self.batch_queries(self.free_events[:1],
+                                    self.free_comments[:1])
+        many = self.batch_queries(self.free_events[1:],
+                                  self.free_comments[1:])
+        self.assertEqual(single, many)
+
+    def test_sync_does_not_depend_on_page_size(self, lookup):
+        self.request('GET', '/api/sync/')
+        counts = []
+        for limit in PAGE_SIZES:
+            with self.assertQueryBudget('sync', SYNC_BUDGET) as context:
+                self.request('GET', '/api/sync/',
+                             data={'since': 0, 'limit': limit})
+            counts.append(len(context.captured_queries))
+        self.assertEqual(len(set(counts)), 1, f'sync: {counts} by limit')
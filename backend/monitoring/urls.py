@@ -0,0 +1,14 @@
+from django.urls import include, path
+from rest_framework import routers
+
+from .views import ProfileViewSet
+
+app_name = 'monitoring'
+
+router_monitoring_v1 = routers.DefaultRouter()
+
+router_monitoring_v1.register('profiles', ProfileViewSet, basename='profiles')
+
+urlpatterns = [
+    path('', include(router_monitoring_v1.urls)),
+]
@@ -0,0 +1,56 @@
+import hmac
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+
+from drf_spectacular.utils import extend_schema, extend_schema_view
+
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .metrics import render
+from .profiling import get_profile, get_profile_path, list_profiles
+
+
+def metrics(request):
+    """Метрики всех процессов хоста в формате Prometheus.
+    Доступны по токену METRICS_TOKEN или администраторам."""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization,
+                                          f'Bearer {token}')
+            or request.user.is_staff):
+        return HttpResponse(status=403)
+    return HttpResponse(render(),
+                        content_type='text/plain; version=0.0.4')
+
+
+@extend_schema(tags=['Мониторинг'])
+@extend_schema_view(
+    list=extend_schema(summary='Получение списка профилей запросов'),
+    retrieve=extend_schema(summary='Сводка профиля запроса'),
+)
+class ProfileViewSet(viewsets.ViewSet):
+    """Вьюсет для просмотра и скачивания профилей запросов."""
+    permission_classes = (permissions.IsAdminUser,)
+    lookup_value_regex = r'[\w-]+'
+
+    def list(self, request):
+        return Response(list_profiles())
+
+    def retrieve(self, request, pk):
+        profile = get_profile(pk)
+        if profile is None:
+            raise Http404
+        return Response(profile)
+
+    @extend_schema(summary='Скачивание профиля в формате pstats')
+    @action(methods=['GET'], detail=True)
+    def download(self, request, pk):
+        path = get_profile_path(pk)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'),
+                            as_attachment=True,
+                            filename=f'{pk}.prof')
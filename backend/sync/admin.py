@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from utils.admin import LargeTableAdmin, input_filter
+
+from .models import ChangeLog
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(LargeTableAdmin):
+    list_display = ('id',
+                    'object_type',
+                    'object_id',
+                    'user',
+                    'deleted',
+                    'created')
+    list_select_related = ('user',)
+    list_filter = ('object_type',
+                   'deleted',
+                   input_filter('object_id', 'ID объекта'),
+                   input_filter('user__username', 'пользователю'))
+    raw_id_fields = ('user',)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class SyncConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sync'
+    verbose_name = 'Синхронизация'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,165 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from rest_framework.exceptions import APIException
+
+from events.models import Comment, Event
+
+from .models import ChangeLog
+
+
+class CursorExpired(APIException):
+    status_code = 410
+    default_detail = ('Курсор устарел: журнал изменений очищен. '
+                      'Загрузите данные полностью и начните синхронизацию '
+                      'с нового курсора.')
+    default_code = 'cursor_expired'
+
+
+POSITION_SEQUENCE = 'sync_changelog_position_seq'
+
+# Идентификатор транзакционной блокировки присвоения позиций.
+PUBLISH_LOCK_ID = 0x73796e635f6c6f67
+
+
+def current_xid():
+    """Выражение для записи идентификатора текущей транзакции."""
+    return RawSQL('pg_current_xact_id()::text::bigint', ())
+
+
+def publish():
+    """Присваивает позиции записям журнала, транзакции которых
+    завершены: их xid меньше xmin текущего снимка. Записи долгой
+    транзакции получают позиции после ее фиксации, поэтому клиент
+    с уже выданным курсором их не пропустит. Присвоение выполняется
+    под блокировкой, чтобы позиции фиксировались в порядке возрастания.
+    Если позиции уже присваивает другой запрос, присвоение пропускается:
+    записи будут видны в следующем запросе."""
+    table = connection.ops.quote_name(ChangeLog._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)',
+                       [PUBLISH_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(f"""
+            UPDATE {table} AS log
+            SET position = published.position
+            FROM (
+                SELECT id, nextval('{POSITION_SEQUENCE}') AS position
+                FROM (
+                    SELECT id FROM {table}
+                    WHERE position IS NULL
+                      AND COALESCE(xid, 0) < pg_snapshot_xmin(
+                          pg_current_snapshot()
+                      )::text::bigint
+                    ORDER BY id
+                ) AS finished
+            ) AS published
+            WHERE log.id = published.id
+        """)
+
+
+def latest_cursor():
+    return ChangeLog.objects.filter(position__isnull=False).order_by(
+        '-position'
+    ).values_list('position', flat=True).first() or 0
+
+
+def event_representation(event):
+    return {
+        'id': event.id,
+        'name': event.name,
+        'description': event.description,
+        'activity': [activity.id for activity in event.activity.all()],
+        'datetime': event.datetime.isoformat(),
+        'author': event.author_id,
+        'duration': event.duration,
+        'location': {
+            'address': event.location.address,
+            'point': [event.location.point.x, event.location.point.y],
+        },
+        'capacity': event.capacity,
+        'participants_count': event.participants_count,
+        'series': event.series_id,
+    }
+
+
+def comment_representation(comment):
+    return {
+        'id': comment.id,
+        'event': comment.event_id,
+        'author': {'id': comment.author.id,
+                   'username': comment.author.username},
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+    }
+
+
+def get_changes(user, since, limit):
+    """Изменения после курсора since, видимые пользователю.
+    Несколько изменений одного объекта схлопываются в последнее
+    состояние; для удаленных объектов возвращаются только ID."""
+    publish()
+    if since is None:
+        return {'cursor': latest_cursor(), 'has_more': False}
+
+    oldest = ChangeLog.objects.filter(position__isnull=False).order_by(
+        'position'
+    ).values_list('position', flat=True).first()
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired()
+
+    rows = list(ChangeLog.objects.filter(
+        Q(user__isnull=True) | Q(user=user),
+        position__gt=since
+    ).order_by('position').values_list('position',
+                                       'object_type',
+                                       'object_id',
+                                       'deleted')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    states = {}
+    for _, object_type, object_id, deleted in rows:
+        states[object_type, object_id] = deleted
+
+    def ids(object_type, deleted):
+        return [object_id for (kind, object_id), state in states.items()
+                if kind == object_type and state == deleted]
+
+    events = list(Event.objects.filter(
+        pk__in=ids(ChangeLog.EVENT, False)
+    ).select_related('location').prefetch_related('activity'))
+    comments = list(Comment.objects.filter(
+        pk__in=ids(ChangeLog.COMMENT, False)
+    ).select_related('author'))
+
+    # Объект мог быть удален после записи в журнал.
+    missing_events = set(ids(ChangeLog.EVENT, False)) - {
+        event.id for event in events
+    }
+    missing_comments = set(ids(ChangeLog.COMMENT, False)) - {
+        comment.id for comment in comments
+    }
+
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': has_more,
+        'events': [event_representation(event) for event in events],
+        'comments': [comment_representation(comment)
+                     for comment in comments],
+        'deleted': {
+            'events': ids(ChangeLog.EVENT, True) + sorted(missing_events),
+            'comments': (ids(ChangeLog.COMMENT, True)
+                         + sorted(missing_comments)),
+        },
+        'favorites': {
+            'added': ids(ChangeLog.FAVORITE, False),
+            'removed': ids(ChangeLog.FAVORITE, True),
+        },
+        'participations': {
+            'added': ids(ChangeLog.PARTICIPATION, False),
+            'removed': ids(ChangeLog.PARTICIPATION, True),
+        },
+    }
@@ -0,0 +1,27 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sync.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = ('Delete old change log entries. Clients with older cursors '
+            'get 410 and have to reload their data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.SYNC_CHANGELOG_DAYS,
+                            help='Keep entries newer than this many days')
+
+    def handle(self, *args, **options):
+        deleted, _ = ChangeLog.objects.filter(
+            created__lt=timezone.now() - datetime.timedelta(
+                days=options['days']
+            )
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} change log entries'
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-19 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('event', 'Мероприятие'), ('comment', 'Комментарий'), ('favorite', 'Избранное'), ('participation', 'Участие')], max_length=16, verbose_name='Тип объекта')),
+                ('object_id', models.BigIntegerField(help_text='Для избранного и участия - ID мероприятия', verbose_name='ID объекта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удален')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(blank=True, help_text='Пусто для изменений, видимых всем пользователям', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='xid',
+            field=models.BigIntegerField(editable=False, help_text='pg_current_xact_id() транзакции, создавшей запись', null=True, verbose_name='Транзакция'),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='position',
+            field=models.BigIntegerField(editable=False, help_text='Пусто, пока транзакция записи не завершена', null=True, unique=True, verbose_name='Позиция'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['id'], name='changelog_unpublished_idx'),
+        ),
+        # Выданные клиентам курсоры - id записей, поэтому существующие
+        # записи получают позицию, равную id.
+        migrations.RunSQL(
+            sql=[
+                'CREATE SEQUENCE sync_changelog_position_seq',
+                'UPDATE sync_changelog SET position = id',
+                "SELECT setval('sync_changelog_position_seq', "
+                'COALESCE((SELECT MAX(id) FROM sync_changelog), 0) + 1, '
+                'false)',
+            ],
+            reverse_sql=['DROP SEQUENCE sync_changelog_position_seq'],
+        ),
+    ]
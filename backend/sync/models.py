@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import models
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений для инкрементальной синхронизации клиентов.
+    Записи только добавляются. Курсором служит позиция, которая
+    присваивается записи после завершения ее транзакции: порядок
+    позиций совпадает с порядком, в котором записи становятся видны."""
+    EVENT = 'event'
+    COMMENT = 'comment'
+    FAVORITE = 'favorite'
+    PARTICIPATION = 'participation'
+    TYPES = (
+        (EVENT, 'Мероприятие'),
+        (COMMENT, 'Комментарий'),
+        (FAVORITE, 'Избранное'),
+        (PARTICIPATION, 'Участие'),
+    )
+
+    object_type = models.CharField(
+        'Тип объекта',
+        max_length=16,
+        choices=TYPES
+    )
+    object_id = models.BigIntegerField(
+        'ID объекта',
+        help_text='Для избранного и участия - ID мероприятия'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        related_name='changes',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text='Пусто для изменений, видимых всем пользователям'
+    )
+    deleted = models.BooleanField('Удален', default=False)
+    created = models.DateTimeField(
+        'Дата изменения',
+        auto_now_add=True,
+        db_index=True
+    )
+    xid = models.BigIntegerField(
+        'Транзакция',
+        null=True,
+        editable=False,
+        help_text='pg_current_xact_id() транзакции, создавшей запись'
+    )
+    position = models.BigIntegerField(
+        'Позиция',
+        null=True,
+        unique=True,
+        editable=False,
+        help_text='Пусто, пока транзакция записи не завершена'
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['id'],
+                         condition=models.Q(position__isnull=True),
+                         name='changelog_unpublished_idx')
+        ]
+
+    def __str__(self):
+        action = 'удален' if self.deleted else 'изменен'
+        return f'{self.get_object_type_display()} {self.object_id} {action}'
@@ -0,0 +1,18 @@
+from django.conf import settings
+
+from rest_framework import serializers
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса изменений."""
+    since = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text='Курсор из предыдущего ответа. Без курсора '
+                  'возвращается текущий курсор для начала синхронизации.'
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SYNC_MAX_PAGE_SIZE,
+        required=False
+    )
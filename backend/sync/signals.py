@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from events.batch import relations_changed
+from events.models import Comment, Event, FavoriteEvent, Participation
+
+from .changes import current_xid
+from .models import ChangeLog
+
+
+def log_change(object_type, object_id, user_id=None, deleted=False):
+    ChangeLog.objects.create(object_type=object_type,
+                             object_id=object_id,
+                             user_id=user_id,
+                             deleted=deleted,
+                             xid=current_xid())
+
+
+def log_changes(object_type, object_ids, user_id=None, deleted=False):
+    return ChangeLog.objects.bulk_create([
+        ChangeLog(object_type=object_type,
+                  object_id=object_id,
+                  user_id=user_id,
+                  deleted=deleted,
+                  xid=current_xid())
+        for object_id in object_ids
+    ])
+
+
+def user_deleted(origin, user_id):
+    """Связь удаляется каскадом вместе с пользователем: запись
+    журнала для него нарушила бы внешний ключ, а синхронизировать
+    его данные больше некому."""
+    user_model = get_user_model()
+    if isinstance(origin, user_model):
+        return origin.pk == user_id
+    if isinstance(origin, QuerySet) and issubclass(origin.model, user_model):
+        return origin.filter(pk=user_id).exists()
+    return False
+
+
+@receiver(post_save, sender=Event)
+def log_event_saved(sender, instance, **kwargs):
+    log_change(ChangeLog.EVENT, instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def log_event_deleted(sender, instance, **kwargs):
+    log_change(ChangeLog.EVENT, instance.pk, deleted=True)
+
+
+@receiver(post_save, sender=Comment)
+def log_comment_saved(sender, instance, **kwargs):
+    log_change(ChangeLog.COMMENT, instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def log_comment_deleted(sender, instance, **kwargs):
+    log_change(ChangeLog.COMMENT, instance.pk, deleted=True)
+
+
+@receiver(post_save, sender=FavoriteEvent)
+def log_favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        log_change(ChangeLog.FAVORITE, instance.event_id, instance.user_id)
+
+
+@receiver(post_delete, sender=FavoriteEvent)
+def log_favorite_deleted(sender, instance, origin=None, **kwargs):
+    if user_deleted(origin, instance.user_id):
+        return
+    log_change(ChangeLog.FAVORITE, instance.event_id, instance.user_id,
+               deleted=True)
+
+
+@receiver(post_save, sender=Participation)
+def log_participation_saved(sender, instance, created, **kwargs):
+    if created:
+        log_change(ChangeLog.PARTICIPATION,
+                   instance.event_id,
+                   instance.user_id)
+        # Счетчик участников обновляется в обход сигналов Event.
+        log_change(ChangeLog.EVENT, instance.event_id)
+
+
+@receiver(post_delete, sender=Participation)
+def log_participation_deleted(sender, instance, origin=None, **kwargs):
+    if not user_deleted(origin, instance.user_id):
+        log_change(ChangeLog.PARTICIPATION, instance.event_id,
+                   instance.user_id, deleted=True)
+    log_change(ChangeLog.EVENT, instance.event_id)
+
+
+@receiver(relations_changed, sender=FavoriteEvent)
+def log_favorites_changed(sender, user, added, removed, **kwargs):
+    log_changes(ChangeLog.FAVORITE, added, user.pk)
+    log_changes(ChangeLog.FAVORITE, removed, user.pk, deleted=True)
+
+
+@receiver(relations_changed, sender=Participation)
+def log_participations_changed(sender, user, added, removed, **kwargs):
+    log_changes(ChangeLog.PARTICIPATION, added, user.pk)
+    log_changes(ChangeLog.PARTICIPATION, removed, user.pk, deleted=True)
+    log_changes(ChangeLog.EVENT, [*added, *removed])
@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework import routers
+
+from .views import SyncViewSet
+
+app_name = 'sync'
+
+router_sync_v1 = routers.DefaultRouter()
+
+router_sync_v1.register('sync', SyncViewSet, basename='sync')
+
+urlpatterns = [
+    path('', include(router_sync_v1.urls)),
+]
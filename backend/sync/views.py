@@ -0,0 +1,29 @@
+from django.conf import settings
+
+from rest_framework import permissions, viewsets
+from rest_framework.response import Response
+
+from drf_spectacular.utils import extend_schema
+
+from .changes import get_changes
+from .serializers import SyncQuerySerializer
+
+
+@extend_schema(tags=['Синхронизация'])
+class SyncViewSet(viewsets.ViewSet):
+    """Вьюсет ленты изменений для инкрементальной синхронизации."""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'list': 'sync'}
+
+    @extend_schema(summary='Изменения после курсора',
+                   parameters=[SyncQuerySerializer])
+    def list(self, request):
+        query = SyncQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        return Response(get_changes(
+            request.user,
+            data.get('since'),
+            data.get('limit') or settings.SYNC_PAGE_SIZE
+        ))
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from utils.admin import LargeTableAdmin, input_filter
+
 from .models import CustomUser, Subscribe, FavoriteActivity
 
 
@@ -9,7 +11,7 @@ class FavoriteInActivity(admin.TabularInline):
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ('id',
                     'username',
                     'email',
@@ -19,14 +21,16 @@ class CustomUserAdmin(admin.ModelAdmin):
                     'phone_number')
     list_display_links = ('username',)
     search_fields = ('username',)
-    list_filter = ('username', 'email')
-    empty_value_display = '-пусто-'
+    list_filter = (input_filter('username__istartswith', 'username'),
+                   input_filter('email__istartswith', 'email'))
 
     inlines = [FavoriteInActivity]
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'author')
-    list_filter = ('user',)
-
+    list_select_related = ('user', 'author')
+    list_filter = (input_filter('user__username', 'подписчику'),
+                   input_filter('author__username', 'автору'))
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+
+class LocalCache:
+    """LRU-кэш процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (value, time.monotonic() + self.timeout)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self.lock:
+            for key in [key for key, (data, _) in self.items.items()
+                        if data[0] == user_id]:
+                del self.items[key]
+
+
+local_cache = LocalCache(settings.AUTH_LOCAL_CACHE_SIZE,
+                         settings.AUTH_LOCAL_CACHE_TIMEOUT)
+
+
+def token_cache_key(key):
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def user_cache_key(user_id):
+    return f'auth:user-fields:{user_id}'
+
+
+# Поля пользователя, которые хранятся в кэшах. Хеш пароля и прочие
+# поля в кэш не попадают и загружаются из БД при обращении к ним.
+USER_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff',
+               'is_superuser')
+
+
+def user_data(user):
+    return tuple(getattr(user, field) for field in USER_FIELDS)
+
+
+def build_user(data):
+    """Новый объект пользователя для каждого запроса: изменения
+    request.user не видны параллельным запросам."""
+    model = get_user_model()
+    values = dict(zip(USER_FIELDS, data))
+    # from_db ожидает значения в порядке полей модели.
+    names = [field.attname for field in model._meta.concrete_fields
+             if field.attname in values]
+    return model.from_db('default', names, [values[name] for name in names])
+
+
+def get_cached_user_data(user_id):
+    """Поля пользователя из общего кэша или из БД."""
+    data = cache.get(user_cache_key(user_id))
+    if data is None:
+        data = get_user_model().objects.filter(
+            pk=user_id
+        ).values_list(*USER_FIELDS).first()
+        if data is not None:
+            cache.set(user_cache_key(user_id), data,
+                      settings.AUTH_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_token(key):
+    local_cache.delete(token_cache_key(key))
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    local_cache.delete_user(user_id)
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запросов к БД в обычном случае.
+
+    Соответствие токена пользователю хранится в LRU-кэше процесса
+    с коротким временем жизни и в общем кэше Django. Записи общего кэша
+    удаляются сигналами при выходе, удалении токена и изменении
+    пользователя; записи других процессов устаревают не позже,
+    чем через AUTH_LOCAL_CACHE_TIMEOUT секунд.
+    В request.auth передается ключ токена, а не объект Token.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        data = local_cache.get(cache_key)
+        if data is None:
+            user_id = cache.get(cache_key)
+            if user_id is None:
+                user, token = super().authenticate_credentials(key)
+                data = user_data(user)
+                cache.set(cache_key, user.pk, settings.AUTH_CACHE_TIMEOUT)
+                cache.set(user_cache_key(user.pk), data,
+                          settings.AUTH_CACHE_TIMEOUT)
+            else:
+                data = get_cached_user_data(user_id)
+            if data is None:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.')
+                )
+            local_cache.set(cache_key, data)
+        user = build_user(data)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (user, key)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Stateless-аутентификация по JWT: токен проверяется по подписи,
+    пользователь берется из кэша. Отозвать выданный токен нельзя,
+    поэтому время жизни токена доступа следует делать коротким."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+
+        cache_key = user_cache_key(user_id)
+        data = local_cache.get(cache_key)
+        if data is None:
+            data = get_cached_user_data(user_id)
+            if data is None:
+                raise exceptions.AuthenticationFailed(
+                    _('User not found'), code='user_not_found'
+                )
+            local_cache.set(cache_key, data)
+        user = build_user(data)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        return user
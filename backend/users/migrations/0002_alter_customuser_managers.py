@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-19 10:12
+
+from django.db import migrations
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -1,11 +1,43 @@
 from django.conf import settings
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.utils.translation import gettext_lazy as _
 
 from phonenumber_field.modelfields import PhoneNumberField
 
 from events.models import Activity
+from utils.db import count_subquery
+from utils.fields import ALL_FIELDS
+
+
+class CustomUserQuerySet(models.QuerySet):
+    """Набор запросов для пользователей."""
+
+    def with_user_data(self, user, selection=ALL_FIELDS):
+        """Данные, необходимые сериализатору пользователя,
+        за фиксированное число запросов. Данные полей, не выбранных
+        в selection, не загружаются."""
+        queryset = self
+        if selection.includes('activities'):
+            queryset = queryset.prefetch_related('activities')
+
+        annotations = {}
+        if selection.includes('is_subscribed'):
+            annotations['subscribed_flag'] = (
+                models.Value(False) if user.is_anonymous
+                else models.Exists(Subscribe.objects.filter(
+                    author=models.OuterRef('pk'), user=user
+                ))
+            )
+        if selection.includes('subscribers_count'):
+            annotations['subscribers_total'] = count_subquery(
+                Subscribe.objects.all(), 'author'
+            )
+        return queryset.annotate(**annotations)
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    """Менеджер пользователей с дополнительными наборами запросов."""
 
 
 class CustomUser(AbstractUser):
@@ -47,6 +79,8 @@ class CustomUser(AbstractUser):
         related_name='user_activities'
     )
 
+    objects = CustomUserManager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'password']
 
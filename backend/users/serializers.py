@@ -12,6 +12,7 @@ from djoser.serializers import (UserSerializer,
 
 from .models import CustomUser
 from events.models import Activity
+from utils.fields import ALL_FIELDS, SparseFieldsSerializerMixin
 
 
 class Base64ImageField(serializers.ImageField):
@@ -60,7 +61,21 @@ class RegisterUserSerializer(UserCreateSerializer):
         return value
 
 
-class CustomUserSerializer(UserSerializer):
+USER_FIELDS = ('id',
+               'username',
+               'email',
+               'first_name',
+               'last_name',
+               'phone_number',
+               'photo',
+               'age',
+               'bio',
+               'is_subscribed',
+               'subscribers_count',
+               'activities')
+
+
+class CustomUserSerializer(SparseFieldsSerializerMixin, UserSerializer):
     """Кастомный сериализатор пользователей."""
     age = serializers.SerializerMethodField()
     subscribers_count = serializers.SerializerMethodField()
@@ -73,19 +88,7 @@ class CustomUserSerializer(UserSerializer):
 
     class Meta:
         model = CustomUser
-        fields = ('id',
-                  'username',
-                  'email',
-                  'first_name',
-                  'last_name',
-                  'phone_number',
-                  'photo',
-                  'age',
-                  'bio',
-                  'is_subscribed',
-                  'subscribers_count',
-                  'birth_year',
-                  'activities')
+        fields = USER_FIELDS + ('birth_year',)
 
     def validate_birth_year(self, value):
         if (value >= datetime.datetime.now().year
@@ -99,12 +102,16 @@ class CustomUserSerializer(UserSerializer):
         return
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'subscribed_flag'):
+            return author.subscribed_flag
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return user.subscriptions.filter(author=author).exists()
 
     def get_subscribers_count(self, user):
+        if hasattr(user, 'subscribers_total'):
+            return user.subscribers_total
         return user.subscribers.all().count()
 
     @transaction.atomic
@@ -138,3 +145,48 @@ class CustomUserContextSerializer(CustomUserSerializer):
     class Meta:
         model = CustomUser
         fields = ('id', 'username')
+
+
+def user_context_representation(user):
+    """Представление пользователя, совпадающее
+    с CustomUserContextSerializer."""
+    return {'id': user.id, 'username': user.username}
+
+
+class CustomUserReadSerializer(serializers.BaseSerializer):
+    """Быстрый сериализатор списков пользователей только для чтения.
+    Принимает объекты из CustomUser.objects.with_user_data() и возвращает
+    то же представление, что и CustomUserSerializer."""
+
+    def get_photo(self, photo):
+        if not photo:
+            return None
+        try:
+            url = photo.url
+        except AttributeError:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, user):
+        selection = self.context.get('selection', ALL_FIELDS)
+        values = {
+            'id': lambda: user.id,
+            'username': lambda: user.username,
+            'email': lambda: user.email,
+            'first_name': lambda: user.first_name,
+            'last_name': lambda: user.last_name,
+            'phone_number': lambda: str(user.phone_number),
+            'photo': lambda: self.get_photo(user.photo),
+            'age': lambda: (datetime.datetime.now().year - user.birth_year
+                            if user.birth_year else None),
+            'bio': lambda: user.bio,
+            'is_subscribed': lambda: user.subscribed_flag,
+            'subscribers_count': lambda: user.subscribers_total,
+            'activities': lambda: [activity.id
+                                   for activity in user.activities.all()],
+        }
+        return {name: value() for name, value in values.items()
+                if selection.includes(name)}
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Выход из системы удаляет токен, вместе с ним удаляется кэш."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_changed_user(sender, instance, **kwargs):
+    """Кэш пользователя сбрасывается при любом изменении,
+    в том числе при деактивации."""
+    invalidate_user(instance.pk)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
@@ -13,3 +14,6 @@ urlpatterns = [
     path('', include(router_users_v1.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.AUTH_MODE == 'jwt':
+    urlpatterns.append(path('auth/', include('djoser.urls.jwt')))
@@ -8,32 +8,52 @@ from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .serializers import CustomUserSerializer
+from .serializers import (CustomUserReadSerializer,
+                          CustomUserSerializer,
+                          USER_FIELDS)
 
 from .models import CustomUser, Subscribe
 
 from utils.crud import create_relation, delete_relation
+from utils.fields import SPARSE_FIELDS_PARAMETERS, SparseFieldsMixin
 
 from .permissions import IsAdminAuthorOrReadOnly
 
-from events.models import Activity, Event
-from events.serializers import EventSerializer
+from events.models import Event
+from events.pagination import CustomPaginator
+from events.serializers import EventReadSerializer, EventSerializer
 
 
 @extend_schema(tags=['Пользователи'])
 @extend_schema_view(
-    list=extend_schema(summary='Получение списка пользователей'),
+    list=extend_schema(summary='Получение списка пользователей',
+                       parameters=SPARSE_FIELDS_PARAMETERS,
+                       responses=CustomUserSerializer),
     create=extend_schema(summary='Создание профиля пользователя'),
-    retrieve=extend_schema(summary='Получение профиля пользователя'),
+    retrieve=extend_schema(summary='Получение профиля пользователя',
+                           parameters=SPARSE_FIELDS_PARAMETERS),
     update=extend_schema(summary='Изменение профиля пользователя'),
     partial_update=extend_schema(summary='Частичное изменение профиля пользователя'),
     destroy=extend_schema(summary='Удаление профиля пользователя'),
 )
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SparseFieldsMixin, UserViewSet):
     """Кастомный вьюсет Пользователя."""
     serializer_class = CustomUserSerializer
     queryset = CustomUser.objects.all()
     permission_classes = [permissions.IsAuthenticated,]
+    pagination_class = CustomPaginator
+    throttle_scopes = {'recommendations': 'recommendations'}
+    sparse_fields = USER_FIELDS
+
+    def get_queryset(self):
+        return super().get_queryset().with_user_data(
+            self.request.user, self.get_field_selection()
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CustomUserReadSerializer
+        return super().get_serializer_class()
 
     def get_permissions(self):
         if self.action == 'me':
@@ -66,36 +86,38 @@ class CustomUserViewSet(UserViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    @extend_schema(summary='Все подписки')
+    @extend_schema(summary='Все подписки', responses=CustomUserSerializer)
     @action(detail=False,
             permission_classes=[permissions.IsAuthenticated, ])
     def subscriptions(self, request):
         subscribers_data = CustomUser.objects.filter(
             subscribers__user=request.user
-        )
+        ).with_user_data(request.user, self.get_field_selection())
         page = self.paginate_queryset(subscribers_data)
-        serializer = CustomUserSerializer(
-            page, many=True, context={'request': request}
+        serializer = CustomUserReadSerializer(
+            page, many=True, context=self.get_serializer_context()
         )
 
         return self.get_paginated_response(serializer.data)
     
-    @extend_schema(summary='Рекомендации')
+    @extend_schema(summary='Рекомендации',
+                   responses=EventSerializer(many=True))
     @action(methods=['GET'],
             detail=False,
             permission_classes=[permissions.IsAuthenticated, ])
     def recommendations(self, request):
-        user_activity_data = Activity.objects.filter(
-            users_for_activity__user=request.user
-        )
-        events_data = Event.objects.all()
-        recommendation_events = []
-
-        for event in events_data:
-            for activity in user_activity_data.values():
-                if activity in event.activity.values():
-                    recommendation_events.append(event)
-        serializer = EventSerializer(
+        recommendation_events = list(Event.objects.filter(
+            recommendations_for_event__user=request.user
+        ).upcoming().with_user_data(request.user).order_by(
+            '-recommendations_for_event__score'
+        ))
+        if not recommendation_events:
+            # Рекомендации пользователя еще не рассчитаны
+            # командой build_recommendations.
+            recommendation_events = Event.objects.filter(
+                activity__users_for_activity__user=request.user
+            ).distinct().with_user_data(request.user)
+        serializer = EventReadSerializer(
             recommendation_events, many=True, context={'request': request}
         )
 
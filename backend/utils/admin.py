@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .db import estimated_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который для больших таблиц без фильтров берет
+    количество строк из статистики PostgreSQL вместо COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Базовый класс админки для таблиц с миллионами строк."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр списка с полем ввода вместо перечня всех значений."""
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        # Фильтр отображается, только если список вариантов не пуст.
+        return ((None, None),)
+
+    def choices(self, changelist):
+        yield {
+            'query_parts': [
+                (key, value)
+                for key, value in changelist.get_filters_params().items()
+                if key != self.parameter_name
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value:
+            # Значение неподходящего для поля типа, например текст
+            # в фильтре по ID: админка покажет список без фильтров
+            # с сообщением об ошибке вместо ошибки 500.
+            try:
+                return queryset.filter(**{self.lookup: value})
+            except (ValueError, ValidationError) as error:
+                raise IncorrectLookupParameters(error)
+        return queryset
+
+
+def input_filter(lookup, title, parameter_name=None):
+    """Создает фильтр с полем ввода по значению поля lookup,
+    например input_filter('author__username', 'автор')."""
+    return type(f'{lookup.title().replace("_", "")}InputFilter',
+                (InputFilter,),
+                {'lookup': lookup,
+                 'title': title,
+                 'parameter_name': parameter_name or lookup})
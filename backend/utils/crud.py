@@ -15,6 +15,7 @@ def create_relation(request, model, model_relation, pk, serializer, field):
     if not model_relation_obj.exists():
         model_relation.objects.create(user=request.user,
                                       **{field: model_obj})
+        model_obj = model.objects.with_user_data(request.user).get(pk=pk)
         serializer = serializer(model_obj, context={'request': request})
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
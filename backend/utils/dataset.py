@@ -0,0 +1,224 @@
+import datetime
+import itertools
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+
+from events.models import (Activity,
+                           ActivityForEvent,
+                           Comment,
+                           Event,
+                           FavoriteEvent,
+                           Like,
+                           Location,
+                           Participation)
+from users.models import FavoriteActivity, Subscribe
+
+
+# Центры городов (долгота, широта), вокруг которых генерируются места
+# проведения мероприятий, и их доля в общем количестве.
+CITIES = (
+    ((37.6176, 55.7558), 0.55),
+    ((30.3141, 59.9386), 0.25),
+    ((49.1064, 55.7963), 0.1),
+    ((60.6122, 56.8519), 0.1),
+)
+
+DEFAULT_PASSWORD = 'dataset-password'
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса распределения Ципфа для выборки с перекосом."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** skew for rank in range(size)
+    ))
+
+
+class DatasetGenerator:
+    """Генератор синтетических данных с реалистичным перекосом:
+    немногие авторы создают большую часть мероприятий, на популярных
+    мероприятиях сосредоточена большая часть участий и комментариев."""
+
+    def __init__(self, seed=None, skew=1.1, batch_size=1000,
+                 password=DEFAULT_PASSWORD):
+        self.random = random.Random(seed)
+        self.skew = skew
+        self.batch_size = batch_size
+        self.password = make_password(password)
+        self.prefix = uuid.UUID(int=self.random.getrandbits(128)).hex[:8]
+
+    def choices(self, population, cum_weights, count):
+        return self.random.choices(population,
+                                   cum_weights=cum_weights,
+                                   k=count)
+
+    def pairs(self, left, left_weights, right, right_weights, count):
+        """Уникальные пары различных объектов, выбранные с учетом весов."""
+        pairs = set()
+        for _ in range(3):
+            missing = count - len(pairs)
+            if missing <= 0:
+                break
+            pairs.update(
+                (first, second) for first, second in zip(
+                    self.choices(left, left_weights, missing),
+                    self.choices(right, right_weights, missing)
+                ) if first != second
+            )
+        return pairs
+
+    def create_activities(self):
+        activities = list(Activity.objects.all())
+        if not activities:
+            activities = Activity.objects.bulk_create(
+                Activity(name=f'Активность {self.prefix} {index}')
+                for index in range(20)
+            )
+        self.random.shuffle(activities)
+        return activities
+
+    def create_users(self, count):
+        user_model = get_user_model()
+        base_phone = self.random.randrange(10 ** 9)
+        return user_model.objects.bulk_create(
+            (user_model(
+                username=f'{self.prefix}_{index}',
+                email=f'{self.prefix}_{index}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                phone_number=f'+79{(base_phone + index) % 10 ** 9:09d}',
+                birth_year=self.random.randint(1960, 2010),
+                password=self.password,
+            ) for index in range(count)),
+            batch_size=self.batch_size
+        )
+
+    def random_point(self):
+        centers, weights = zip(*CITIES)
+        longitude, latitude = self.random.choices(centers, weights)[0]
+        return Point(self.random.gauss(longitude, 0.15),
+                     self.random.gauss(latitude, 0.08))
+
+    def create_events(self, count, users, activities, days):
+        authors_weights = zipf_weights(len(users), self.skew)
+        activity_weights = zipf_weights(len(activities), self.skew)
+        now = timezone.now()
+
+        locations = Location.objects.bulk_create(
+            (Location(address=f'Адрес {self.prefix} {index}',
+                      point=self.random_point())
+             for index in range(count)),
+            batch_size=self.batch_size
+        )
+        authors = self.choices(users, authors_weights, count)
+        events = Event.objects.bulk_create(
+            (Event(
+                name=f'Мероприятие {index}',
+                description='Описание мероприятия',
+                datetime=now + datetime.timedelta(minutes=self.random.randint(
+                    -days * 24 * 60, days * 24 * 60
+                )),
+                author=author,
+                duration=self.random.choice((30, 60, 90, 120, 180)),
+                location=location,
+            ) for index, (author, location) in enumerate(
+                zip(authors, locations)
+            )),
+            batch_size=self.batch_size
+        )
+
+        relations = []
+        for event in events:
+            event_activities = {
+                activity.id for activity in self.choices(
+                    activities, activity_weights, self.random.randint(1, 3)
+                )
+            }
+            relations.extend(
+                ActivityForEvent(event=event, activity_id=activity_id)
+                for activity_id in event_activities
+            )
+        ActivityForEvent.objects.bulk_create(relations,
+                                             batch_size=self.batch_size)
+
+        Participation.objects.bulk_create(
+            (Participation(event=event, user=event.author)
+             for event in events),
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+        return events
+
+    def create_relations(self, model, left_field, left, right_field, right,
+                         count):
+        pairs = self.pairs(left, zipf_weights(len(left), self.skew),
+                           right, zipf_weights(len(right), self.skew),
+                           count)
+        return model.objects.bulk_create(
+            (model(**{left_field: first, right_field: second})
+             for first, second in pairs),
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+
+    def create_comments(self, count, users, events):
+        authors = self.choices(users, zipf_weights(len(users), self.skew),
+                               count)
+        commented = self.choices(events,
+                                 zipf_weights(len(events), self.skew),
+                                 count)
+        return Comment.objects.bulk_create(
+            (Comment(event=event, author=author, text='Текст комментария')
+             for author, event in zip(authors, commented)),
+            batch_size=self.batch_size
+        )
+
+    def generate(self, users=100, events=500, follows=10,
+                 participations=5, favorites=3, comments=3, likes=2,
+                 activities_per_user=3, days=90):
+        """Создает набор данных. Количество подписок, участий, избранного,
+        комментариев и лайков задается в среднем на пользователя
+        или мероприятие."""
+        activities = self.create_activities()
+        user_objs = self.create_users(users)
+        event_objs = self.create_events(events, user_objs, activities, days)
+        popular_events = self.random.sample(event_objs, len(event_objs))
+
+        self.create_relations(FavoriteActivity,
+                              'user', user_objs,
+                              'activity', activities,
+                              users * activities_per_user)
+        self.create_relations(Subscribe,
+                              'user', self.random.sample(user_objs, users),
+                              'author', user_objs,
+                              users * follows)
+        self.create_relations(Participation,
+                              'user', user_objs,
+                              'event', popular_events,
+                              users * participations)
+        self.create_relations(FavoriteEvent,
+                              'user', user_objs,
+                              'event', popular_events,
+                              users * favorites)
+        # bulk_create не отправляет сигналы, поэтому счетчики участников
+        # пересчитываются одним запросом.
+        Event.objects.filter(
+            pk__in=[event.pk for event in event_objs]
+        ).recount_participants()
+        comment_objs = self.create_comments(events * comments,
+                                            user_objs, popular_events)
+        self.create_relations(Like,
+                              'user', user_objs,
+                              'comment', comment_objs,
+                              len(comment_objs) * likes)
+
+        return {
+            'activities': activities,
+            'users': user_objs,
+            'events': event_objs,
+            'comments': comment_objs,
+        }
@@ -0,0 +1,47 @@
+from django.db import connections, router
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    """Подзапрос, подсчитывающий связанные объекты без GROUP BY
+    во внешнем запросе."""
+
+    subquery = queryset.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+def estimated_count(model):
+    """Оценка количества строк таблицы по статистике планировщика
+    (pg_class.reltuples). Для таблиц без статистики возвращает 0."""
+    with connections[router.db_for_read(model)].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] > 0 else 0
+
+
+def delete_returning(queryset, field):
+    """Удаляет строки queryset одним запросом DELETE ... RETURNING
+    и возвращает значения поля удаленных строк. Сигналы не отправляются,
+    каскадного удаления нет, поэтому функция подходит только
+    для таблиц, на которые не ссылаются другие таблицы."""
+    model = queryset.model
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    subquery, params = queryset.order_by().values(
+        'pk'
+    ).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({subquery}) '
+            f'RETURNING {quote(model._meta.get_field(field).column)}',
+            params
+        )
+        return [row[0] for row in cursor.fetchall()]
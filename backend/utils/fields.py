@@ -0,0 +1,115 @@
+from drf_spectacular.utils import OpenApiParameter
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class FieldSelection:
+    """Поля ответа, выбранные параметрами запроса fields и expand.
+
+    Без параметра fields выводятся все поля, связи раскрыты.
+    С параметром fields выводятся только перечисленные поля,
+    а связи выводятся как ID, если они не перечислены в expand.
+    """
+
+    def __init__(self, fields=None, expand=frozenset()):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request, allowed, expandable=()):
+        fields = request.query_params.get('fields')
+        expand = parse_names(request.query_params.get('expand') or '')
+        fields = parse_names(fields) if fields else None
+
+        errors = {}
+        if fields is not None and fields - set(allowed):
+            errors['fields'] = ('Неизвестные поля: '
+                                f'{", ".join(sorted(fields - set(allowed)))}.')
+        if expand - set(expandable):
+            errors['expand'] = ('Нельзя раскрыть поля: '
+                                f'{", ".join(sorted(expand - set(expandable)))}.')
+        if errors:
+            raise ValidationError(errors)
+
+        if fields is not None:
+            fields |= expand
+        return cls(fields, frozenset(expand))
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.fields is None or name in self.expand
+
+
+ALL_FIELDS = FieldSelection()
+
+
+# Параметры выбора полей для схемы OpenAPI.
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter('fields', str,
+                     description='Поля ответа через запятую'),
+    OpenApiParameter('expand', str,
+                     description='Связи, выводимые объектами, а не ID'),
+]
+
+
+class SparseFieldsMixin:
+    """Миксин вьюсета для параметров fields и expand.
+
+    Выбор полей передается в контекст сериализатора и используется
+    в get_queryset, чтобы не выполнять запросы для полей, которых
+    нет в ответе. Действует только для GET-запросов.
+    """
+    sparse_fields = ()
+    expandable_fields = ()
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            request = getattr(self, 'request', None)
+            if request is None or request.method != 'GET':
+                self._field_selection = ALL_FIELDS
+            else:
+                self._field_selection = FieldSelection.from_request(
+                    request, self.sparse_fields, self.expandable_fields
+                )
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['selection'] = self.get_field_selection()
+        return context
+
+
+class SparseFieldsSerializerMixin:
+    """Миксин ModelSerializer для выбора полей из контекста.
+    Невыбранные поля удаляются до сериализации, нераскрытые связи
+    из expandable_fields заменяются на ID без обращения к БД.
+    Действует только на корневой сериализатор."""
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            # Вложенный сериализатор выводится целиком.
+            return fields
+        selection = self.context.get('selection', ALL_FIELDS)
+        for name in list(fields):
+            if not selection.includes(name):
+                del fields[name]
+            elif name in self.expandable_fields and not selection.expands(name):
+                many = isinstance(fields[name],
+                                  (serializers.ListSerializer,
+                                   serializers.ManyRelatedField))
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=many
+                )
+        return fields
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+CURRENT = 'current'
+
+
+def current_version(root):
+    """Имя каталога текущей версии данных в root или None, если данные
+    не построены."""
+    try:
+        return os.readlink(os.path.join(root, CURRENT))
+    except OSError:
+        return None
+
+
+@contextmanager
+def publish_version(root):
+    """Каталог для записи новой версии данных. После записи ссылка
+    root/current переключается на него одной операцией os.replace,
+    поэтому процесс, прочитавший ссылку, открывает файлы одной версии.
+
+    Предыдущая версия сохраняется для процессов, которые прочитали
+    ссылку до переключения, но еще не открыли файлы; более старые
+    версии удаляются. Открытые через mmap файлы удаленных версий
+    остаются доступны процессам до перечитывания данных."""
+    os.makedirs(root, exist_ok=True)
+    directory = tempfile.mkdtemp(dir=root,
+                                 prefix=time.strftime('%Y%m%d%H%M%S-'))
+    try:
+        os.chmod(directory, 0o755)
+        yield directory
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    previous = current_version(root)
+    version = os.path.basename(directory)
+    link = os.path.join(root, f'{CURRENT}-{version}.tmp')
+    os.symlink(version, link)
+    os.replace(link, os.path.join(root, CURRENT))
+
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if (name not in (version, previous)
+                and os.path.isdir(path) and not os.path.islink(path)):
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,28 @@
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from utils.renderers import ORJSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONParser(JSONParser):
+    """Парсер JSON на основе orjson. Если пакет не установлен
+    или тело запроса не в UTF-8, используется стандартный json."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if (orjson is None or not self.strict
+                or codecs.lookup(encoding).name != 'utf-8'):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,58 @@
+from django.contrib.gis.geos import GEOSGeometry
+
+from phonenumber_field.phonenumber import PhoneNumber
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class APIJSONEncoder(encoders.JSONEncoder):
+    """JSON-энкодер с поддержкой номеров телефонов и геометрий,
+    которые представляются строками, как в сериализаторах API."""
+
+    def default(self, obj):
+        if isinstance(obj, (PhoneNumber, GEOSGeometry)):
+            return str(obj)
+        return super().default(obj)
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME
+                      | orjson.OPT_NON_STR_KEYS)
+
+
+def json_dumps(data):
+    """Сериализация в JSON (байты) с тем же результатом,
+    что и у JSONRenderer со стандартными настройками."""
+    if orjson is None:
+        return ORJSONRenderer().render(data)
+    ret = orjson.dumps(data, default=APIJSONEncoder().default,
+                       option=ORJSON_OPTIONS)
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+    return ret
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Рендерер JSON на основе orjson. Если пакет не установлен
+    или запрошен форматированный вывод, используется стандартный json."""
+    encoder_class = APIJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type,
+                                 renderer_context or {})
+        if (orjson is None or indent is not None
+                or self.ensure_ascii or not self.compact):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return json_dumps(data)
@@ -0,0 +1,139 @@
+import fcntl
+import math
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from monitoring.metrics import record_throttle
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+# Количество файлов блокировок файлового кэша: корзины распределяются
+# по ним по хэшу ключа.
+LOCK_STRIPES = 64
+# Время жизни ключа блокировки в кэше (на случай падения процесса,
+# который ее держит) и время ожидания блокировки, в секундах.
+LOCK_TIMEOUT = 2
+LOCK_WAIT = 1
+
+
+def parse_rate(rate):
+    """Разбирает ограничение вида '30/min' в емкость корзины
+    и скорость ее пополнения (токенов в секунду)."""
+    capacity, period = rate.split('/')
+    capacity = int(capacity)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+@contextmanager
+def bucket_lock(cache, key):
+    """Блокировка чтения и изменения состояния корзины. У файлового кэша
+    add не атомарен, поэтому используется flock на файл в каталоге кэша;
+    у остальных бэкендов - ключ, добавленный атомарным cache.add.
+    Возвращает False, если блокировку не удалось получить."""
+    if isinstance(cache, FileBasedCache):
+        os.makedirs(cache._dir, exist_ok=True)
+        stripe = zlib.crc32(key.encode()) % LOCK_STRIPES
+        path = os.path.join(cache._dir, f'throttle-{stripe}.lock')
+        with open(path, 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield True
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        return
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.005)
+    try:
+        yield True
+    finally:
+        cache.delete(lock_key)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов алгоритмом token bucket.
+
+    Ограничения задаются отдельно для каждого действия вьюсета:
+    атрибут ``throttle_scopes`` связывает действие с областью,
+    а лимиты областей берутся из ``DEFAULT_THROTTLE_RATES``
+    по ключу ``<область>_<kind>``. Действия без области не ограничиваются.
+
+    Состояние корзин хранится в кэше ``THROTTLE_CACHE``, общем
+    для процессов хоста. Чтение и запись состояния выполняются
+    под блокировкой корзины, поэтому одновременные запросы не могут
+    потратить один и тот же токен.
+    """
+    kind = None
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        if not settings.THROTTLING_ENABLED or scope is None or rate is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        cache = caches[settings.THROTTLE_CACHE]
+        key = f'throttle:{scope}:{self.kind}:{self.get_ident_key(request)}'
+        with bucket_lock(cache, key) as locked:
+            if not locked:
+                self.wait_time = LOCK_WAIT
+                record_throttle(scope, self.kind)
+                return False
+
+            now = time.time()
+            tokens, updated = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens < 1:
+                self.wait_time = (1 - tokens) / refill_rate
+                record_throttle(scope, self.kind)
+                return False
+
+            cache.set(key, (tokens - 1, now),
+                      timeout=int(capacity / refill_rate) + 1)
+        return True
+
+    def wait(self):
+        # Заголовок Retry-After содержит целое число секунд.
+        return math.ceil(self.wait_time)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина на пользователя; для анонимных запросов — на IP-адрес."""
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return f'ip:{self.get_ident(request)}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина на IP-адрес, общая для всех пользователей с этого адреса."""
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)